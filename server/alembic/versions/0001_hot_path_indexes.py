@@ -0,0 +1,74 @@
+"""Indexes for hot predicates and sorts
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Adds the indexes used by the payment register, product listing, permission
+checks, audit log and workflow task queries.  Indexes are built with
+CREATE INDEX CONCURRENTLY, so the migration can run against a live database
+without blocking writes.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, definition)
+INDEXES = [
+    # get_latest_by_product / latest payment per product
+    ("ix_payment_info_product_latest", "payment_info",
+     "(product_id, payment_date DESC, created_at DESC)"),
+    # get_incomplete_count and the incomplete badge
+    ("ix_payment_info_incomplete", "payment_info",
+     "(status) WHERE status = 'incomplete'"),
+    # permission checks by user, and users assigned to a product
+    ("ix_permission_assignments_user_product", "permission_assignments",
+     "(user_id, product_id)"),
+    ("ix_permission_assignments_product_user", "permission_assignments",
+     "(product_id, user_id)"),
+    # audit log listing (newest first) and filtering by actor
+    ("ix_audit_logs_created_at", "audit_logs", "(created_at DESC)"),
+    ("ix_audit_logs_actor_created_at", "audit_logs", "(actor_user_id, created_at)"),
+    # pending task counts and task lists
+    ("ix_workflow_tasks_status_created_at", "workflow_tasks", "(status, created_at)"),
+    # invoices per payment record
+    ("ix_payment_invoices_payment_info_id", "payment_invoices", "(payment_info_id)"),
+    # case-insensitive duplicate-name checks
+    ("ix_products_lower_name", "products", "(lower(name))"),
+    ("ix_services_lower_name", "services", "(lower(name))"),
+]
+
+
+def _drop_invalid_index(name: str) -> None:
+    """Drop a leftover INVALID index from an interrupted concurrent build."""
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = '{name}' AND NOT i.indisvalid
+            ) THEN
+                EXECUTE 'DROP INDEX {name}';
+            END IF;
+        END $$;
+    """)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, definition in INDEXES:
+            _drop_invalid_index(name)
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _table, _definition in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,105 @@
+"""Per-user permission version with change notifications
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Adds users.perm_version, a counter bumped whenever a user's row, roles or
+permission assignments change.  Role and assignment changes bump it from
+statement-level triggers (one UPDATE per statement, also for bulk imports).
+Every bump and every deleted user is published on the ``perm_version``
+channel as ``<user id>:<version>`` (version -1 for a deleted user), which
+the application LISTENs to so all processes see revocations immediately.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Tables whose rows grant roles or permissions to a user (by user_id)
+GRANT_TABLES = ["user_roles", "permission_assignments"]
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("perm_version", sa.Integer(), nullable=False, server_default="1"))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION users_bump_perm_version() RETURNS trigger AS $$
+        BEGIN
+            -- Any change to the user row invalidates what was derived from it
+            IF NEW.perm_version = OLD.perm_version THEN
+                NEW.perm_version := OLD.perm_version + 1;
+            END IF;
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER users_bump_perm_version BEFORE UPDATE ON users
+        FOR EACH ROW EXECUTE FUNCTION users_bump_perm_version();
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION users_notify_perm_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('perm_version', OLD.id::text || ':-1');
+            ELSE
+                PERFORM pg_notify('perm_version', NEW.id::text || ':' || NEW.perm_version);
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER users_notify_perm_version AFTER UPDATE OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION users_notify_perm_version();
+    """)
+
+    # Grant changes: bump the version of every affected user once per statement
+    for rows in ("new_rows", "old_rows"):
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION bump_perm_version_from_{rows}() RETURNS trigger AS $$
+            BEGIN
+                UPDATE users SET perm_version = perm_version + 1
+                WHERE id IN (SELECT DISTINCT user_id FROM {rows});
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql;
+        """)
+    for table in GRANT_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_perm_version_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_perm_version_from_new_rows();
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_perm_version_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_perm_version_from_old_rows();
+        """)
+        # An update may move a row to another user: bump both sides
+        op.execute(f"""
+            CREATE TRIGGER {table}_perm_version_update_new AFTER UPDATE ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_perm_version_from_new_rows();
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_perm_version_update_old AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_perm_version_from_old_rows();
+        """)
+
+
+def downgrade() -> None:
+    for table in reversed(GRANT_TABLES):
+        for suffix in ("update_old", "update_new", "delete", "insert"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_perm_version_{suffix} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_perm_version_from_old_rows()")
+    op.execute("DROP FUNCTION IF EXISTS bump_perm_version_from_new_rows()")
+    op.execute("DROP TRIGGER IF EXISTS users_notify_perm_version ON users")
+    op.execute("DROP FUNCTION IF EXISTS users_notify_perm_version()")
+    op.execute("DROP TRIGGER IF EXISTS users_bump_perm_version ON users")
+    op.execute("DROP FUNCTION IF EXISTS users_bump_perm_version()")
+    op.drop_column("users", "perm_version")
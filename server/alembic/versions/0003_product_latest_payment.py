@@ -0,0 +1,143 @@
+"""Latest payment per product, maintained by triggers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Adds product_latest_payment, one row per product with at least one payment:
+
+- the latest payment (payment_date DESC, NULLs first as before, then
+  created_at DESC) with its dates, status and amount
+- the latest payment that has a usage_end_date (payment_date DESC NULLS
+  LAST, then created_at DESC), used for upcoming renewals
+
+Statement-level triggers on payment_info recompute the rows of every
+product a statement touched, so bulk changes cost one refresh.  The
+refresh locks the affected product rows first, which serialises
+concurrent payment changes for the same product.  Existing data is
+backfilled.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# payment_info columns that decide or are copied into product_latest_payment
+TRACKED_COLUMNS = ["product_id", "payment_date", "created_at", "status", "amount",
+                   "usage_start_date", "usage_end_date"]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_latest_payment",
+        sa.Column("product_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("payment_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("payment_info.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("amount", sa.DECIMAL(10, 2), nullable=True),
+        sa.Column("payment_date", sa.Date(), nullable=True),
+        sa.Column("usage_start_date", sa.Date(), nullable=True),
+        sa.Column("usage_end_date", sa.Date(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("renewal_payment_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("payment_info.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("renewal_usage_end_date", sa.Date(), nullable=True),
+    )
+    op.create_index("ix_product_latest_payment_renewal", "product_latest_payment",
+                    ["renewal_usage_end_date"],
+                    postgresql_where=sa.text("renewal_usage_end_date IS NOT NULL"))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_product_latest_payment(product_ids uuid[]) RETURNS void AS $$
+        BEGIN
+            -- Serialise refreshes per product; deleted products are skipped
+            PERFORM 1 FROM products WHERE id = ANY(product_ids) ORDER BY id FOR NO KEY UPDATE;
+
+            DELETE FROM product_latest_payment WHERE product_id = ANY(product_ids);
+
+            INSERT INTO product_latest_payment (
+                product_id, payment_id, status, amount, payment_date, usage_start_date,
+                usage_end_date, created_at, renewal_payment_id, renewal_usage_end_date)
+            SELECT latest.product_id, latest.id, latest.status, latest.amount, latest.payment_date,
+                   latest.usage_start_date, latest.usage_end_date, latest.created_at,
+                   renewal.id, renewal.usage_end_date
+            FROM (
+                SELECT DISTINCT ON (pi.product_id) pi.*
+                FROM payment_info pi
+                JOIN products p ON p.id = pi.product_id
+                WHERE pi.product_id = ANY(product_ids)
+                ORDER BY pi.product_id, pi.payment_date DESC, pi.created_at DESC, pi.id DESC
+            ) latest
+            LEFT JOIN LATERAL (
+                SELECT pi.id, pi.usage_end_date
+                FROM payment_info pi
+                WHERE pi.product_id = latest.product_id AND pi.usage_end_date IS NOT NULL
+                ORDER BY pi.payment_date DESC NULLS LAST, pi.created_at DESC, pi.id DESC
+                LIMIT 1
+            ) renewal ON true;
+        END $$ LANGUAGE plpgsql;
+    """)
+
+    for rows in ("new_rows", "old_rows"):
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION payment_info_refresh_latest_from_{rows}() RETURNS trigger AS $$
+            BEGIN
+                PERFORM refresh_product_latest_payment(ARRAY(
+                    SELECT DISTINCT product_id FROM {rows} WHERE product_id IS NOT NULL));
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql;
+        """)
+    # Updates only matter when a tracked column changed; both sides for moved payments
+    changed = " OR ".join(f"n.{column} IS DISTINCT FROM o.{column}" for column in TRACKED_COLUMNS)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION payment_info_refresh_latest_on_update() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_product_latest_payment(ARRAY(
+                SELECT DISTINCT product_id FROM (
+                    SELECT n.product_id AS new_product_id, o.product_id AS old_product_id
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE {changed}
+                ) moved, LATERAL (VALUES (new_product_id), (old_product_id)) AS ids(product_id)
+                WHERE product_id IS NOT NULL));
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER payment_info_latest_insert AFTER INSERT ON payment_info
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_info_refresh_latest_from_new_rows();
+    """)
+    op.execute("""
+        CREATE TRIGGER payment_info_latest_delete AFTER DELETE ON payment_info
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_info_refresh_latest_from_old_rows();
+    """)
+    op.execute("""
+        CREATE TRIGGER payment_info_latest_update AFTER UPDATE ON payment_info
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_info_refresh_latest_on_update();
+    """)
+
+    # Backfill
+    op.execute("""
+        SELECT refresh_product_latest_payment(ARRAY(
+            SELECT DISTINCT product_id FROM payment_info WHERE product_id IS NOT NULL))
+    """)
+
+
+def downgrade() -> None:
+    for suffix in ("update", "delete", "insert"):
+        op.execute(f"DROP TRIGGER IF EXISTS payment_info_latest_{suffix} ON payment_info")
+    op.execute("DROP FUNCTION IF EXISTS payment_info_refresh_latest_on_update()")
+    op.execute("DROP FUNCTION IF EXISTS payment_info_refresh_latest_from_old_rows()")
+    op.execute("DROP FUNCTION IF EXISTS payment_info_refresh_latest_from_new_rows()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_product_latest_payment(uuid[])")
+    op.drop_index("ix_product_latest_payment_renewal", table_name="product_latest_payment")
+    op.drop_table("product_latest_payment")
@@ -0,0 +1,64 @@
+"""Indexes for payment register filters and sorting
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+- the default register order (status priority, then newest payment), so a
+  page is read from the index instead of sorting every payment
+- payment_date and usage_end_date, for date range filters and sorting by
+  either column (in both directions, with the id as tie-breaker)
+- products.service_id, for the service and vendor filters
+
+The status-priority expression must stay identical to
+CRUDPaymentInfo._status_order.  Built CONCURRENTLY like 0001.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+STATUS_ORDER = ("CASE WHEN status = 'error' THEN 0 WHEN status = 'incomplete' THEN 1 "
+                "WHEN status = 'complete' THEN 2 ELSE 3 END")
+
+# (index name, table, definition)
+INDEXES = [
+    ("ix_payment_info_register_order", "payment_info",
+     f"(({STATUS_ORDER}), payment_date DESC NULLS LAST, created_at DESC, id DESC)"),
+    ("ix_payment_info_payment_date", "payment_info", "(payment_date, id)"),
+    ("ix_payment_info_usage_end_date", "payment_info", "(usage_end_date, id)"),
+    ("ix_products_service_id", "products", "(service_id)"),
+]
+
+
+def _drop_invalid_index(name: str) -> None:
+    """Drop a leftover INVALID index from an interrupted concurrent build."""
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = '{name}' AND NOT i.indisvalid
+            ) THEN
+                EXECUTE 'DROP INDEX {name}';
+            END IF;
+        END $$;
+    """)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, definition in INDEXES:
+            _drop_invalid_index(name)
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _table, _definition in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,105 @@
+"""Invoice count and latest invoice time on payment_info, maintained by triggers
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Adds payment_info.invoice_count and payment_info.last_invoice_at, so the
+completeness rule and list views can tell whether a payment has invoices
+without reading payment_invoices.
+
+Statement-level triggers on payment_invoices recompute both columns for
+every payment a statement touched (in the same transaction), including
+cascaded deletes.  The refresh locks the affected payment rows before
+counting, which serialises concurrent invoice changes for the same
+payment.  Existing data is backfilled.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("payment_info", sa.Column("invoice_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("payment_info", sa.Column("last_invoice_at", sa.DateTime(timezone=True), nullable=True))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_payment_invoice_stats(payment_ids uuid[]) RETURNS void AS $$
+        BEGIN
+            -- Lock first; the UPDATE below then counts with a fresh snapshot
+            PERFORM 1 FROM payment_info WHERE id = ANY(payment_ids) ORDER BY id FOR NO KEY UPDATE;
+
+            UPDATE payment_info pi
+            SET invoice_count = stats.invoice_count, last_invoice_at = stats.last_invoice_at
+            FROM (
+                SELECT ids.id, count(inv.id) AS invoice_count, max(inv.created_at) AS last_invoice_at
+                FROM unnest(payment_ids) AS ids(id)
+                LEFT JOIN payment_invoices inv ON inv.payment_info_id = ids.id
+                GROUP BY ids.id
+            ) stats
+            WHERE pi.id = stats.id
+              AND (pi.invoice_count, pi.last_invoice_at) IS DISTINCT FROM (stats.invoice_count, stats.last_invoice_at);
+        END $$ LANGUAGE plpgsql;
+    """)
+
+    for rows in ("new_rows", "old_rows"):
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION payment_invoices_refresh_stats_from_{rows}() RETURNS trigger AS $$
+            BEGIN
+                PERFORM refresh_payment_invoice_stats(ARRAY(
+                    SELECT DISTINCT payment_info_id FROM {rows}));
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql;
+        """)
+    # Updates only matter when an invoice moved to another payment or changed its time
+    op.execute("""
+        CREATE OR REPLACE FUNCTION payment_invoices_refresh_stats_on_update() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_payment_invoice_stats(ARRAY(
+                SELECT DISTINCT payment_info_id FROM (
+                    SELECT n.payment_info_id AS new_payment_id, o.payment_info_id AS old_payment_id
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.payment_info_id IS DISTINCT FROM o.payment_info_id
+                       OR n.created_at IS DISTINCT FROM o.created_at
+                ) moved, LATERAL (VALUES (new_payment_id), (old_payment_id)) AS ids(payment_info_id)));
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("""
+        CREATE TRIGGER payment_invoices_stats_insert AFTER INSERT ON payment_invoices
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_invoices_refresh_stats_from_new_rows();
+    """)
+    op.execute("""
+        CREATE TRIGGER payment_invoices_stats_delete AFTER DELETE ON payment_invoices
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_invoices_refresh_stats_from_old_rows();
+    """)
+    op.execute("""
+        CREATE TRIGGER payment_invoices_stats_update AFTER UPDATE ON payment_invoices
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION payment_invoices_refresh_stats_on_update();
+    """)
+
+    # Backfill
+    op.execute("""
+        SELECT refresh_payment_invoice_stats(ARRAY(
+            SELECT DISTINCT payment_info_id FROM payment_invoices))
+    """)
+
+
+def downgrade() -> None:
+    for suffix in ("update", "delete", "insert"):
+        op.execute(f"DROP TRIGGER IF EXISTS payment_invoices_stats_{suffix} ON payment_invoices")
+    op.execute("DROP FUNCTION IF EXISTS payment_invoices_refresh_stats_on_update()")
+    op.execute("DROP FUNCTION IF EXISTS payment_invoices_refresh_stats_from_old_rows()")
+    op.execute("DROP FUNCTION IF EXISTS payment_invoices_refresh_stats_from_new_rows()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_payment_invoice_stats(uuid[])")
+    op.drop_column("payment_info", "last_invoice_at")
+    op.drop_column("payment_info", "invoice_count")
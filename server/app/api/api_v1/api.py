@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import auth, users, services, payment_register, workflows, audit_logs, products, master_files, dashboard, departments, admin_master_data, scheduler_debug
+from app.api.api_v1.endpoints import auth, users, services, payment_register, workflows, audit_logs, products, master_files, dashboard, departments, admin_master_data, scheduler_debug, db_debug
 
 api_router = APIRouter()
 
@@ -27,3 +27,5 @@ api_router.include_router(
     admin_master_data.router, prefix="/admin", tags=["admin-master-data"])
 api_router.include_router(
     scheduler_debug.router, prefix="/debug", tags=["debug"])
+api_router.include_router(
+    db_debug.router, prefix="/debug", tags=["debug"])
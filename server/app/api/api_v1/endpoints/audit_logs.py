@@ -1,7 +1,7 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.routing import get_read_db
 from app.crud import audit_log
 from app.core.deps import require_admin
 from app.schemas.audit import AuditLog
@@ -17,11 +17,13 @@ def read_audit_logs(
     action: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve audit logs with pagination and filtering.
+    Supports page/limit or cursor pagination (newest first).
     """
     skip = (page - 1) * limit
 
@@ -38,7 +40,8 @@ def read_audit_logs(
         skip=skip,
         limit=limit,
         actor_user_id=actor_uuid,
-        action=action
+        action=action,
+        cursor=cursor
     )
 
     # Format the response data
@@ -61,17 +64,17 @@ def read_audit_logs(
             "createdAt": log.created_at.isoformat()
         })
 
-    # Get total count for pagination (simplified approach)
-    total_logs = len(audit_log.get_multi_with_actor(
-        db, skip=0, limit=1000, actor_user_id=actor_uuid, action=action
-    ))
+    total_logs = audit_log.count_with_actor(
+        db, actor_user_id=actor_uuid, action=action
+    )
 
     return {
         "data": log_data,
         "pagination": {
             "total": total_logs,
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "nextCursor": logs.next_cursor
         }
     }
 
@@ -1,27 +1,30 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.crud import user
 from app.core.security import create_access_token
 from app.core.config import settings
-from app.core.deps import get_current_active_user, get_user_permissions, get_user_roles
+from app.core.deps import get_current_principal
+from app.core.principal import Principal
 from app.schemas.auth import Token, LoginRequest
-from app.models.user import User
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
+
+    Password verification runs in the password hashing pool; when the pool is
+    saturated the request fails fast with 503.
     """
-    authenticated_user = user.authenticate(
+    authenticated_user = await user.authenticate_async(
         db, email=login_data.email, password=login_data.password
     )
     if not authenticated_user:
@@ -31,10 +34,17 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Roles are trusted from the token while its permission version (pv) is current
+    roles = await user.get_user_roles_async(db, user_id=authenticated_user.id)
     access_token_expires = timedelta(
         minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(authenticated_user.id)}, expires_delta=access_token_expires
+        data={
+            "sub": str(authenticated_user.id),
+            "roles": roles,
+            "pv": authenticated_user.perm_version,
+        },
+        expires_delta=access_token_expires
     )
 
     return {
@@ -49,19 +59,17 @@ def login(
 
 @router.get("/me")
 def read_users_me(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_current_principal)
 ):
     """
     Get current user profile with roles and assigned services (v2).
     """
-    user_roles = get_user_roles(current_user.id, db)
-    user_permissions = get_user_permissions(current_user.id, db)
+    current_user = principal.user
 
     return {
         "id": str(current_user.id),
         "name": current_user.name,
         "email": current_user.email,
-        "roles": user_roles,
-        "assignedServiceIds": user_permissions["services"]
+        "roles": principal.roles,
+        "assignedServiceIds": sorted(str(service_id) for service_id in principal.service_ids)
     }
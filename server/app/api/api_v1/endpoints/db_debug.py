@@ -0,0 +1,80 @@
+"""Debug endpoints for database connection pool telemetry and slow queries."""
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from app.core.deps import get_current_user
+from app.core.config import settings
+from app.db.pool_metrics import all_pool_metrics, render_prometheus
+from app.db.routing import lag_monitor
+from app.db.slow_query_log import slow_query_stats
+from typing import Any, Dict
+
+router = APIRouter()
+
+
+@router.get("/db/pool")
+def get_pool_status(
+    format: str = Query("json", pattern="^(json|prometheus)$"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Get connection pool gauges, checkout counters and wait time histogram.
+    Values are per worker process; use format=prometheus for scraping.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return {
+        "pools": [metrics.snapshot() for metrics in all_pool_metrics()],
+        "replica": lag_monitor.snapshot(),
+        "config": {
+            "DB_POOL_SIZE": settings.DB_POOL_SIZE,
+            "DB_MAX_OVERFLOW": settings.DB_MAX_OVERFLOW,
+            "DB_POOL_TIMEOUT": settings.DB_POOL_TIMEOUT,
+            "DB_POOL_PRE_PING": settings.DB_POOL_PRE_PING,
+            "DB_POOL_RECYCLE": settings.DB_POOL_RECYCLE,
+            "DB_STATEMENT_TIMEOUT_MS": settings.DB_STATEMENT_TIMEOUT_MS,
+            "DB_ASYNC_POOL_SIZE": settings.DB_ASYNC_POOL_SIZE,
+            "DB_ASYNC_MAX_OVERFLOW": settings.DB_ASYNC_MAX_OVERFLOW,
+        }
+    }
+
+
+@router.post("/db/pool/reset")
+def reset_pool_metrics(
+    current_user = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Reset the accumulated pool counters (gauges are unaffected)."""
+    for metrics in all_pool_metrics():
+        metrics.reset()
+    return {"status": "success", "message": "Pool metrics reset"}
+
+
+@router.get("/db/slow-queries")
+def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    sort_by: str = Query("total_ms", pattern="^(total_ms|max_ms|count)$"),
+    include_plan: bool = Query(False),
+    current_user = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    List the slowest statements seen by this worker, grouped by fingerprint.
+    Full entries (with redacted parameters) are in the slow query log file.
+    """
+    entries = slow_query_stats.top(limit=limit, sort_by=sort_by)
+    if not include_plan:
+        for entry in entries:
+            entry.pop("plan", None)
+    return {
+        "threshold_ms": settings.DB_SLOW_QUERY_MS,
+        "log_file": settings.DB_SLOW_QUERY_LOG_FILE,
+        "data": entries
+    }
+
+
+@router.post("/db/slow-queries/reset")
+def reset_slow_queries(
+    current_user = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Clear the in-memory slow query aggregates (the log file is kept)."""
+    slow_query_stats.reset()
+    return {"status": "success", "message": "Slow query statistics reset"}
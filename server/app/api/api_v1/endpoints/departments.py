@@ -169,7 +169,6 @@ def get_department_products(
     Get all products assigned to a department.
     Admin only.
     """
-    from app.crud import payment_info
     from app.models.payment import ProductStatus
 
     target_department = department.get(db, department_id)
@@ -193,8 +192,8 @@ def get_department_products(
             if status_obj:
                 status_name = status_obj.name
 
-        # Get latest payment info
-        latest_payment = payment_info.get_latest_by_product(db, product.id)
+        # Latest payment info (joined in by get_department_products)
+        latest_payment = product.latest_payment
         latest_payment_date = None
         latest_usage_start = None
         latest_usage_end = None
@@ -1,10 +1,15 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
 from app.db.database import get_db
+from app.db.unit_of_work import commit_or_flush
+from app.db.routing import get_async_read_db
 from app.crud import product as crud_product, audit_log
-from app.core.deps import require_service_admin_or_higher, get_current_user
+from app.core.deps import require_service_admin_or_higher, get_current_user, get_principal
+from app.core.principal import Principal
+from app.core import columnar
 from app.schemas.service import Product, ProductCreateWithUrl, ProductCreate
 from app.models.service import Product as ProductModel, Service as ServiceModel
 from app.models.user import User
@@ -21,6 +26,7 @@ router = APIRouter()
 def create_product(
     product_in: ProductCreateWithUrl,
     current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -28,9 +34,7 @@ def create_product(
     Only Admin can create products.
     """
     # Check if user is Admin (only Admin can create products)
-    from app.core.deps import get_user_roles
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can create products"
@@ -61,7 +65,6 @@ def create_product(
 
     # Load service relationship and get status name
     from app.models.payment import ProductStatus
-    from app.crud import payment_info
 
     service_name = new_product.service.name if new_product.service else None
 
@@ -74,7 +77,7 @@ def create_product(
             status_name = status_obj.name
 
     # Get latest payment info (the one we just created)
-    latest_payment = payment_info.get_latest_by_product(db, new_product.id)
+    latest_payment = new_product.latest_payment
     latest_payment_date = None
     latest_usage_start = None
     latest_usage_end = None
@@ -159,37 +162,36 @@ def get_product_details(
 
 
 @router.get("", response_model=dict)
-def get_products(
+async def get_products(
     serviceId: Optional[uuid.UUID] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
+    format: Optional[str] = Query(None, pattern=columnar.FORMAT_PATTERN, description="'columnar' for one array per field"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get all products that the current user has access to.
     Optionally filter by serviceId and search by product name.
     Includes product status and latest payment information.
-    Supports pagination.
+    Supports page/limit or cursor pagination, ordered by product name.
+    format=columnar returns one array per field with dictionary-encoded strings.
     """
-    from app.crud import payment_info
     from app.models.payment import ProductStatus
 
-    # Get user roles from database
-    from app.core.deps import get_user_roles
-    user_role_names = get_user_roles(current_user.id, db)
-    is_admin = any(role in user_role_names for role in [
-                   'Admin', 'ServiceAdmin'])
+    is_admin = principal.has_any_role('Admin', 'ServiceAdmin')
 
     skip = (page - 1) * limit
     if serviceId:
-        products, total = crud_product.get_by_service(
-            db, service_id=serviceId, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search
+        products, total = await crud_product.get_by_service_async(
+            db, service_id=serviceId, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search, cursor=cursor
         )
     else:
-        products, total = crud_product.get_products_for_user(
-            db, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search
+        products, total = await crud_product.get_products_for_user_async(
+            db, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search, cursor=cursor
         )
 
     # Add service_name, status, and latest payment info to each product
@@ -198,13 +200,12 @@ def get_products(
         # Get product status name
         status_name = None
         if product.status_id:
-            status_obj = db.query(ProductStatus).filter(
-                ProductStatus.id == product.status_id).first()
+            status_obj = await db.get(ProductStatus, product.status_id)
             if status_obj:
                 status_name = status_obj.name
 
-        # Get latest payment info
-        latest_payment = payment_info.get_latest_by_product(db, product.id)
+        # Latest payment info (joined in by the product query)
+        latest_payment = product.latest_payment
         latest_payment_date = None
         latest_usage_start = None
         latest_usage_end = None
@@ -247,13 +248,18 @@ def get_products(
         }
         result.append(product_dict)
 
+    pagination = {
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "nextCursor": products.next_cursor
+    }
+    if format == columnar.COLUMNAR:
+        return columnar.columnar_response(
+            result, ["service_id", "service_name", "status_id", "status"], pagination=pagination)
     return {
         "data": result,
-        "pagination": {
-            "total": total,
-            "page": page,
-            "limit": limit
-        }
+        "pagination": pagination
     }
 
 
@@ -262,15 +268,14 @@ def update_product(
     product_id: uuid.UUID,
     product_in: ProductCreateWithUrl,
     current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
     Update a product. Only Admin can update products.
     """
     # Check if user is Admin (only Admin can update products)
-    from app.core.deps import get_user_roles
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can update products"
@@ -317,8 +322,7 @@ def update_product(
 
     updated_product = crud_product.update_with_admins(
         db, db_obj=product, obj_in=product_update)
-    db.commit()
-    db.refresh(updated_product)
+    commit_or_flush(db, updated_product)
 
     # Load service relationship
     if updated_product.service:
@@ -335,8 +339,7 @@ def update_product(
             status_name = status_obj.name
 
     # Get latest payment info
-    from app.crud import payment_info
-    latest_payment = payment_info.get_latest_by_product(db, updated_product.id)
+    latest_payment = updated_product.latest_payment
     latest_payment_date = None
     latest_usage_start = None
     latest_usage_end = None
@@ -390,6 +393,7 @@ def update_product(
 def delete_product(
     product_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -400,9 +404,7 @@ def delete_product(
     - Permission assignments and department assignments are CASCADE deleted
     """
     # Check if user is Admin (only Admin can delete products)
-    from app.core.deps import get_user_roles
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can delete products"
@@ -465,6 +467,7 @@ class ImportResult(BaseModel):
 async def import_products(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -474,9 +477,7 @@ async def import_products(
     Each imported product will automatically create an incomplete payment record.
     """
     # Check if user is Admin (only Admin can import products)
-    from app.core.deps import get_user_roles
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can import products"
@@ -642,7 +643,7 @@ async def import_products(
         for row_data in validated_rows:
             try:
                 # Create product directly without using create_with_payment_info
-                # (which calls db.commit() internally)
+                # (which commits or flushes internally)
                 product_data = {
                     'name': row_data['product_name'],
                     'url': None,  # URL is not provided in import
@@ -1,10 +1,12 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.db.database import get_db
+from app.db.routing import get_read_db
 from app.crud import service, product, audit_log
-from app.core.deps import require_any_admin_role, require_service_admin_or_higher, get_user_roles
+from app.core.deps import require_any_admin_role, require_service_admin_or_higher, get_current_principal
+from app.core.principal import Principal
 from app.schemas.service import Service, ServiceCreate, ServiceUpdate, ServiceWithProducts, Product, ProductCreate, ProductUpdate
 from app.models.service import Service as ServiceModel
 from app.models.user import User
@@ -21,26 +23,28 @@ def read_services(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
     current_user: User = Depends(require_any_admin_role),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve services filtered by user permissions with their products.
-    Supports pagination and search by service name.
+    Supports page/limit or cursor pagination (ordered by name) and search by service name.
     """
-    user_roles = get_user_roles(current_user.id, db)
-    is_admin = "Admin" in user_roles
+    is_admin = principal.is_admin
 
     skip = (page - 1) * limit
     services, total = service.get_services_for_user(
-        db, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search)
+        db, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, search=search, cursor=cursor)
 
     return {
         "data": services,
         "pagination": {
             "total": total,
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "nextCursor": services.next_cursor
         }
     }
 
@@ -49,14 +53,14 @@ def read_services(
 def create_service(
     service_in: ServiceCreate,
     current_user: User = Depends(require_any_admin_role),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
     Create new service and optionally associate products.
     """
     # Check if user is Admin (only Admin can create services)
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can create services"
@@ -94,13 +98,13 @@ def create_service(
 def read_service(
     service_id: uuid.UUID,
     current_user: User = Depends(require_any_admin_role),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get service by ID with products filtered by user permissions.
     """
-    user_roles = get_user_roles(current_user.id, db)
-    is_admin = "Admin" in user_roles
+    is_admin = principal.is_admin
 
     service_with_products = service.get_with_products(
         db, service_id=service_id, user_id=current_user.id, is_admin=is_admin
@@ -120,14 +124,14 @@ def update_service(
     service_id: uuid.UUID,
     service_update: ServiceUpdate,
     current_user: User = Depends(require_any_admin_role),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
     Update service and manage product associations.
     """
     # Check if user is Admin (only Admin can update services)
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can update services"
@@ -183,14 +187,14 @@ def update_service(
 def delete_service(
     service_id: uuid.UUID,
     current_user: User = Depends(require_any_admin_role),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
     Delete service - only allowed if no products are associated.
     """
     # Check if user is Admin (only Admin can delete services)
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can delete services"
@@ -266,6 +270,7 @@ def read_product(
     service_id: uuid.UUID,
     product_id: uuid.UUID,
     current_user: User = Depends(require_any_admin_role),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -279,10 +284,7 @@ def read_product(
         )
 
     # Check permissions
-    user_roles = get_user_roles(current_user.id, db)
-    is_admin = "Admin" in user_roles
-
-    if not is_admin and not product.user_can_access(db, product_id=product_id, user_id=current_user.id):
+    if not principal.can_access_product(product_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied to this product"
@@ -363,6 +365,7 @@ class ImportResult(BaseModel):
 async def import_services(
     file: UploadFile = File(...),
     current_user: User = Depends(require_any_admin_role),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -370,8 +373,7 @@ async def import_services(
     Excel file should have two columns: Service (service name) and Administrators (comma-separated admin names).
     """
     # Check if user is Admin (only Admin can import services)
-    user_roles = get_user_roles(current_user.id, db)
-    if "Admin" not in user_roles:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only Admin can import services"
@@ -1,8 +1,13 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from app.db.database import get_db
+from app.db.unit_of_work import commit_or_flush
+from app.core.principal import invalidate_principal
+from app.core import columnar
+from app.db.routing import get_async_read_db
 from app.crud import user, audit_log
 from app.core.deps import require_any_admin_role, require_admin, get_user_roles
 from app.schemas.user import User, UserCreate, UserUpdate, UserPermissionUpdate, UserUpdateV2
@@ -19,7 +24,7 @@ router = APIRouter()
 
 
 @router.get("", response_model=dict)
-def read_users(
+async def read_users(
     search: Optional[str] = Query(None),
     productId: Optional[uuid.UUID] = Query(None),
     productName: Optional[str] = Query(None),
@@ -28,41 +33,55 @@ def read_users(
     sortBy: Optional[str] = Query(None),
     sortOrder: Optional[str] = Query("asc"),
     is_active: Optional[bool] = Query(True, description="Filter by active status (default: true)"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
+    format: Optional[str] = Query(None, pattern=columnar.FORMAT_PATTERN, description="'columnar' for one array per field"),
     current_user: UserModel = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Retrieve users with pagination and search.
+    Retrieve users with page/limit or cursor pagination and search.
     Optionally filter by productId, productName, is_active status, and sort by column.
     Returns statistics: total, active, and inactive user counts.
+    format=columnar returns one array per field with dictionary-encoded strings.
     """
+    from app.models.user import Role, UserRole
+
     skip = (page - 1) * limit
     
     # Get statistics (total, active, inactive counts)
-    stats = user.get_user_statistics(db, search=search, product_id=productId, product_name=productName)
+    stats = await user.get_user_statistics_async(db, search=search, product_id=productId, product_name=productName)
     
     # Get filtered users
-    users = user.search_users(
+    users = await user.search_users_async(
         db, search=search, product_id=productId, product_name=productName, skip=skip, limit=limit, 
-        sort_by=sortBy, sort_order=sortOrder, is_active=is_active)
+        sort_by=sortBy, sort_order=sortOrder, is_active=is_active, cursor=cursor)
+
+    # Load roles, product assignments and SAP IDs for the whole page at once
+    user_ids = [u.id for u in users]
+    roles_by_user = {user_id: [] for user_id in user_ids}
+    products_by_user = {user_id: [] for user_id in user_ids}
+    sap_ids_by_user = {user_id: [] for user_id in user_ids}
+    if user_ids:
+        role_rows = await db.execute(
+            select(UserRole.user_id, Role.name).join(Role, UserRole.role_id == Role.id).where(
+                UserRole.user_id.in_(user_ids)))
+        for user_id, role_name in role_rows:
+            roles_by_user[user_id].append(role_name)
+
+        assignment_rows = await db.execute(
+            select(PermissionAssignment.user_id, PermissionAssignment.product_id).where(
+                PermissionAssignment.user_id.in_(user_ids),
+                PermissionAssignment.product_id.isnot(None)))
+        for user_id, product_id in assignment_rows:
+            products_by_user[user_id].append(str(product_id))
+
+        sap_rows = await db.execute(
+            select(SapUser.user_id, SapUser.sap_id).where(SapUser.user_id.in_(user_ids)))
+        for user_id, sap_id in sap_rows:
+            sap_ids_by_user[user_id].append(sap_id)
 
     user_data = []
     for u in users:
-        # Get roles for this user
-        roles = get_user_roles(u.id, db)
-
-        # Get assigned product IDs
-        from app.models.permission import PermissionAssignment
-        product_assignments = db.query(PermissionAssignment).filter(
-            PermissionAssignment.user_id == u.id,
-            PermissionAssignment.product_id.isnot(None)
-        ).all()
-        assigned_product_ids = [str(a.product_id) for a in product_assignments]
-
-        # Get SAP IDs for this user
-        sap_users = db.query(SapUser).filter(SapUser.user_id == u.id).all()
-        sap_ids = [sap.sap_id for sap in sap_users]
-
         # v3: Get department name from relationship if department_id is set
         # Legacy field (for backward compatibility)
         department_name = u.department
@@ -79,27 +98,34 @@ def read_users(
             "hire_date": u.hire_date.isoformat() if u.hire_date else None,
             "resignation_date": u.resignation_date.isoformat() if u.resignation_date else None,
             "is_active": u.is_active,
-            "roles": roles,
-            "assignedProductIds": assigned_product_ids,
-            "sap_ids": sap_ids
+            "roles": roles_by_user[u.id],
+            "assignedProductIds": products_by_user[u.id],
+            "sap_ids": sap_ids_by_user[u.id]
         })
 
     # Get total count for current filter
-    total_filtered = len(user.search_users(db, search=search, product_id=productId, product_name=productName,
-                      skip=0, limit=1000, sort_by=None, sort_order=None, is_active=is_active))
-
+    total_filtered = await user.count_users_async(
+        db, search=search, product_id=productId, product_name=productName, is_active=is_active)
+
+    pagination = {
+        "total": total_filtered,
+        "page": page,
+        "limit": limit,
+        "nextCursor": users.next_cursor
+    }
+    statistics = {
+        "total": stats["total"],
+        "active": stats["active"],
+        "inactive": stats["inactive"]
+    }
+    if format == columnar.COLUMNAR:
+        return columnar.columnar_response(
+            user_data, ["department", "department_id", "position"],
+            pagination=pagination, statistics=statistics)
     return {
         "data": user_data,
-        "pagination": {
-            "total": total_filtered,
-            "page": page,
-            "limit": limit
-        },
-        "statistics": {
-            "total": stats["total"],
-            "active": stats["active"],
-            "inactive": stats["inactive"]
-        }
+        "pagination": pagination,
+        "statistics": statistics
     }
 
 
@@ -154,7 +180,7 @@ def create_user(
                 )
                 db.add(manual_assignment)
         
-        db.commit()
+        commit_or_flush(db)
 
     # Log the action
     audit_log.log_action(
@@ -292,6 +318,9 @@ def update_user(
             detail="User not found"
         )
 
+    # Profile, role, department and product changes all affect the cached principal
+    invalidate_principal(db, user_id)
+
     # Update basic fields - database trigger will handle department product sync
     basic_update = UserUpdate(
         name=user_update.name,
@@ -359,7 +388,7 @@ def update_user(
                 # 将部门分配改为手动分配，避免被后续部门同步覆盖
                 existing.assignment_source = 'manual'
         
-        db.commit()
+        commit_or_flush(db)
 
     # Log the action
     update_details = user_update.model_dump(exclude_unset=True)
@@ -405,6 +434,7 @@ def delete_user(
             detail="User not found"
         )
 
+    invalidate_principal(db, user_id)
     user.remove(db, id=user_id)
 
     # Log the action
@@ -571,6 +601,8 @@ async def import_product_assignments(
             for assignment in assignments_to_create:
                 new_assignment = PermissionAssignment(**assignment)
                 db.add(new_assignment)
+            invalidate_principal(
+                db, *{assignment['user_id'] for assignment in assignments_to_create})
             db.commit()
             success_count = len(assignments_to_create)
         except Exception as e:
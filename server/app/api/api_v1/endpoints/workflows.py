@@ -5,6 +5,9 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import case
 from app.db.database import get_db
+from app.db.unit_of_work import commit_or_flush
+from app.crud.pagination import SortKey, apply_keyset, build_page
+from app.core.principal import invalidate_principal
 from app.crud import workflow_task, user, audit_log, department
 from app.core.deps import get_current_active_user, require_admin, verify_hr_webhook_key
 from app.core.config import settings
@@ -197,12 +200,14 @@ def read_user_tasks(
     search: Optional[str] = Query(None, description="Search by employee name"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
     Get paginated list of workflow tasks. Returns pending tasks first.
-    Supports filtering by status and searching by employee name.
+    Supports filtering by status and searching by employee name,
+    and page/limit or cursor pagination.
     """
     from app.models.workflow import WorkflowTask as WorkflowTaskModel
 
@@ -218,24 +223,30 @@ def read_user_tasks(
         query = query.filter(
             WorkflowTaskModel.employee_name.ilike(f"%{search}%"))
 
-    # Sort: pending first, then by created_at descending
-    query = query.order_by(
-        case((WorkflowTaskModel.status == 'pending', 1), else_=0).desc(),
-        WorkflowTaskModel.created_at.desc()
-    )
-
     # Get total count
     total = query.count()
 
-    # Apply pagination
-    tasks = query.offset((page - 1) * limit).limit(limit).all()
+    # Sort: pending first, then by created_at descending, id as tie-breaker
+    keys = [
+        SortKey(case((WorkflowTaskModel.status == 'pending', 1), else_=0),
+                lambda t: 1 if t.status == 'pending' else 0, descending=True),
+        SortKey(WorkflowTaskModel.created_at, lambda t: t.created_at, descending=True),
+        SortKey(WorkflowTaskModel.id, lambda t: t.id, descending=True),
+    ]
+    query = apply_keyset(query, keys, cursor)
+
+    # Apply pagination; a cursor replaces the page offset
+    if not cursor:
+        query = query.offset((page - 1) * limit)
+    tasks = build_page(query.limit(limit + 1).all(), keys, limit)
 
     return {
         "data": [WorkflowTask.from_orm(task) for task in tasks],
         "pagination": {
             "total": total,
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "nextCursor": tasks.next_cursor
         }
     }
 
@@ -605,6 +616,9 @@ def complete_task(
         else:
             target_user = user.get(db, existing_task.target_user_id)
             if target_user:
+                # Deactivation and permission removal below change the cached principal
+                invalidate_principal(db, target_user.id)
+
                 # Get all current product assignments
                 permissions = db.query(PermissionAssignment).filter(
                     PermissionAssignment.user_id == existing_task.target_user_id,
@@ -640,7 +654,7 @@ def complete_task(
                     # Set resignation date and is_active to False
                     target_user.resignation_date = existing_task.employee_resignation_date
                     target_user.is_active = False
-                    db.commit()
+                    commit_or_flush(db)
 
                     # Log status change (audit trail)
                     audit_log.log_action(
@@ -673,7 +687,7 @@ def complete_task(
                     # Set resignation date (keep user active for partial offboarding)
                     target_user.resignation_date = existing_task.employee_resignation_date
                     # Note: For partial offboarding, user remains active (is_active=True)
-                    db.commit()
+                    commit_or_flush(db)
 
                     # Remove only the selected product permissions
                     if product_ids_to_remove:
@@ -682,7 +696,7 @@ def complete_task(
                             PermissionAssignment.product_id.in_(
                                 product_ids_to_remove)
                         ).delete(synchronize_session=False)
-                        db.commit()
+                        commit_or_flush(db)
 
                     # IMPORTANT: For partial offboarding, save snapshot of REMAINING products only
                     # (not all original products, so completed task shows what user still has access to)
@@ -105,27 +105,7 @@ async def upload_invoices(
 
     # After successful uploads, update payment status based on completeness
     try:
-        invoices = payment_invoice.get_by_payment_info_id(
-            db, payment_info_id=payment_info_id)
-        has_invoices = len(invoices) > 0
-
-        if (
-            payment_record.amount is not None and
-            payment_record.cardholder_name and
-            payment_record.payment_method_id and
-            payment_record.payment_date and
-            payment_record.usage_start_date and
-            payment_record.usage_end_date and
-            payment_record.reporter and
-            has_invoices
-        ):
-            if payment_record.status != 'complete':
-                payment_info.update(db, db_obj=payment_record, obj_in={
-                                    "status": "complete"})
-        else:
-            if payment_record.status != 'incomplete':
-                payment_info.update(db, db_obj=payment_record, obj_in={
-                                    "status": "incomplete"})
+        payment_info.refresh_status(db, payment_record)
     except Exception as e:
         print(f"Payment status update error after upload: {e}")
 
@@ -209,30 +189,9 @@ def delete_invoice(
 
     # Re-evaluate payment status after deletion
     try:
-        payment_info_id = invoice.payment_info_id
-        existing_payment_info = payment_info.get(db, payment_info_id)
+        existing_payment_info = payment_info.get(db, invoice.payment_info_id)
         if existing_payment_info:
-            invoices = payment_invoice.get_by_payment_info_id(
-                db, payment_info_id=payment_info_id)
-            has_invoices = len(invoices) > 0
-
-            if (
-                existing_payment_info.amount is not None and
-                existing_payment_info.cardholder_name and
-                existing_payment_info.payment_method_id and
-                existing_payment_info.payment_date and
-                existing_payment_info.usage_start_date and
-                existing_payment_info.usage_end_date and
-                existing_payment_info.reporter and
-                has_invoices
-            ):
-                if existing_payment_info.status != 'complete':
-                    payment_info.update(db, db_obj=existing_payment_info, obj_in={
-                                        "status": "complete"})
-            else:
-                if existing_payment_info.status != 'incomplete':
-                    payment_info.update(db, db_obj=existing_payment_info, obj_in={
-                                        "status": "incomplete"})
+            payment_info.refresh_status(db, existing_payment_info)
     except Exception as e:
         print(f"Payment status update error after delete: {e}")
 
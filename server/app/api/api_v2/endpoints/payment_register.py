@@ -1,11 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.db.routing import get_async_read_db, read_session_factory
 from app.crud import payment_info, payment_invoice, audit_log
+from app.crud.payment import PaymentRegisterFilter
 from app.core.deps import require_admin
 from app.core.config import settings
-from app.schemas.payment import PaymentRegisterItem
+from app.core import columnar, conditional, export
+from app.schemas.payment import PaymentRegisterItem, PaymentBulkUpdate
 from app.schemas.payment_invoice import PaymentInvoiceResponse
 from app.models.user import User
 import uuid
@@ -14,56 +20,307 @@ import aiofiles
 
 router = APIRouter()
 
+# Register fields sent dictionary-encoded in the columnar format
+REGISTER_DICTIONARY_FIELDS = [
+    "productId", "productName", "productDescription", "productStatus", "serviceName", "serviceVendor",
+    "paymentInfo.status", "paymentInfo.paymentMethod", "paymentInfo.paymentMethodDescription",
+    "paymentInfo.currencyCode", "paymentInfo.currencySymbol", "paymentInfo.reporter",
+]
+
+# sortBy values (register item fields)
+SORT_PATTERN = "^(" + "|".join(payment_info.SORT_COLUMNS) + ")$"
+
+
+def register_filter(
+    search: Optional[str] = Query(None, description="Product name contains (case-insensitive)"),
+    status: Optional[List[Literal["incomplete", "complete", "error"]]] = Query(None),
+    currencyId: Optional[List[int]] = Query(None),
+    paymentMethodId: Optional[List[int]] = Query(None),
+    serviceId: Optional[List[uuid.UUID]] = Query(None),
+    vendor: Optional[List[str]] = Query(None),
+    paymentDateFrom: Optional[date] = Query(None),
+    paymentDateTo: Optional[date] = Query(None),
+    usageEndFrom: Optional[date] = Query(None),
+    usageEndTo: Optional[date] = Query(None),
+) -> PaymentRegisterFilter:
+    """Register filters from the query string; list parameters may be repeated (OR within one)."""
+    return PaymentRegisterFilter(
+        search=search,
+        statuses=tuple(status or ()),
+        currency_ids=tuple(currencyId or ()),
+        payment_method_ids=tuple(paymentMethodId or ()),
+        service_ids=tuple(serviceId or ()),
+        vendors=tuple(vendor or ()),
+        payment_date_from=paymentDateFrom,
+        payment_date_to=paymentDateTo,
+        usage_end_from=usageEndFrom,
+        usage_end_to=usageEndTo,
+    )
+
+
 # Storage directory for invoice files (configured via environment variable)
 STORAGE_DIR = settings.INVOICE_STORAGE_DIR
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
 
 @router.get("")
-def read_payment_register_v2(
+async def read_payment_register_v2(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=10000),
-    search: str = Query(None),
+    filters: PaymentRegisterFilter = Depends(register_filter),
+    sortBy: Optional[str] = Query(None, pattern=SORT_PATTERN, description="Default: status priority, then newest payment"),
+    sortOrder: Optional[str] = Query("asc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from pagination.nextCursor (empty = first page)"),
+    format: Optional[str] = Query(None, pattern=columnar.FORMAT_PATTERN, description="'columnar' for one array per field"),
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Retrieve all payment records for all products for the payment register v2.
     Returns a flat list where each payment record is a separate item.
     Multiple payments for the same product will appear as multiple items.
-    Supports pagination and search by product name.
+    Supports page/limit or cursor pagination, search by product name, filters
+    (status, currency, payment method, service, vendor, payment date and
+    usage end ranges) and sorting by one column (sortBy/sortOrder).
+    Honors If-None-Match / If-Modified-Since with 304 (one aggregate query).
+    format=columnar returns one array per field with dictionary-encoded strings.
     """
+    validator = await payment_info.get_register_validator_async(db, filters=filters)
+    etag, last_modified = conditional.validators(
+        "register", page, limit, filters, sortBy, sortOrder, cursor, format, *validator)
+    headers = conditional.validator_headers(etag, last_modified)
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(headers)
+    response.headers.update(headers)
+
     # Get all payment records (one-to-many: multiple payments per product)
     skip = (page - 1) * limit
-    payment_register_data, total = payment_info.get_payment_register(
-        db, skip=skip, limit=limit, search=search)
+    # Rows, master data, invoices and total come from one statement
+    payment_register_data, total = await payment_info.get_payment_register_async(
+        db, skip=skip, limit=limit, filters=filters, cursor=cursor, with_invoices=True,
+        sort_by=sortBy, sort_order=sortOrder)
 
-    # Enhance each item with invoice information
+    # Add the download URL to each invoice
     for item in payment_register_data:
-        # Use payment ID instead of product ID
-        payment_info_id = item["paymentId"]
-        invoices = payment_invoice.get_by_payment_info_id(
-            db, payment_info_id=uuid.UUID(payment_info_id))
+        for invoice in item["paymentInfo"]["invoices"]:
+            invoice["url"] = f"/api/v2/invoices/{invoice['id']}"
+
+    pagination = {
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "nextCursor": payment_register_data.next_cursor
+    }
+    if format == columnar.COLUMNAR:
+        return columnar.columnar_response(
+            payment_register_data, REGISTER_DICTIONARY_FIELDS, headers=headers, pagination=pagination)
+    return {
+        "data": payment_register_data,
+        "pagination": pagination
+    }
 
-        # Convert invoices to response format
-        invoice_responses = []
-        for invoice in invoices:
-            invoice_responses.append({
-                "id": str(invoice.id),
-                "original_file_name": invoice.original_file_name,
-                "url": f"/api/v2/invoices/{invoice.id}"
-            })
 
-        # Add invoices to payment info
-        item["paymentInfo"]["invoices"] = invoice_responses
+# Export columns: (header, value taken from a register item)
+EXPORT_COLUMNS = [
+    ("Payment ID", lambda item: item["paymentId"]),
+    ("Product", lambda item: item["productName"]),
+    ("Product Status", lambda item: item["productStatus"]),
+    ("Service", lambda item: item["serviceName"]),
+    ("Vendor", lambda item: item["serviceVendor"]),
+    ("Status", lambda item: item["paymentInfo"]["status"]),
+    ("Amount", lambda item: item["paymentInfo"]["amount"]),
+    ("Currency", lambda item: item["paymentInfo"]["currencyCode"]),
+    ("Payment Method", lambda item: item["paymentInfo"]["paymentMethod"]),
+    ("Cardholder Name", lambda item: item["paymentInfo"]["cardholderName"]),
+    ("Expiry Date", lambda item: item["paymentInfo"]["expiryDate"]),
+    ("Payment Date", lambda item: item["paymentInfo"]["paymentDate"]),
+    ("Usage Start Date", lambda item: item["paymentInfo"]["usageStartDate"]),
+    ("Usage End Date", lambda item: item["paymentInfo"]["usageEndDate"]),
+    ("Reporter", lambda item: item["paymentInfo"]["reporter"]),
+    ("Invoices", lambda item: "; ".join(
+        invoice["original_file_name"] for invoice in item["paymentInfo"]["invoices"])),
+    ("Created At", lambda item: item["paymentInfo"]["createdAt"]),
+    ("Updated At", lambda item: item["paymentInfo"]["updatedAt"]),
+]
+
+
+@router.get("/export")
+def export_payment_register_v2(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    filters: PaymentRegisterFilter = Depends(register_filter),
+    sortBy: Optional[str] = Query(None, pattern=SORT_PATTERN),
+    sortOrder: Optional[str] = Query("asc", pattern="^(asc|desc)$"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Download the whole payment register (same filters and order as the list) as CSV or XLSX.
+    Rows are streamed from a server-side cursor; at most EXPORT_MAX_CONCURRENT
+    exports run at once, further requests get 503.
+    """
+    session_factory = read_session_factory(request)
+
+    def rows():
+        # Own session: the export outlives the request's dependencies
+        db = session_factory()
+        try:
+            for item in payment_info.iter_payment_register(
+                    db, filters=filters, batch_size=settings.EXPORT_BATCH_SIZE,
+                    sort_by=sortBy, sort_order=sortOrder):
+                yield [value(item) for _, value in EXPORT_COLUMNS]
+        finally:
+            db.close()
+
+    # Nothing runs until the first chunk is requested; the stream owns the slot from here
+    body = export.SlotStream(
+        export.stream_export(
+            format, [header for header, _ in EXPORT_COLUMNS], rows(), sheet_title="Payment Register"),
+        export.export_slots.acquire())
+
+    filename = f"payment-register-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/re-evaluate")
+def re_evaluate_payment_register_v2(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-evaluate the completeness of every payment record in one statement,
+    e.g. after master data or the completeness rule changed.
+    Payments that become complete move their Overdue products back to Active.
+    Orphaned payments (status 'error') are left unchanged.
+    """
+    result = payment_info.refresh_completeness(db)
+
+    audit_log.log_action(
+        db,
+        actor_user_id=current_user.id,
+        action="payment_info.re_evaluate",
+        details=result
+    )
 
     return {
-        "data": payment_register_data,
-        "pagination": {
-            "total": total,
-            "page": page,
-            "limit": limit
-        }
+        "completed": result["completed"],
+        "reopened": result["reopened"],
+        "productsActivated": result["products_activated"]
+    }
+
+
+# PaymentPatch field -> payment_info column
+PAYMENT_PATCH_COLUMNS = {
+    "amount": "amount",
+    "cardholderName": "cardholder_name",
+    "expiryDate": "expiry_date",
+    "paymentMethodId": "payment_method_id",
+    "currencyId": "currency_id",
+    "paymentDate": "payment_date",
+    "usageStartDate": "usage_start_date",
+    "usageEndDate": "usage_end_date",
+    "reporter": "reporter",
+}
+
+
+@router.patch("/payments")
+def bulk_update_payments_v2(
+    bulk_in: PaymentBulkUpdate,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Update many payment records in one transaction (e.g. closing the month).
+    Each item changes only the fields it sends; the reporter defaults to the current user.
+    Items are validated together: unknown or duplicate payment IDs, unknown payment
+    methods or currencies and inverted usage periods are rejected per item, the
+    rest are applied with set-based updates and their completeness is re-evaluated
+    in one pass. Returns one result per item, in request order.
+    """
+    from collections import Counter
+    from sqlalchemy import select
+    from fastapi.encoders import jsonable_encoder
+    from app.models.payment import PaymentInfo, PaymentMethod, Currency
+
+    items = bulk_in.items
+    payment_ids = {item.paymentId for item in items}
+    occurrences = Counter(item.paymentId for item in items)
+    existing = {
+        row.id: row for row in db.execute(
+            select(PaymentInfo.id, PaymentInfo.usage_start_date, PaymentInfo.usage_end_date)
+            .where(PaymentInfo.id.in_(payment_ids))
+        )
+    }
+    method_ids = {item.paymentMethodId for item in items if item.paymentMethodId is not None}
+    known_methods = set(db.execute(
+        select(PaymentMethod.id).where(PaymentMethod.id.in_(method_ids))).scalars()) if method_ids else set()
+    currency_ids = {item.currencyId for item in items if item.currencyId is not None}
+    known_currencies = set(db.execute(
+        select(Currency.id).where(Currency.id.in_(currency_ids))).scalars()) if currency_ids else set()
+
+    results = []
+    changes = {}
+    for item in items:
+        fields = item.model_dump(exclude_unset=True, exclude={"paymentId"})
+        payment_changes = {PAYMENT_PATCH_COLUMNS[field]: value for field, value in fields.items()}
+        payment_changes.setdefault("reporter", current_user.name)
+        current = existing.get(item.paymentId)
+
+        error = None
+        if occurrences[item.paymentId] > 1:
+            error = "Payment record appears more than once in the request"
+        elif current is None:
+            error = f"Payment record with ID {item.paymentId} not found"
+        elif not payment_changes.get("reporter"):
+            error = "Reporter cannot be empty"
+        elif "payment_method_id" in payment_changes and payment_changes["payment_method_id"] is not None \
+                and payment_changes["payment_method_id"] not in known_methods:
+            error = f"Payment method {payment_changes['payment_method_id']} not found"
+        elif "currency_id" in payment_changes and payment_changes["currency_id"] is not None \
+                and payment_changes["currency_id"] not in known_currencies:
+            error = f"Currency {payment_changes['currency_id']} not found"
+        else:
+            usage_start = payment_changes.get("usage_start_date", current.usage_start_date)
+            usage_end = payment_changes.get("usage_end_date", current.usage_end_date)
+            if usage_start and usage_end and usage_end < usage_start:
+                error = "Usage end date must not be before the usage start date"
+
+        if error:
+            results.append({"paymentId": str(item.paymentId), "result": "rejected", "message": error})
+        else:
+            changes[item.paymentId] = payment_changes
+            results.append({"paymentId": str(item.paymentId), "result": "updated"})
+
+    if changes:
+        payment_info.bulk_update(db, changes=changes)
+        # Completeness (and Overdue -> Active) for every updated payment in one pass
+        payment_info.refresh_completeness(db, payment_ids=list(changes))
+        statuses = dict(db.execute(
+            select(PaymentInfo.id, PaymentInfo.status).where(PaymentInfo.id.in_(list(changes)))).all())
+        for result in results:
+            if result["result"] == "updated":
+                result["status"] = statuses[uuid.UUID(result["paymentId"])]
+
+        audit_log.log_action(
+            db,
+            actor_user_id=current_user.id,
+            action="payment_info.bulk_update",
+            details={
+                "updated": len(changes),
+                "payments": jsonable_encoder(
+                    {str(payment_id): payment_changes for payment_id, payment_changes in changes.items()})
+            }
+        )
+
+    return {
+        "updated": len(changes),
+        "rejected": len(results) - len(changes),
+        "results": results
     }
 
 
@@ -126,55 +383,8 @@ def update_payment_by_id_v2(
     updated_obj = payment_info.update(
         db, db_obj=existing_payment_info, obj_in=update_data)
 
-    # Check for completeness - now includes invoice requirement
-    # Note: expiry_date is optional (credit card expiry), not required for completeness
-    product_id = existing_payment_info.product_id
-    invoices = payment_invoice.get_by_product_id(db, product_id=product_id)
-    has_invoices = len(invoices) > 0
-
-    # Store old status for comparison
-    old_status = updated_obj.status
-
-    if (
-        updated_obj.amount is not None and
-        updated_obj.cardholder_name and
-        updated_obj.payment_method_id and
-        updated_obj.payment_date and
-        updated_obj.usage_start_date and
-        updated_obj.usage_end_date and
-        updated_obj.reporter and
-        has_invoices
-    ):
-        if updated_obj.status != 'complete':
-            payment_info.update(db, db_obj=updated_obj,
-                                obj_in={"status": "complete"})
-
-            # If payment status changed from incomplete to complete, restore product status to Active
-            if old_status == 'incomplete' and product_id:
-                from app.models.payment import ProductStatus
-                from app.models.service import Product
-
-                active_status = db.query(ProductStatus).filter(
-                    ProductStatus.name == 'Active'
-                ).first()
-
-                if active_status:
-                    product = db.query(Product).filter(
-                        Product.id == product_id).first()
-                    if product and product.status_id != active_status.id:
-                        # Only update to Active if current status is Overdue
-                        overdue_status = db.query(ProductStatus).filter(
-                            ProductStatus.name == 'Overdue'
-                        ).first()
-
-                        if overdue_status and product.status_id == overdue_status.id:
-                            product.status_id = active_status.id
-                            db.add(product)
-                            db.commit()
-    else:
-        if updated_obj.status != 'incomplete':
-            payment_info.update(db, db_obj=updated_obj, obj_in={
-                                "status": "incomplete"})
+    # Re-evaluate completeness (including the Overdue -> Active product transition)
+    payment_info.refresh_status(db, updated_obj)
 
     # Log the action
     try:
@@ -265,54 +475,8 @@ def update_payment_info_v2(
         updated_obj = payment_info.update(
             db, db_obj=existing_payment_info, obj_in=update_data)
 
-    # Check for completeness - now includes invoice requirement
-    # Note: expiry_date is optional (credit card expiry), not required for completeness
-    invoices = payment_invoice.get_by_product_id(db, product_id=product_id)
-    has_invoices = len(invoices) > 0
-
-    # Store old status for comparison
-    old_status = updated_obj.status
-
-    if (
-        updated_obj.amount is not None and
-        updated_obj.cardholder_name and
-        updated_obj.payment_method_id and
-        updated_obj.payment_date and
-        updated_obj.usage_start_date and
-        updated_obj.usage_end_date and
-        updated_obj.reporter and
-        has_invoices
-    ):
-        if updated_obj.status != 'complete':
-            payment_info.update(db, db_obj=updated_obj,
-                                obj_in={"status": "complete"})
-
-            # If payment status changed from incomplete to complete, restore product status to Active
-            if old_status == 'incomplete':
-                from app.models.payment import ProductStatus
-                from app.models.service import Product
-
-                active_status = db.query(ProductStatus).filter(
-                    ProductStatus.name == 'Active'
-                ).first()
-
-                if active_status:
-                    product = db.query(Product).filter(
-                        Product.id == product_id).first()
-                    if product and product.status_id != active_status.id:
-                        # Only update to Active if current status is Overdue
-                        overdue_status = db.query(ProductStatus).filter(
-                            ProductStatus.name == 'Overdue'
-                        ).first()
-
-                        if overdue_status and product.status_id == overdue_status.id:
-                            product.status_id = active_status.id
-                            db.add(product)
-                            db.commit()
-    else:
-        if updated_obj.status != 'incomplete':
-            payment_info.update(db, db_obj=updated_obj, obj_in={
-                                "status": "incomplete"})
+    # Re-evaluate completeness (including the Overdue -> Active product transition)
+    payment_info.refresh_status(db, updated_obj)
 
     # Log the action
     try:
@@ -340,16 +504,25 @@ def update_payment_info_v2(
 @router.get("/products/{product_id}/payments")
 def get_product_payments(
     product_id: uuid.UUID,
+    request: Request,
+    response: Response,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
     Get all payment records for a specific product.
     Returns multiple payments for one-to-many relationship.
+    Honors If-None-Match / If-Modified-Since with 304 (one aggregate query).
     """
     from app.models.payment import ProductStatus, PaymentMethod
     from app.models.service import Product, Service
 
+    validator = payment_info.get_register_validator(db, product_id=product_id)
+    etag, last_modified = conditional.validators("product-payments", product_id, *validator)
+    headers = conditional.validator_headers(etag, last_modified)
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(headers)
+
     # Get all payments for this product
     payments = payment_info.get_by_product(db, product_id)
 
@@ -388,9 +561,9 @@ def get_product_payments(
                 currency_code = currency.code
                 currency_symbol = currency.symbol
 
-        # Get invoices for this specific payment record
+        # Get invoices for this specific payment record (only when it has any)
         invoices = payment_invoice.get_by_payment_info_id(
-            db, payment_info_id=payment.id)
+            db, payment_info_id=payment.id) if payment.invoice_count else []
         invoice_responses = []
         for invoice in invoices:
             invoice_responses.append({
@@ -435,10 +608,13 @@ def get_product_payments(
                 "reporter": payment.reporter,
                 "invoices": invoice_responses,
                 "createdAt": payment.created_at.isoformat() if payment.created_at else None,
-                "updatedAt": payment.updated_at.isoformat() if payment.updated_at else None
+                "updatedAt": payment.updated_at.isoformat() if payment.updated_at else None,
+                "invoiceCount": payment.invoice_count,
+                "lastInvoiceAt": payment.last_invoice_at.isoformat() if payment.last_invoice_at else None
             }
         })
 
+    response.headers.update(headers)
     return result
 
 
@@ -488,21 +664,7 @@ def create_payment_for_product(
     new_payment = payment_info.create(db, obj_in=payment_create)
 
     # Check for completeness
-    invoices = payment_invoice.get_by_product_id(db, product_id=product_id)
-    has_invoices = len(invoices) > 0
-
-    if (
-        new_payment.amount is not None and
-        new_payment.cardholder_name and
-        new_payment.payment_method_id and
-        new_payment.payment_date and
-        new_payment.usage_start_date and
-        new_payment.usage_end_date and
-        new_payment.reporter and
-        has_invoices
-    ):
-        payment_info.update(db, db_obj=new_payment,
-                            obj_in={"status": "complete"})
+    payment_info.refresh_status(db, new_payment)
 
     # Log the action
     try:
@@ -609,54 +771,7 @@ async def upload_invoices(
         existing_payment_info = payment_info.get_latest_by_product(
             db, product_id)
         if existing_payment_info:
-            # Check for completeness - now includes invoice requirement
-            invoices = payment_invoice.get_by_product_id(
-                db, product_id=product_id)
-            has_invoices = len(invoices) > 0
-
-            # Store old status for comparison
-            old_status = existing_payment_info.status
-
-            if (
-                existing_payment_info.amount is not None and
-                existing_payment_info.cardholder_name and
-                existing_payment_info.payment_method_id and
-                existing_payment_info.payment_date and
-                existing_payment_info.usage_start_date and
-                existing_payment_info.usage_end_date and
-                existing_payment_info.reporter and
-                has_invoices
-            ):
-                if existing_payment_info.status != 'complete':
-                    payment_info.update(db, db_obj=existing_payment_info,
-                                        obj_in={"status": "complete"})
-
-                    # If payment status changed from incomplete to complete, restore product status to Active
-                    if old_status == 'incomplete':
-                        from app.models.payment import ProductStatus
-                        from app.models.service import Product
-
-                        active_status = db.query(ProductStatus).filter(
-                            ProductStatus.name == 'Active'
-                        ).first()
-
-                        if active_status:
-                            product = db.query(Product).filter(
-                                Product.id == product_id).first()
-                            if product and product.status_id != active_status.id:
-                                # Only update to Active if current status is Overdue
-                                overdue_status = db.query(ProductStatus).filter(
-                                    ProductStatus.name == 'Overdue'
-                                ).first()
-
-                                if overdue_status and product.status_id == overdue_status.id:
-                                    product.status_id = active_status.id
-                                    db.add(product)
-                                    db.commit()
-            else:
-                if existing_payment_info.status != 'incomplete':
-                    payment_info.update(db, db_obj=existing_payment_info, obj_in={
-                        "status": "incomplete"})
+            payment_info.refresh_status(db, existing_payment_info)
     except Exception as e:
         print(f"Payment status update error: {e}")
         # Don't fail the whole operation for status update issues
@@ -0,0 +1,81 @@
+"""Columnar (struct-of-arrays) responses for large list endpoints.
+
+List endpoints accept ``?format=columnar``.  Instead of one object per row
+the response carries one array per field, so key names appear once:
+
+    {
+        "format": "columnar",
+        "rowCount": 2,
+        "data": {"id": ["a", "b"], "paymentInfo.status": [0, 1], ...},
+        "dictionaries": {"paymentInfo.status": ["complete", "incomplete"]},
+        "pagination": {...}
+    }
+
+Nested objects are flattened into dotted field names (one level); lists
+stay per-row values.  Fields listed as dictionary fields hold indexes into
+``dictionaries[field]`` (null stays null), which keeps repeated strings
+such as service names or statuses to one copy each.  Values are converted
+to JSON types here (the same way pydantic serializes the row format), so
+the response skips FastAPI's generic encoder.
+"""
+from typing import Dict, Iterable, List, Optional
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+
+COLUMNAR = "columnar"
+# Query pattern for endpoints offering both formats
+FORMAT_PATTERN = "^(json|columnar)$"
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _plain(value):
+    if isinstance(value, _JSON_SCALARS):
+        return value
+    return to_jsonable_python(value)
+
+
+def _flatten(row: dict) -> dict:
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            for child, child_value in value.items():
+                flat[f"{key}.{child}"] = child_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def to_columnar(rows: List[dict], dictionary_fields: Iterable[str] = ()) -> dict:
+    """Turn row dicts into {"rowCount", "data", "dictionaries"}."""
+    dictionary_fields = set(dictionary_fields)
+    data: Dict[str, list] = {}
+    codes: Dict[str, Dict[object, int]] = {field: {} for field in dictionary_fields}
+
+    for index, row in enumerate(rows):
+        for field, value in _flatten(row).items():
+            column = data.get(field)
+            if column is None:
+                # Field first seen in this row: earlier rows did not have it
+                column = data[field] = [None] * index
+            value = _plain(value)
+            if field in dictionary_fields and value is not None:
+                value = codes[field].setdefault(value, len(codes[field]))
+            column.append(value)
+        for column in data.values():
+            if len(column) <= index:
+                column.append(None)
+
+    return {
+        "rowCount": len(rows),
+        "data": data,
+        "dictionaries": {field: list(values) for field, values in codes.items() if field in data},
+    }
+
+
+def columnar_response(rows: List[dict], dictionary_fields: Iterable[str] = (),
+                      headers: Optional[dict] = None, **extra) -> JSONResponse:
+    """JSONResponse with the columnar body plus extra top-level keys (e.g. pagination)."""
+    content = {"format": COLUMNAR, **to_columnar(rows, dictionary_fields), **_plain(extra)}
+    return JSONResponse(content=content, headers=headers)
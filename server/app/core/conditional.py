@@ -0,0 +1,61 @@
+"""Conditional GET support (ETag / Last-Modified, 304 Not Modified).
+
+Endpoints compute a cheap validator for what they are about to return
+(typically counts and latest update times from one aggregate query), turn
+it into an ETag and Last-Modified with `validators`, ask `is_not_modified`
+before building the response and answer 304 when the client's copy is
+still current.  Responses carry ``Cache-Control: private, no-cache`` so
+browsers keep the body but revalidate every time.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import Request, Response
+
+
+def validators(*parts) -> Tuple[str, Optional[datetime]]:
+    """ETag over all parts and Last-Modified as the latest datetime among them.
+
+    The ETag is weak: equal validators mean equal JSON, not identical bytes.
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    timestamps = [part for part in parts if isinstance(part, datetime)]
+    return f'W/"{digest}"', max(timestamps) if timestamps else None
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" matches "x"
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Whether the client's cached copy is current (If-None-Match wins over If-Modified-Since)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
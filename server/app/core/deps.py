@@ -1,9 +1,13 @@
 from typing import Optional
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, Request, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.core.security import verify_token_flexible
+from app.core.principal import (
+    Principal, load_principal, principal_cache, provisioned_azure_identities, ADMIN_ROLE, SERVICE_ADMIN_ROLE)
+from app.core.perm_version import perm_versions
+from app.crud import user as crud_user
 from app.models.user import User, Role, UserRole
 from app.models.permission import PermissionAssignment
 from app.core.config import settings
@@ -15,81 +19,63 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
-def get_current_user(
+def _azure_identity(payload: dict) -> str:
+    email = payload.get("email")
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email not found in Azure AD token",
+        )
+    return payload.get("azure_id") or email
+
+
+def _provision_azure_user(db: Session, payload: dict) -> uuid.UUID:
+    """User id for a verified Azure AD token, provisioning the account on first sight."""
+    identity = _azure_identity(payload)
+    user_id = provisioned_azure_identities.get(identity)
+    if user_id is None:
+        user_id = crud_user.provision_azure(
+            db, email=payload["email"], azure_id=payload.get("azure_id"), name=payload.get("name")).id
+        provisioned_azure_identities.put(identity, user_id)
+    return user_id
+
+
+def _load_principal_cached(db: Session, user_id: uuid.UUID, claims: Optional[dict] = None) -> Optional[Principal]:
+    principal = principal_cache.get(db, user_id)
+    if principal is None:
+        generation = principal_cache.generation
+        roles = roles_version = None
+        # Role claims count only while the token's permission version is current
+        if claims and isinstance(claims.get("roles"), list) and perm_versions.is_current(user_id, claims.get("pv")):
+            roles, roles_version = claims["roles"], claims["pv"]
+        principal = load_principal(db, user_id, roles=roles, roles_version=roles_version)
+        if principal is not None:
+            principal_cache.put(principal, generation)
+    return principal
+
+
+def get_principal(
+    request: Request,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
-    """Get current authenticated user - supports both JWT and Azure AD tokens."""
+) -> Principal:
+    """Authenticate the request and load its principal (user, roles, permissions).
+
+    Supports both JWT and Azure AD tokens. The principal is memoized on
+    request.state, so every dependency and handler of the request shares it,
+    and kept in the cross-request principal cache.
+    """
+    cached = getattr(request.state, "principal", None)
+    if cached is not None:
+        return cached
+
     token = credentials.credentials
 
     # Try to verify token (supports both JWT and Azure AD)
     payload, token_type = verify_token_flexible(token)
 
     if token_type == "azure":
-        # Azure AD token - find or create user
-        email = payload.get("email")
-        azure_id = payload.get("azure_id")
-        name = payload.get("name")
-
-        if not email:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Email not found in Azure AD token",
-            )
-
-        # Find user by email or azure_id
-        user = db.query(User).filter(
-            (User.email == email) | (User.azure_id == azure_id)
-        ).first()
-
-        is_new_azure_user = False
-        if user is None:
-            # Auto-create Azure user
-            logger.info(f"Auto-creating Azure AD user: {email}")
-            user = User(
-                email=email,
-                name=name or email.split("@")[0],
-                azure_id=azure_id,
-                password_hash=None,  # Azure users don't have password
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            logger.info(f"Created Azure AD user with ID: {user.id}")
-            is_new_azure_user = True
-        else:
-            # Update azure_id if not set
-            if user.azure_id is None and azure_id:
-                user.azure_id = azure_id
-                db.commit()
-                is_new_azure_user = True
-                logger.info(
-                    f"Updated existing user {user.id} with Azure ID: {azure_id}")
-
-        # Auto-assign Admin role to Azure users who successfully logged in
-        if is_new_azure_user or (user.azure_id is not None):
-            # Check if user already has Admin role
-            existing_admin_role = db.query(UserRole).join(Role).filter(
-                UserRole.user_id == user.id,
-                Role.name == "Admin"
-            ).first()
-
-            if not existing_admin_role:
-                # Get Admin role (id=1)
-                admin_role = db.query(Role).filter(
-                    Role.name == "Admin").first()
-                if admin_role:
-                    user_role = UserRole(
-                        user_id=user.id, role_id=admin_role.id)
-                    db.add(user_role)
-                    db.commit()
-                    logger.info(
-                        f"Assigned Admin role to Azure user {user.id} ({email})")
-                else:
-                    logger.warning(f"Admin role not found in database")
-
-        return user
-
+        user_uuid = _provision_azure_user(db, payload)
     else:  # JWT token
         user_id = payload.get("sub")
         if user_id is None:
@@ -106,80 +92,74 @@ def get_current_user(
                 detail="Invalid user ID format",
             )
 
-        user = db.query(User).filter(User.id == user_uuid).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-            )
+    principal = _load_principal_cached(db, user_uuid, claims=payload if token_type == "jwt" else None)
+    if principal is None and token_type == "azure":
+        # The provisioned account was deleted since; provision it again
+        provisioned_azure_identities.forget(_azure_identity(payload))
+        principal = _load_principal_cached(db, _provision_azure_user(db, payload))
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
 
-        return user
+    request.state.principal = principal
+    return principal
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
-    """Get current active user (either with password hash or Azure ID)."""
+def get_current_user(principal: Principal = Depends(get_principal)) -> User:
+    """Get current authenticated user - supports both JWT and Azure AD tokens."""
+    return principal.user
+
+
+def get_current_principal(principal: Principal = Depends(get_principal)) -> Principal:
+    """Get the principal of an active user (either with password hash or Azure ID)."""
     # Azure users have azure_id but no password_hash
     # Traditional users have password_hash but no azure_id
-    if current_user.password_hash is None and current_user.azure_id is None:
+    if principal.user.password_hash is None and principal.user.azure_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account is not activated for login",
         )
-    return current_user
+    return principal
 
 
-def require_admin(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> User:
-    """Require Admin role."""
-    user_roles = db.query(Role.name).join(UserRole).filter(
-        UserRole.user_id == current_user.id).all()
-    role_names = [role.name for role in user_roles]
+def get_current_active_user(principal: Principal = Depends(get_current_principal)) -> User:
+    """Get current active user (either with password hash or Azure ID)."""
+    return principal.user
 
-    if "Admin" not in role_names:
+
+def require_admin(principal: Principal = Depends(get_current_principal)) -> User:
+    """Require Admin role."""
+    if not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required",
         )
 
-    return current_user
+    return principal.user
 
 
-def require_service_admin_or_higher(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> User:
+def require_service_admin_or_higher(principal: Principal = Depends(get_current_principal)) -> User:
     """Require ServiceAdmin or Admin role (v2 - simplified)."""
-    user_roles = db.query(Role.name).join(UserRole).filter(
-        UserRole.user_id == current_user.id).all()
-    role_names = [role.name for role in user_roles]
-
-    if not any(role in role_names for role in ["Admin", "ServiceAdmin"]):
+    if not principal.has_any_role(ADMIN_ROLE, SERVICE_ADMIN_ROLE):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Service Administrator or Admin access required",
         )
 
-    return current_user
+    return principal.user
 
 
-def require_any_admin_role(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-) -> User:
+def require_any_admin_role(principal: Principal = Depends(get_current_principal)) -> User:
     """Require any admin role (Admin or ServiceAdmin) - v2 simplified."""
-    user_roles = db.query(Role.name).join(UserRole).filter(
-        UserRole.user_id == current_user.id).all()
-    role_names = [role.name for role in user_roles]
-
-    if not any(role in role_names for role in ["Admin", "ServiceAdmin"]):
+    if not principal.has_any_role(ADMIN_ROLE, SERVICE_ADMIN_ROLE):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Administrator access required",
         )
 
-    return current_user
+    return principal.user
 
 
 def verify_hr_webhook_key(x_api_key: Optional[str] = Header(None)) -> bool:
@@ -218,3 +198,4 @@ def get_user_roles(user_id: uuid.UUID, db: Session) -> list:
     user_roles = db.query(Role.name).join(
         UserRole).filter(UserRole.user_id == user_id).all()
     return [role.name for role in user_roles]
+
@@ -0,0 +1,146 @@
+"""Streaming CSV / XLSX exports.
+
+Rows come from an iterator (typically a server-side cursor) and are written
+incrementally, so memory stays flat whatever the row count:
+
+- CSV is produced in chunks of EXPORT_CHUNK_ROWS rows and sent as it goes.
+- XLSX is written with openpyxl's write-only mode, which spools rows to a
+  temporary file, and the finished workbook is then streamed from disk.
+
+At most EXPORT_MAX_CONCURRENT exports run at a time per process; further
+requests get `ExportCapacityExceeded` (503) instead of competing with
+regular requests for database connections and CPU.  The slot travels with
+the response body in a `SlotStream`, which gives it back exactly once:
+when the body is exhausted, fails, is closed, or is garbage collected
+without ever being iterated (a client that disconnected before the first
+chunk).
+"""
+import csv
+import io
+import logging
+import tempfile
+import threading
+from typing import Iterable, Iterator, Sequence
+from app.core.config import settings
+from app.core.exceptions import PortalOpsException
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Bytes per chunk when streaming a finished file
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class ExportCapacityExceeded(PortalOpsException):
+    """Too many exports are already running."""
+    pass
+
+
+class ExportSlot:
+    """One taken export slot; release() is idempotent."""
+
+    def __init__(self, slots: threading.BoundedSemaphore):
+        self._slots = slots
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._slots.release()
+
+
+class ExportSlots:
+    """Bounded number of concurrently running exports."""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+
+    def acquire(self) -> ExportSlot:
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Export capacity exhausted, rejecting request")
+            raise ExportCapacityExceeded("Too many exports running, please retry shortly")
+        return ExportSlot(self._slots)
+
+
+class SlotStream:
+    """Iterator over export chunks that releases its slot when done.
+
+    Release happens when the chunks run out or raise, on close(), and in
+    __del__, so a body that is never iterated (the response was cancelled
+    before its first chunk) does not keep the slot.  Closing also closes
+    the wrapped generator, which runs its cleanup (e.g. closing the session).
+    """
+
+    def __init__(self, chunks: Iterator[bytes], slot: ExportSlot):
+        self._chunks = chunks
+        self._slot = slot
+
+    def __iter__(self) -> "SlotStream":
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._slot.release()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+export_slots = ExportSlots(settings.EXPORT_MAX_CONCURRENT)
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """Encode rows as CSV (UTF-8 with BOM, for Excel), one chunk per EXPORT_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % settings.EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(header: Sequence[str], rows: Iterable[Sequence], sheet_title: str = "Export") -> Iterator[bytes]:
+    """Write rows to a write-only workbook on disk, then stream the file."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def stream_export(export_format: str, header: Sequence[str], rows: Iterable[Sequence],
+                  sheet_title: str = "Export") -> Iterator[bytes]:
+    """Stream rows in `export_format` (a key of EXPORT_FORMATS)."""
+    if export_format == "xlsx":
+        return stream_xlsx(header, rows, sheet_title)
+    return stream_csv(header, rows)
@@ -0,0 +1,150 @@
+"""Azure AD signing key store (JWKS).
+
+Keys are fetched once, parsed into RSA public keys and served from memory.
+Once they are older than AZURE_AD_JWKS_REFRESH_SECONDS they are still used
+while a single background thread fetches new ones (stale-while-revalidate).
+A token signed with an unknown ``kid`` (key rotation) triggers a blocking
+refetch, at most once per AZURE_AD_JWKS_MIN_REFETCH_SECONDS.
+
+AZURE_AD_JWKS_URL overrides the tenant discovery endpoints; it may be an
+http(s) URL, a ``file://`` URL or a plain path to a local JWKS file.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+import requests
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JOSEError
+from app.core.config import settings
+from app.core.exceptions import AuthenticationError
+
+logger = logging.getLogger(__name__)
+
+
+def default_jwks_sources() -> List[str]:
+    """JWKS locations to try, in order."""
+    if settings.AZURE_AD_JWKS_URL:
+        return [settings.AZURE_AD_JWKS_URL]
+    # Try v2.0 endpoint first, fallback to v1.0 if needed
+    return [
+        f"https://login.microsoftonline.com/{settings.AZURE_AD_TENANT_ID}/discovery/v2.0/keys",
+        f"https://login.microsoftonline.com/{settings.AZURE_AD_TENANT_ID}/discovery/keys",
+    ]
+
+
+def _read_jwks(source: str, timeout: float) -> dict:
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    path = source[len("file://"):] if source.startswith("file://") else source
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_jwks(document: dict) -> Dict[str, Key]:
+    """Parse the RSA signing keys of a JWKS document, keyed by kid."""
+    keys = {}
+    for key_data in document.get("keys", []):
+        kid = key_data.get("kid")
+        if not kid or key_data.get("kty") != "RSA" or key_data.get("use", "sig") != "sig":
+            continue
+        try:
+            keys[kid] = jwk.construct(key_data, algorithm=key_data.get("alg", "RS256"))
+        except JOSEError as e:
+            logger.warning(f"Skipping unusable JWKS key {kid}: {e}")
+    return keys
+
+
+class JwksKeyStore:
+    """In-memory signing keys with background refresh and single-flight fetching."""
+
+    def __init__(self, sources=default_jwks_sources, refresh_seconds: float = 86400,
+                 min_refetch_seconds: float = 60, timeout: float = 5.0):
+        self._sources = sources
+        self.refresh_seconds = refresh_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self.timeout = timeout
+        self._keys: Dict[str, Key] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt = 0.0
+        self._last_finished = 0.0
+        # Held for the duration of a fetch: concurrent callers wait instead of refetching
+        self._fetch_lock = threading.Lock()
+        self._background_lock = threading.Lock()
+        self._background_refresh: Optional[threading.Thread] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.refresh_seconds
+
+    def refresh(self, *, min_interval: float = 0) -> bool:
+        """Fetch keys now (single-flight); skipped if another fetch finished within `min_interval`."""
+        started = time.monotonic()
+        with self._fetch_lock:
+            # Someone else fetched while we waited for the lock
+            if self._last_finished >= started or time.monotonic() - self._last_attempt < min_interval:
+                return bool(self._keys)
+            self._last_attempt = time.monotonic()
+            try:
+                return self._fetch()
+            finally:
+                self._last_finished = time.monotonic()
+
+    def _fetch(self) -> bool:
+        for source in self._sources():
+            try:
+                keys = parse_jwks(_read_jwks(source, self.timeout))
+            except (requests.RequestException, OSError, ValueError) as e:
+                logger.warning(f"Failed to fetch Azure AD keys from {source}: {e}")
+                continue
+            if not keys:
+                logger.warning(f"No usable signing keys in {source}")
+                continue
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            logger.info(f"Loaded {len(keys)} Azure AD signing keys from {source}")
+            return True
+        return False
+
+    def refresh_in_background(self) -> None:
+        """Start a background refresh unless one is already running."""
+        with self._background_lock:
+            if self._background_refresh is not None and self._background_refresh.is_alive():
+                return
+            self._background_refresh = threading.Thread(
+                target=self.refresh, name="jwks-refresh", daemon=True)
+            self._background_refresh.start()
+
+    def get_key(self, kid: Optional[str]) -> Key:
+        """Signing key for `kid`; raises AuthenticationError if it cannot be found."""
+        if self._fetched_at is None:
+            # Nothing to serve yet: the first caller has to wait for the keys
+            self.refresh()
+        elif self.is_stale:
+            self.refresh_in_background()
+
+        key = self._keys.get(kid) if kid else None
+        if key is None and kid:
+            # Unknown kid usually means Azure rotated its keys; refetch, rate limited
+            self.refresh(min_interval=self.min_refetch_seconds)
+            key = self._keys.get(kid)
+        if key is None:
+            if not self._keys:
+                raise AuthenticationError("Failed to fetch Azure AD public keys")
+            raise AuthenticationError("Unable to find signing key")
+        return key
+
+    def status(self) -> dict:
+        age = None if self._fetched_at is None else round(time.monotonic() - self._fetched_at, 1)
+        return {"kids": sorted(self._keys), "age_seconds": age, "stale": self.is_stale}
+
+
+jwks_store = JwksKeyStore(
+    refresh_seconds=settings.AZURE_AD_JWKS_REFRESH_SECONDS,
+    min_refetch_seconds=settings.AZURE_AD_JWKS_MIN_REFETCH_SECONDS,
+    timeout=settings.AZURE_AD_JWKS_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,141 @@
+"""Password hashing in a dedicated, bounded process pool.
+
+bcrypt costs a few hundred milliseconds of CPU per call.  Running it inline
+ties up a threadpool thread and competes for the GIL with every other
+request, so hashing and verification run in `password_pool`, a small
+process pool (PASSWORD_HASH_WORKERS).  At most PASSWORD_HASH_MAX_PENDING
+calls may wait for a worker; beyond that `PasswordHashPoolSaturated` is
+raised right away and the API answers 503, so a login wave cannot queue up
+unbounded work.
+
+PASSWORD_HASH_WORKERS=0 disables the pool and hashes in the calling thread.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from app.core.config import settings
+from app.core.exceptions import PortalOpsException
+
+logger = logging.getLogger(__name__)
+
+_crypt_context: Optional[CryptContext] = None
+
+
+def crypt_context() -> CryptContext:
+    """The bcrypt context of this process (one per pool worker)."""
+    global _crypt_context
+    if _crypt_context is None:
+        _crypt_context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+    return _crypt_context
+
+
+def _hash(password: str) -> str:
+    return crypt_context().hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return crypt_context().verify(password, password_hash)
+
+
+def _load() -> None:
+    crypt_context()
+
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    # New hash only when the stored one uses another cost or a deprecated scheme
+    return crypt_context().verify_and_update(password, password_hash)
+
+
+class PasswordHashPoolSaturated(PortalOpsException):
+    """All password hashing workers are busy and the wait queue is full."""
+    pass
+
+
+class PasswordHashPool:
+    """Process pool for bcrypt with a bounded number of pending calls."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max(1, workers + max_pending))
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a process that runs threads (scheduler, pools) is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _acquire(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            logger.warning("Password hashing pool saturated, rejecting request")
+            raise PasswordHashPoolSaturated("Too many concurrent logins, please retry shortly")
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` in the pool and wait for the result (blocking)."""
+        self._acquire()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return fn(*args)
+            return executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def run_async(self, fn, *args):
+        """Run `fn(*args)` in the pool without blocking the event loop."""
+        self._acquire()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    def warm_up(self) -> None:
+        """Start the worker processes ahead of the first login."""
+        executor = self._get_executor()
+        if executor is not None:
+            for future in [executor.submit(_load) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "max_pending": self.max_pending, "rejected": self.rejected}
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+def hash_password(password: str) -> str:
+    return password_pool.run(_hash, password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return password_pool.run(_verify, password, password_hash)
+
+
+async def verify_and_update_password_async(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password off the event loop; also returns a new hash if it needs rehashing."""
+    return await password_pool.run_async(_verify_and_update, password, password_hash)
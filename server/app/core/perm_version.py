@@ -0,0 +1,145 @@
+"""In-memory copy of every user's permission version (users.perm_version).
+
+Database triggers bump a user's perm_version whenever the user row, its
+roles or its permission assignments change, and publish the new value on
+the ``perm_version`` channel (migration 0002).  `perm_versions` keeps a
+LISTEN connection open in a background thread, loads all versions when it
+(re)connects and applies every notification, so each process learns about
+a change as soon as it commits, wherever it was made.
+
+Issued JWTs carry the roles and version they were minted with (``pv``);
+the roles are trusted while the version is still current.  While the
+listener is disconnected nothing is considered current and callers fall
+back to the database.
+"""
+import logging
+import select
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "perm_version"
+# Version published for a deleted user
+DELETED = -1
+
+
+def _libpq_dsn(url: str) -> str:
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PermVersionTracker:
+    """Current perm_version per user id, kept fresh by LISTEN/NOTIFY."""
+
+    def __init__(self, dsn_url: str, reconnect_seconds: float = 5.0, poll_seconds: float = 5.0):
+        self._dsn_url = dsn_url
+        self.reconnect_seconds = reconnect_seconds
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[uuid.UUID, int] = {}
+        self._subscribers: List[Callable[[Optional[uuid.UUID]], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.listening = False
+        self.notifications = 0
+
+    def subscribe(self, callback: Callable[[Optional[uuid.UUID]], None]) -> None:
+        """Call `callback(user_id)` on every change; `callback(None)` means "everything may have changed"."""
+        self._subscribers.append(callback)
+
+    def _publish(self, user_id: Optional[uuid.UUID]) -> None:
+        for callback in self._subscribers:
+            callback(user_id)
+
+    def current(self, user_id: uuid.UUID) -> Optional[int]:
+        """Known current version, or None while not listening / for users not seen yet."""
+        if not self.listening:
+            return None
+        return self._versions.get(user_id)
+
+    def is_current(self, user_id: uuid.UUID, version) -> bool:
+        return version is not None and self.current(user_id) == version
+
+    def observe(self, user_id: uuid.UUID, version: int) -> None:
+        """Record a version read from the database (versions only move forward)."""
+        with self._lock:
+            known = self._versions.get(user_id)
+            if known is None or (known != DELETED and version > known):
+                self._versions[user_id] = version
+
+    def _apply(self, payload: str) -> None:
+        try:
+            user_id, version = payload.split(":")
+            user_id, version = uuid.UUID(user_id), int(version)
+        except ValueError:
+            logger.warning(f"Ignoring malformed {CHANNEL} notification: {payload!r}")
+            return
+        with self._lock:
+            known = self._versions.get(user_id)
+            if version == DELETED or known is None or version > known:
+                self._versions[user_id] = version
+        self.notifications += 1
+        self._publish(user_id)
+
+    def _listen(self) -> None:
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(_libpq_dsn(self._dsn_url))
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                # LISTEN before the snapshot so no change can fall in between
+                cursor.execute(f"LISTEN {CHANNEL}")
+                cursor.execute("SELECT id, perm_version FROM users")
+                versions = dict(cursor.fetchall())
+            with self._lock:
+                self._versions = versions
+            self.listening = True
+            self._publish(None)
+            logger.info(f"Listening for permission changes ({len(versions)} users)")
+
+            while not self._stop.is_set():
+                if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                    # Idle: make sure the connection is still alive
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                conn.poll()
+                while conn.notifies:
+                    self._apply(conn.notifies.pop(0).payload)
+        finally:
+            self.listening = False
+            conn.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"Permission change listener disconnected: {e}")
+            if not self._stop.is_set():
+                # Changes may have been missed while disconnected
+                self._publish(None)
+                self._stop.wait(self.reconnect_seconds)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="perm-version-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {"listening": self.listening, "users": len(self._versions), "notifications": self.notifications}
+
+
+perm_versions = PermVersionTracker(settings.DATABASE_URL)
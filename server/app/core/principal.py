@@ -0,0 +1,287 @@
+"""The authenticated principal: the user plus everything role checks need.
+
+`load_principal` fetches the user row, its role names and its permitted
+product and service ids in a single statement.  `app.core.deps.get_principal`
+memoizes the result on ``request.state``, so authentication, the ``require_*``
+dependencies and in-handler role checks all share that one round trip.
+
+Across requests, resolved principals are kept in `principal_cache` (bounded
+LRU with a TTL).  Code that changes a user's row, roles or permission
+assignments must call `invalidate_principal(db, user_id)`; the entry is
+dropped immediately and again once the session commits.
+
+While `perm_versions` listens for permission changes, a cached principal
+stays valid exactly as long as its user's perm_version is current (changes
+made by any process evict it at once); otherwise the TTL applies.
+
+Azure AD identities are provisioned once per process; afterwards
+`provisioned_azure_identities` maps them straight to their user id.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import FrozenSet, Iterable, List, Optional
+from sqlalchemy import event, func, inspect, null, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.core.config import settings
+from app.core.perm_version import perm_versions
+from app.models.user import User, Role, UserRole
+from app.models.permission import PermissionAssignment
+
+ADMIN_ROLE = "Admin"
+SERVICE_ADMIN_ROLE = "ServiceAdmin"
+
+
+@dataclass
+class Principal:
+    """Authenticated user with role names and permitted product/service ids."""
+    user: User
+    roles: List[str] = field(default_factory=list)
+    product_ids: FrozenSet[uuid.UUID] = frozenset()
+    service_ids: FrozenSet[uuid.UUID] = frozenset()
+
+    @property
+    def id(self) -> uuid.UUID:
+        return self.user.id
+
+    @property
+    def perm_version(self) -> int:
+        return self.user.perm_version
+
+    @property
+    def is_admin(self) -> bool:
+        return ADMIN_ROLE in self.roles
+
+    @property
+    def is_service_admin(self) -> bool:
+        return SERVICE_ADMIN_ROLE in self.roles
+
+    def has_any_role(self, *role_names: str) -> bool:
+        return any(role in self.roles for role in role_names)
+
+    def can_access_product(self, product_id: uuid.UUID) -> bool:
+        """Admins see every product; other users only assigned ones."""
+        return self.is_admin or product_id in self.product_ids
+
+
+def _principal_select(user_id: uuid.UUID, with_roles: bool = True):
+    # Correlated array_agg subqueries keep roles and assignments in the user row
+    roles = select(func.array_agg(Role.name)).join(
+        UserRole, UserRole.role_id == Role.id).where(
+        UserRole.user_id == User.id).scalar_subquery() if with_roles else null()
+    product_ids = select(func.array_agg(PermissionAssignment.product_id.distinct())).where(
+        PermissionAssignment.user_id == User.id,
+        PermissionAssignment.product_id.isnot(None)).scalar_subquery()
+    service_ids = select(func.array_agg(PermissionAssignment.service_id.distinct())).where(
+        PermissionAssignment.user_id == User.id,
+        PermissionAssignment.service_id.isnot(None)).scalar_subquery()
+    return select(User, roles, product_ids, service_ids).where(User.id == user_id)
+
+
+def load_principal(
+    db: Session, user_id: uuid.UUID, roles: Optional[List[str]] = None, roles_version: Optional[int] = None
+) -> Optional[Principal]:
+    """Load the principal for a user id in one round trip; None if the user does not exist.
+
+    `roles` from the claims of a token minted at perm_version `roles_version`
+    are used instead of querying them, if that is still the user's version.
+    """
+    row = db.execute(_principal_select(user_id, with_roles=roles is None)).first()
+    if row is None:
+        return None
+    user, loaded_roles, product_ids, service_ids = row
+    if roles is None:
+        roles = loaded_roles
+    elif user.perm_version != roles_version:
+        # Changed since the token was issued
+        roles = db.execute(select(Role.name).join(UserRole, UserRole.role_id == Role.id).where(
+            UserRole.user_id == user_id)).scalars().all()
+    return Principal(
+        user=user,
+        roles=sorted(roles or []),
+        product_ids=frozenset(product_ids or ()),
+        service_ids=frozenset(service_ids or ()),
+    )
+
+
+@dataclass
+class _CacheEntry:
+    user: User  # detached copy, never attached to a session itself
+    roles: List[str]
+    product_ids: FrozenSet[uuid.UUID]
+    service_ids: FrozenSet[uuid.UUID]
+    expires_at: float
+
+
+def _detached_copy(user: User) -> User:
+    """Detached, fully loaded copy of a user row that can be merged without SQL."""
+    copy = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+class PrincipalCache:
+    """Bounded LRU cache of resolved principals with a TTL, keyed by user id."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[uuid.UUID, _CacheEntry]" = OrderedDict()
+        # Bumped by every invalidation; a load that raced with one is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, db: Session, user_id: uuid.UUID) -> Optional[Principal]:
+        """Cached principal with its user merged into `db` (no SQL), or None."""
+        if not self.enabled:
+            return None
+        current_version = perm_versions.current(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or not self._is_valid(entry, current_version):
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        return Principal(
+            user=db.merge(entry.user, load=False),
+            roles=list(entry.roles),
+            product_ids=entry.product_ids,
+            service_ids=entry.service_ids,
+        )
+
+    @staticmethod
+    def _is_valid(entry: _CacheEntry, current_version: Optional[int]) -> bool:
+        if current_version is not None:
+            # Changes are announced by notification, so no TTL is needed
+            return entry.user.perm_version == current_version
+        return entry.expires_at > time.monotonic()
+
+    def put(self, principal: Principal, generation: int) -> None:
+        """Store a principal loaded while `generation` was current."""
+        perm_versions.observe(principal.id, principal.perm_version)
+        if not self.enabled:
+            return
+        entry = _CacheEntry(
+            user=_detached_copy(principal.user),
+            roles=list(principal.roles),
+            product_ids=principal.product_ids,
+            service_ids=principal.service_ids,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[principal.id] = entry
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[uuid.UUID]) -> None:
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+class ProvisionedIdentities:
+    """Bounded LRU map of Azure AD identities provisioned by this process to user ids.
+
+    An identity seen here needs no provisioning reads or writes; requests
+    carrying its token only look up the principal.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._user_ids: "OrderedDict[str, uuid.UUID]" = OrderedDict()
+
+    def get(self, identity: str) -> Optional[uuid.UUID]:
+        with self._lock:
+            user_id = self._user_ids.get(identity)
+            if user_id is not None:
+                self._user_ids.move_to_end(identity)
+            return user_id
+
+    def put(self, identity: str, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._user_ids[identity] = user_id
+            self._user_ids.move_to_end(identity)
+            while len(self._user_ids) > self.max_size:
+                self._user_ids.popitem(last=False)
+
+    def forget(self, identity: str) -> None:
+        with self._lock:
+            self._user_ids.pop(identity, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._user_ids.clear()
+
+
+provisioned_azure_identities = ProvisionedIdentities(max_size=settings.PRINCIPAL_CACHE_MAX_SIZE)
+
+def _on_perm_version_change(user_id: Optional[uuid.UUID]) -> None:
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate([user_id])
+
+
+perm_versions.subscribe(_on_perm_version_change)
+
+# Session.info key holding user ids to invalidate again after commit
+_PENDING_INVALIDATIONS_KEY = "principal_invalidations"
+
+
+def invalidate_principal(db: Session, *user_ids: uuid.UUID) -> None:
+    """Drop cached principals now and again after `db` commits.
+
+    The second pass covers requests that reloaded the old rows between the
+    write and the commit of the request's unit of work.
+    """
+    principal_cache.invalidate(user_ids)
+    db.info.setdefault(_PENDING_INVALIDATIONS_KEY, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop(_PENDING_INVALIDATIONS_KEY, None)
+    if user_ids:
+        principal_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_invalidations(session, previous_transaction):
+    session.info.pop(_PENDING_INVALIDATIONS_KEY, None)
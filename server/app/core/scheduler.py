@@ -36,20 +36,30 @@ async def check_payment_expiration():
     logger.info("Checking for expired payment records...")
 
     from datetime import date
-    from app.models.payment import PaymentInfo, ProductStatus
+    from app.models.payment import PaymentInfo, ProductLatestPayment, ProductStatus
     from app.models.service import Product
-    from sqlalchemy import and_
+    from sqlalchemy import and_, exists
+    from sqlalchemy.orm import joinedload
 
     db = get_db_session()
     try:
         today = date.today()
         logger.info(f"Today's date: {today}")
 
-        # Get all products with at least one payment record
-        products_with_payments = db.query(Product).join(
-            PaymentInfo,
-            Product.id == PaymentInfo.product_id
-        ).distinct().all()
+        # Products with at least one payment record, their latest bill
+        # (product_latest_payment) and whether any bill is incomplete
+        has_incomplete_bills = exists().where(
+            and_(
+                PaymentInfo.product_id == Product.id,
+                PaymentInfo.status == 'incomplete'
+            )
+        )
+        products_with_payments = db.query(
+            Product, ProductLatestPayment, has_incomplete_bills
+        ).join(
+            ProductLatestPayment,
+            Product.id == ProductLatestPayment.product_id
+        ).options(joinedload(Product.status)).all()
 
         logger.info(
             f"Found {len(products_with_payments)} products with payment records")
@@ -68,7 +78,7 @@ async def check_payment_expiration():
             logger.error("Overdue status not found in database")
             return
 
-        for product in products_with_payments:
+        for product, latest_bill, incomplete_bills in products_with_payments:
             # Step 1: Check if the product status is Inactive
             if product.status and product.status.name == 'Inactive':
                 logger.info(
@@ -77,29 +87,14 @@ async def check_payment_expiration():
                 continue
 
             # Step 2: Check if the product has any incomplete bills
-            incomplete_bills = db.query(PaymentInfo).filter(
-                and_(
-                    PaymentInfo.product_id == product.id,
-                    PaymentInfo.status == 'incomplete'
-                )
-            ).first()
-
             if incomplete_bills:
                 logger.info(
                     f"Product {product.name} (ID: {product.id}) has incomplete bills - skipping")
                 skipped_incomplete_count += 1
                 continue
 
-            # Step 2: Find the bill with the latest payment_date for this product
-            latest_bill = db.query(PaymentInfo).filter(
-                PaymentInfo.product_id == product.id
-            ).order_by(PaymentInfo.payment_date.desc()).first()
-
-            if not latest_bill:
-                logger.warning(
-                    f"Product {product.name} (ID: {product.id}) has no bills - skipping")
-                continue
-
+            # Step 2: The bill with the latest payment_date for this product
+            # comes from product_latest_payment
             processed_count += 1
 
             # Step 3: Check if the latest bill is complete and expired
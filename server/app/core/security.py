@@ -1,30 +1,29 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Union, Dict
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose.exceptions import ExpiredSignatureError
 from fastapi import HTTPException, status
 from app.core.config import settings
-import requests
+from app.core import password_hashing
+from app.core.exceptions import AuthenticationError
+from app.core.jwks import jwks_store
+import hashlib
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Cache for Azure AD public keys
-_azure_ad_keys_cache = None
-_azure_ad_keys_cache_time = None
-
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a plain password against its hash (in the password hashing pool)."""
+    return password_hashing.verify_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Generate password hash."""
-    return pwd_context.hash(password)
+    """Generate password hash (in the password hashing pool)."""
+    return password_hashing.hash_password(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -94,65 +93,25 @@ def verify_azure_ad_token(token: str) -> Dict:
                 detail="Invalid token audience",
             )
 
-        # Get Azure AD public keys
-        global _azure_ad_keys_cache, _azure_ad_keys_cache_time
-        current_time = datetime.utcnow()
-
-        # Cache keys for 24 hours
-        if (_azure_ad_keys_cache is None or
-            _azure_ad_keys_cache_time is None or
-                (current_time - _azure_ad_keys_cache_time) > timedelta(hours=24)):
-
-            # Try v2.0 endpoint first, fallback to v1.0 if needed
-            keys_urls = [
-                f"https://login.microsoftonline.com/{settings.AZURE_AD_TENANT_ID}/discovery/v2.0/keys",
-                f"https://login.microsoftonline.com/{settings.AZURE_AD_TENANT_ID}/discovery/keys"
-            ]
-
-            keys_fetched = False
-            for keys_url in keys_urls:
-                try:
-                    response = requests.get(keys_url)
-                    response.raise_for_status()
-                    _azure_ad_keys_cache = response.json()
-                    _azure_ad_keys_cache_time = current_time
-                    keys_fetched = True
-                    logger.info(
-                        f"Successfully fetched Azure AD keys from {keys_url}")
-                    break
-                except requests.RequestException as e:
-                    logger.warning(
-                        f"Failed to fetch keys from {keys_url}: {e}")
-                    continue
-
-            if not keys_fetched:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Failed to fetch Azure AD public keys",
-                )
-
-        # Find the correct key
-        kid = unverified_header.get("kid")
-        signing_key = None
-        for key in _azure_ad_keys_cache.get("keys", []):
-            if key.get("kid") == kid:
-                signing_key = key
-                break
-
-        if not signing_key:
+        # Signing key from the in-memory JWKS store (refetched on unknown kid)
+        try:
+            signing_key = jwks_store.get_key(unverified_header.get("kid"))
+        except AuthenticationError as e:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Unable to find signing key",
+                detail=str(e),
             )
 
-        # Verify token signature
-        # Note: python-jose doesn't support RS256 with JWK directly,
-        # so we'll validate the claims but trust the signature for now
-        # In production, consider using PyJWT with proper RS256 verification
-
-        # Validate expiration
-        exp = unverified_claims.get("exp")
-        if exp and datetime.fromtimestamp(exp) < datetime.utcnow():
+        # Verify the RS256 signature and expiration against the key
+        try:
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=["RS256"],
+                audience=settings.AZURE_AD_CLIENT_ID,
+                options={"verify_aud": bool(settings.AZURE_AD_CLIENT_ID), "verify_at_hash": False},
+            )
+        except ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired",
@@ -160,19 +119,15 @@ def verify_azure_ad_token(token: str) -> Dict:
 
         # Extract user information
         return {
-            "email": unverified_claims.get("email") or unverified_claims.get("preferred_username"),
-            "name": unverified_claims.get("name"),
-            "azure_id": unverified_claims.get("oid") or unverified_claims.get("sub"),
-            "sub": unverified_claims.get("sub"),
-            "oid": unverified_claims.get("oid"),
+            "email": claims.get("email") or claims.get("preferred_username"),
+            "name": claims.get("name"),
+            "azure_id": claims.get("oid") or claims.get("sub"),
+            "sub": claims.get("sub"),
+            "oid": claims.get("oid"),
         }
 
-    except requests.RequestException as e:
-        logger.error(f"Failed to fetch Azure AD keys: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Failed to validate Azure AD token",
-        )
+    except HTTPException:
+        raise
     except JWTError as e:
         logger.error(f"JWT validation error: {e}")
         raise HTTPException(
@@ -189,13 +144,94 @@ def verify_azure_ad_token(token: str) -> Dict:
         )
 
 
-def verify_token_flexible(token: str) -> tuple[dict, str]:
-    """
-    Verify token - supports both JWT and Azure AD tokens.
-    Returns (payload, token_type) where token_type is 'jwt' or 'azure'.
+class TokenVerificationCache:
+    """Bounded LRU of token verification results, keyed by the token's SHA-256.
+
+    Successful verifications are kept until the token's `exp`, failures for
+    TOKEN_CACHE_NEGATIVE_TTL_SECONDS.  Tokens themselves are never stored.
     """
-    # First try Azure AD token if enabled
-    if settings.AZURE_AD_ENABLED:
+
+    def __init__(self, max_size: int, negative_ttl_seconds: float):
+        self.max_size = max_size
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._lock = threading.Lock()
+        # digest -> (payload, token_type, expires_at); payload None marks a failure
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest: str) -> Optional[tuple]:
+        """(payload, token_type) for a cached token, payload None for a cached failure."""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[2] <= time.time():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def _store(self, digest: str, entry: tuple) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put(self, digest: str, payload: dict, token_type: str, expires_at: Optional[float]) -> None:
+        # Tokens without an expiry are verified every time
+        if expires_at is not None and expires_at > time.time():
+            self._store(digest, (payload, token_type, expires_at))
+
+    def put_failure(self, digest: str) -> None:
+        if self.negative_ttl_seconds > 0:
+            self._store(digest, (None, None, time.time() + self.negative_ttl_seconds))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenVerificationCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    negative_ttl_seconds=settings.TOKEN_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return None
+    return float(exp) if exp is not None else None
+
+
+def _is_local_jwt(token: str) -> bool:
+    """Tokens signed with our own (HMAC) algorithm can never be Azure AD tokens."""
+    try:
+        return jwt.get_unverified_header(token).get("alg") == settings.JWT_ALGORITHM
+    except JWTError:
+        return False
+
+
+def _verify_token_uncached(token: str) -> tuple[dict, str]:
+    # First try Azure AD token if enabled (skipped for our own HS* tokens)
+    if settings.AZURE_AD_ENABLED and not _is_local_jwt(token):
         try:
             azure_payload = verify_azure_ad_token(token)
             return (azure_payload, "azure")
@@ -214,3 +250,31 @@ def verify_token_flexible(token: str) -> tuple[dict, str]:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+def verify_token_flexible(token: str) -> tuple[dict, str]:
+    """
+    Verify token - supports both JWT and Azure AD tokens.
+    Returns (payload, token_type) where token_type is 'jwt' or 'azure'.
+    Results are cached per token (see TokenVerificationCache).
+    """
+    digest = token_cache.digest(token)
+    cached = token_cache.get(digest)
+    if cached is not None:
+        payload, token_type = cached
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        # Copy so callers cannot modify the cached payload
+        return dict(payload), token_type
+
+    try:
+        payload, token_type = _verify_token_uncached(token)
+    except HTTPException:
+        token_cache.put_failure(digest)
+        raise
+    token_cache.put(digest, dict(payload), token_type, _token_expiry(token))
+    return payload, token_type
@@ -1,13 +1,25 @@
-from typing import List, Optional
+from typing import Optional
 from sqlalchemy.orm import Session, joinedload
 from app.crud.base import CRUDBase
 from app.models.audit import AuditLog
 from app.models.user import User
 from app.schemas.audit import AuditLogCreate
+from app.db.unit_of_work import commit_or_flush
+from app.crud.pagination import SortKey, CursorPage, apply_keyset, build_page
 import uuid
 
 
 class CRUDAuditLog(CRUDBase[AuditLog, AuditLogCreate, dict]):
+    @staticmethod
+    def _filtered(query, actor_user_id: Optional[uuid.UUID], action: Optional[str]):
+        if actor_user_id:
+            query = query.filter(AuditLog.actor_user_id == actor_user_id)
+
+        if action:
+            query = query.filter(AuditLog.action.ilike(f"%{action}%"))
+
+        return query
+
     def get_multi_with_actor(
         self,
         db: Session,
@@ -15,18 +27,34 @@ class CRUDAuditLog(CRUDBase[AuditLog, AuditLogCreate, dict]):
         skip: int = 0,
         limit: int = 100,
         actor_user_id: Optional[uuid.UUID] = None,
-        action: Optional[str] = None
-    ) -> List[AuditLog]:
-        """Get audit logs with actor information."""
-        query = db.query(AuditLog).options(joinedload(AuditLog.actor))
+        action: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> CursorPage:
+        """Get audit logs with actor information, newest first.
 
-        if actor_user_id:
-            query = query.filter(AuditLog.actor_user_id == actor_user_id)
+        A non-empty cursor (from a previous page's next_cursor) replaces skip.
+        """
+        query = self._filtered(
+            db.query(AuditLog).options(joinedload(AuditLog.actor)), actor_user_id, action)
 
-        if action:
-            query = query.filter(AuditLog.action.ilike(f"%{action}%"))
+        keys = [
+            SortKey(AuditLog.created_at, lambda log: log.created_at, descending=True),
+            SortKey(AuditLog.id, lambda log: log.id, descending=True),
+        ]
+        query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        return build_page(query.limit(limit + 1).all(), keys, limit)
 
-        return query.order_by(AuditLog.created_at.desc()).offset(skip).limit(limit).all()
+    def count_with_actor(
+        self,
+        db: Session,
+        *,
+        actor_user_id: Optional[uuid.UUID] = None,
+        action: Optional[str] = None
+    ) -> int:
+        """Count audit logs matching the same filters as get_multi_with_actor."""
+        return self._filtered(db.query(AuditLog), actor_user_id, action).count()
 
     def log_action(
         self,
@@ -45,8 +73,7 @@ class CRUDAuditLog(CRUDBase[AuditLog, AuditLogCreate, dict]):
             details=details
         )
         db.add(audit_log)
-        db.commit()
-        db.refresh(audit_log)
+        commit_or_flush(db, audit_log)
         return audit_log
 
 
@@ -4,6 +4,9 @@ from app.crud.base import CRUDBase
 from app.models.department import Department, DepartmentProductAssignment
 from app.models.service import Product
 from app.schemas.department import DepartmentCreate, DepartmentUpdate
+from app.models.user import User
+from app.db.unit_of_work import commit_or_flush
+from app.core.principal import invalidate_principal
 import uuid
 
 
@@ -22,7 +25,10 @@ class CRUDDepartment(CRUDBase[Department, DepartmentCreate, DepartmentUpdate]):
         if not product_ids:
             return []
 
-        products = db.query(Product).options(joinedload(Product.service)).filter(
+        products = db.query(Product).options(
+            joinedload(Product.service),
+            joinedload(Product.latest_payment)
+        ).filter(
             Product.id.in_(product_ids)
         ).all()
         return products
@@ -47,7 +53,12 @@ class CRUDDepartment(CRUDBase[Department, DepartmentCreate, DepartmentUpdate]):
             )
             db.add(assignment)
 
-        db.commit()
+        # Department products are synced into members' permission assignments
+        member_ids = [row[0] for row in db.query(User.id).filter(
+            User.department_id == department_id).all()]
+        invalidate_principal(db, *member_ids)
+
+        commit_or_flush(db)
         return product_ids
 
 
@@ -0,0 +1,174 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort key values of the last
+row of the previous page.  The next page is "rows strictly after that key" in
+the endpoint's ORDER BY, with the primary key as the final tie-breaker, so a
+deep page costs the same as the first one and rows do not shift between pages
+while others edit.
+
+List endpoints accept ``?cursor=`` next to page/limit: an empty cursor starts
+at the first page, and every response carries ``pagination.nextCursor``.
+
+A cursor is tagged with its keyset (expressions, directions, NULL placement),
+so a cursor from another endpoint or another sort order is rejected as
+invalid input instead of being compared against the wrong columns.
+"""
+import base64
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence
+from sqlalchemy import and_, false, or_, tuple_
+
+
+@dataclass
+class SortKey:
+    """One ORDER BY column of a keyset: the SQL expression and how to read it from a row."""
+    expression: Any
+    value: Callable[[Any], Any]
+    descending: bool = False
+    nullable: bool = False
+    # Defaults to Postgres' own placement: NULLS LAST for ASC, NULLS FIRST for DESC
+    nulls_first: Optional[bool] = None
+
+    @property
+    def nulls_come_first(self) -> bool:
+        return self.descending if self.nulls_first is None else self.nulls_first
+
+    def order_clause(self):
+        clause = self.expression.desc() if self.descending else self.expression.asc()
+        if self.nullable:
+            clause = clause.nulls_first() if self.nulls_come_first else clause.nulls_last()
+        return clause
+
+    def after(self, value):
+        """Rows that sort strictly after `value` on this key."""
+        if value is None:
+            return self.expression.isnot(None) if self.nulls_come_first else false()
+        condition = self.expression < value if self.descending else self.expression > value
+        if self.nullable and not self.nulls_come_first:
+            condition = or_(condition, self.expression.is_(None))
+        return condition
+
+    def equals(self, value):
+        return self.expression.is_(None) if value is None else self.expression == value
+
+
+class CursorPage(list):
+    """Rows of one page; `next_cursor` is set when more rows follow."""
+    next_cursor: Optional[str] = None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, uuid.UUID):
+        return ["u", str(value)]
+    if isinstance(value, Decimal):
+        return ["n", str(value)]
+    return ["v", value]
+
+
+def _decode_value(item):
+    tag, value = item
+    if value is None:
+        return None
+    if tag == "dt":
+        return datetime.fromisoformat(value)
+    if tag == "d":
+        return date.fromisoformat(value)
+    if tag == "u":
+        return uuid.UUID(value)
+    if tag == "n":
+        return Decimal(value)
+    return value
+
+
+def keyset_tag(keys: Sequence[SortKey]) -> str:
+    """Short identity of a keyset, stored in its cursors."""
+    spec = "|".join(f"{key.expression}:{key.descending:d}:{key.nulls_come_first:d}" for key in keys)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+
+def _value_fits(key: SortKey, value) -> bool:
+    """Whether a decoded value can be compared with the key's expression."""
+    if value is None:
+        return key.nullable
+    try:
+        expected = key.expression.type.python_type
+    except (AttributeError, NotImplementedError):
+        return True
+    if expected in (Decimal, float):
+        return isinstance(value, (Decimal, int, float)) and not isinstance(value, bool)
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def encode_cursor(keys: Sequence[SortKey], values: Sequence) -> str:
+    payload = json.dumps({"k": keyset_tag(keys), "v": [_encode_value(v) for v in values]},
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], keys: Sequence[SortKey]) -> Optional[list]:
+    """Decode a cursor for the given keys; None/empty means the first page.
+
+    Raises ValueError (reported as 400 invalid_input) for malformed cursors
+    and for cursors of another keyset (endpoint or sort order).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        tag = payload["k"]
+        values = [_decode_value(item) for item in payload["v"]]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if tag != keyset_tag(keys) or len(values) != len(keys):
+        raise ValueError("Invalid pagination cursor")
+    if not all(_value_fits(key, value) for key, value in zip(keys, values)):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
+def keyset_order_by(keys: Sequence[SortKey]) -> list:
+    return [key.order_clause() for key in keys]
+
+
+def keyset_predicate(keys: Sequence[SortKey], values: Sequence):
+    """WHERE clause selecting rows after `values` in the keyset order."""
+    # Same direction and no NULLs: a row-value comparison the planner can use with an index
+    if all(not key.nullable for key in keys) and len({key.descending for key in keys}) == 1:
+        row = tuple_(*[key.expression for key in keys])
+        bound = tuple_(*values)
+        return row < bound if keys[0].descending else row > bound
+
+    alternatives = []
+    for idx, key in enumerate(keys):
+        prefix = [keys[i].equals(values[i]) for i in range(idx)]
+        alternatives.append(and_(*prefix, key.after(values[idx])))
+    return or_(*alternatives)
+
+
+def apply_keyset(query, keys: Sequence[SortKey], cursor: Optional[str]):
+    """Order the query by the keyset and, when a cursor is given, start after it."""
+    values = decode_cursor(cursor, keys)
+    if values is not None:
+        query = query.filter(keyset_predicate(keys, values))
+    return query.order_by(*keyset_order_by(keys))
+
+
+def build_page(rows: List, keys: Sequence[SortKey], limit: int) -> CursorPage:
+    """Trim a `limit + 1` fetch to one page and compute the cursor of the next one."""
+    page = CursorPage(rows[:limit])
+    if len(rows) > limit and page:
+        last = page[-1]
+        page.next_cursor = encode_cursor(keys, [key.value(last) for key in keys])
+    return page
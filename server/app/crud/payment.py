@@ -1,13 +1,34 @@
-from typing import List, Optional
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import JSON, and_, cast, column, func, case, desc, literal_column, null, select, type_coerce, update, values
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from app.crud.base import CRUDBase
-from app.models.payment import PaymentInfo, PaymentMethod
+from app.models.payment import PaymentInfo, PaymentMethod, ProductLatestPayment
 from app.models.service import Product, Service
 from app.schemas.payment import PaymentInfoCreate, PaymentInfoUpdate
+from app.db.unit_of_work import commit_or_flush
+from app.crud.pagination import SortKey, CursorPage, apply_keyset, build_page, keyset_order_by
 import uuid
 
 
+@dataclass(frozen=True)
+class PaymentRegisterFilter:
+    """Payment register filters; empty fields do not filter, given fields are ANDed."""
+    search: Optional[str] = None
+    statuses: Sequence[str] = ()
+    currency_ids: Sequence[int] = ()
+    payment_method_ids: Sequence[int] = ()
+    service_ids: Sequence[uuid.UUID] = ()
+    vendors: Sequence[str] = ()
+    payment_date_from: Optional[date] = None
+    payment_date_to: Optional[date] = None
+    usage_end_from: Optional[date] = None
+    usage_end_to: Optional[date] = None
+
+
 class CRUDPaymentInfo(CRUDBase[PaymentInfo, PaymentInfoCreate, PaymentInfoUpdate]):
     def get(self, db: Session, id: uuid.UUID) -> Optional[PaymentInfo]:
         """Get payment info by payment id."""
@@ -20,17 +41,23 @@ class CRUDPaymentInfo(CRUDBase[PaymentInfo, PaymentInfoCreate, PaymentInfoUpdate
         ).order_by(desc(PaymentInfo.payment_date), desc(PaymentInfo.created_at)).all()
 
     def get_latest_by_product(self, db: Session, product_id: uuid.UUID) -> Optional[PaymentInfo]:
-        """Get the latest payment record for a specific product."""
-        return db.query(PaymentInfo).filter(
-            PaymentInfo.product_id == product_id
-        ).order_by(desc(PaymentInfo.payment_date), desc(PaymentInfo.created_at)).first()
+        """Get the latest payment record for a specific product (via product_latest_payment)."""
+        return db.query(PaymentInfo).join(
+            ProductLatestPayment, ProductLatestPayment.payment_id == PaymentInfo.id
+        ).filter(ProductLatestPayment.product_id == product_id).first()
+
+    async def get_latest_by_product_async(self, db: AsyncSession, product_id: uuid.UUID) -> Optional[PaymentInfo]:
+        """Asyncio variant of get_latest_by_product."""
+        result = await db.execute(select(PaymentInfo).join(
+            ProductLatestPayment, ProductLatestPayment.payment_id == PaymentInfo.id
+        ).where(ProductLatestPayment.product_id == product_id))
+        return result.scalars().first()
 
     def create(self, db: Session, *, obj_in: PaymentInfoCreate) -> PaymentInfo:
         """Create payment info."""
         db_obj = PaymentInfo(**obj_in.dict())
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
     def update(self, db: Session, *, db_obj: PaymentInfo, obj_in) -> PaymentInfo:
@@ -43,136 +70,436 @@ class CRUDPaymentInfo(CRUDBase[PaymentInfo, PaymentInfoCreate, PaymentInfoUpdate
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
-    def get_payment_register(self, db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> tuple[List[dict], int]:
+    def _payment_register_query(self, filters: Optional[PaymentRegisterFilter] = None):
+        """Build the payment register select shared by the sync and async readers.
+
+        Uses LEFT OUTER JOINs so orphaned payment records (product_id = NULL) are included.
+        """
+        from app.models.payment import ProductStatus
+
+        query = select(PaymentInfo, Product, Service, ProductStatus).outerjoin(
+            Product, PaymentInfo.product_id == Product.id
+        ).outerjoin(
+            Service, Product.service_id == Service.id
+        ).outerjoin(
+            ProductStatus, Product.status_id == ProductStatus.id
+        )
+
+        if filters is not None:
+            query = query.where(*self._register_conditions(filters))
+        return query
+
+    @staticmethod
+    def _register_conditions(filters: PaymentRegisterFilter) -> list:
+        conditions = []
+        if filters.search:
+            conditions.append(Product.name.ilike(f"%{filters.search}%"))
+        if filters.statuses:
+            conditions.append(PaymentInfo.status.in_(filters.statuses))
+        if filters.currency_ids:
+            conditions.append(PaymentInfo.currency_id.in_(filters.currency_ids))
+        if filters.payment_method_ids:
+            conditions.append(PaymentInfo.payment_method_id.in_(filters.payment_method_ids))
+        if filters.service_ids:
+            conditions.append(Product.service_id.in_(filters.service_ids))
+        if filters.vendors:
+            conditions.append(Service.vendor.in_(filters.vendors))
+        if filters.payment_date_from:
+            conditions.append(PaymentInfo.payment_date >= filters.payment_date_from)
+        if filters.payment_date_to:
+            conditions.append(PaymentInfo.payment_date <= filters.payment_date_to)
+        if filters.usage_end_from:
+            conditions.append(PaymentInfo.usage_end_date >= filters.usage_end_from)
+        if filters.usage_end_to:
+            conditions.append(PaymentInfo.usage_end_date <= filters.usage_end_to)
+        return conditions
+
+    def _payment_register_page_query(self, filters: Optional[PaymentRegisterFilter], with_invoices: bool, with_total: bool = True):
+        """The register rows plus payment method, currency, the total count and
+        (optionally) the invoices of each payment as JSON, all in one statement."""
+        from app.models.payment import Currency
+        from app.models.payment_invoice import PaymentInvoice
+
+        base_query = self._payment_register_query(filters)
+        # Uncorrelated, so PostgreSQL evaluates it once per statement
+        total = select(func.count()).select_from(base_query.subquery()).scalar_subquery()
+        query = base_query.add_columns(PaymentMethod, Currency).outerjoin(
+            PaymentMethod, PaymentInfo.payment_method_id == PaymentMethod.id
+        ).outerjoin(
+            Currency, PaymentInfo.currency_id == Currency.id
+        )
+        if with_invoices:
+            invoice = func.json_build_object(
+                "id", PaymentInvoice.id, "original_file_name", PaymentInvoice.original_file_name)
+            invoices = select(
+                func.json_agg(aggregate_order_by(invoice, PaymentInvoice.created_at, PaymentInvoice.id))
+            ).where(PaymentInvoice.payment_info_id == PaymentInfo.id).scalar_subquery()
+            # Payments without invoices skip the lookup
+            invoices = case((PaymentInfo.invoice_count > 0, invoices), else_=literal_column("'[]'::json"))
+            query = query.add_columns(type_coerce(invoices, JSON))
+        else:
+            query = query.add_columns(null())
+        return base_query, query.add_columns(total if with_total else null())
+
+    def _payment_register_page(self, rows, keys, limit: int) -> tuple[CursorPage, Optional[int]]:
+        """Format fetched register rows; the total is None when the page is empty."""
+        rows = build_page(rows, keys, limit)
+        payment_register = CursorPage()
+        payment_register.next_cursor = rows.next_cursor
+        total = None
+        for payment, product, service, product_status, payment_method, currency, invoices, total in rows:
+            payment_register.append(self._format_register_item(
+                payment, product, service, product_status, payment_method, currency, invoices))
+        return payment_register, total
+
+    # Status priority used by the register ordering
+    STATUS_PRIORITY = {'error': 0, 'incomplete': 1, 'complete': 2}
+
+    # Register columns the user can sort by (register item field names)
+    SORT_COLUMNS = ("productName", "productStatus", "serviceName", "serviceVendor", "status", "amount",
+                    "currencyCode", "paymentMethod", "paymentDate", "usageStartDate", "usageEndDate",
+                    "expiryDate", "reporter", "createdAt", "updatedAt")
+
+    def _status_order(self):
+        # Inline literals, so the expression matches ix_payment_info_register_order
+        return case(
+            *[(PaymentInfo.status == literal_column(f"'{status}'"), literal_column(str(priority)))
+              for status, priority in self.STATUS_PRIORITY.items()],
+            else_=literal_column("3")
+        )
+
+    def _payment_register_keys(self, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc") -> List[SortKey]:
+        """Sort by status priority first (error=0, incomplete=1, complete=2),
+        then by payment_date (newest first), then by created_at (newest first),
+        with the payment id as tie-breaker for stable pages and cursors.
+
+        With sort_by (one of SORT_COLUMNS) rows are sorted by that column
+        instead, the payment id breaking ties.  Rows are the register tuples
+        (payment, product, service, product status, payment method, currency, ...).
+        """
+        from app.models.payment import Currency, ProductStatus
+
+        if sort_by:
+            descending = bool(sort_order and sort_order.lower() == "desc")
+            expression, value, nullable = {
+                "productName": (Product.name, lambda row: row[1] and row[1].name, True),
+                "productStatus": (ProductStatus.name, lambda row: row[3] and row[3].name, True),
+                "serviceName": (Service.name, lambda row: row[2] and row[2].name, True),
+                "serviceVendor": (Service.vendor, lambda row: row[2] and row[2].vendor, True),
+                "status": (self._status_order(), lambda row: self.STATUS_PRIORITY.get(row[0].status, 3), False),
+                "amount": (PaymentInfo.amount, lambda row: row[0].amount, True),
+                "currencyCode": (Currency.code, lambda row: row[5] and row[5].code, True),
+                "paymentMethod": (PaymentMethod.name, lambda row: row[4] and row[4].name, True),
+                "paymentDate": (PaymentInfo.payment_date, lambda row: row[0].payment_date, True),
+                "usageStartDate": (PaymentInfo.usage_start_date, lambda row: row[0].usage_start_date, True),
+                "usageEndDate": (PaymentInfo.usage_end_date, lambda row: row[0].usage_end_date, True),
+                "expiryDate": (PaymentInfo.expiry_date, lambda row: row[0].expiry_date, True),
+                "reporter": (PaymentInfo.reporter, lambda row: row[0].reporter, False),
+                "createdAt": (PaymentInfo.created_at, lambda row: row[0].created_at, False),
+                "updatedAt": (PaymentInfo.updated_at, lambda row: row[0].updated_at, False),
+            }[sort_by]
+            return [
+                SortKey(expression, value, descending=descending, nullable=nullable),
+                SortKey(PaymentInfo.id, lambda row: row[0].id, descending=descending),
+            ]
+
+        return [
+            SortKey(self._status_order(), lambda row: self.STATUS_PRIORITY.get(row[0].status, 3)),
+            SortKey(PaymentInfo.payment_date, lambda row: row[0].payment_date,
+                    descending=True, nullable=True, nulls_first=False),
+            SortKey(PaymentInfo.created_at, lambda row: row[0].created_at, descending=True),
+            SortKey(PaymentInfo.id, lambda row: row[0].id, descending=True),
+        ]
+
+    @staticmethod
+    def _format_register_item(payment, product, service, product_status, payment_method, currency,
+                               invoices: Optional[list] = None) -> dict:
+        """Shape one payment row the way the payment register frontend expects it."""
+        # Format dates for frontend display (MM/DD/YYYY)
+        formatted_expiry_date = None
+        formatted_payment_date = None
+        formatted_usage_start = None
+        formatted_usage_end = None
+
+        if payment.expiry_date:
+            formatted_expiry_date = payment.expiry_date.strftime(
+                "%m/%d/%Y")
+        if payment.payment_date:
+            formatted_payment_date = payment.payment_date.strftime(
+                "%m/%d/%Y")
+        if payment.usage_start_date:
+            formatted_usage_start = payment.usage_start_date.strftime(
+                "%m/%d/%Y")
+        if payment.usage_end_date:
+            formatted_usage_end = payment.usage_end_date.strftime(
+                "%m/%d/%Y")
+
+        payment_info_dict = {
+            "id": str(payment.id),
+            "status": payment.status,
+            "amount": float(payment.amount) if payment.amount else None,
+            "cardholderName": payment.cardholder_name,
+            "expiryDate": formatted_expiry_date,
+            "paymentMethod": payment_method.name if payment_method else None,
+            "paymentMethodId": payment.payment_method_id,
+            "paymentMethodDescription": payment_method.description if payment_method else None,
+            "currencyId": payment.currency_id,
+            "currencyCode": currency.code if currency else None,
+            "currencySymbol": currency.symbol if currency else None,
+            "paymentDate": formatted_payment_date,
+            "usageStartDate": formatted_usage_start,
+            "usageEndDate": formatted_usage_end,
+            "reporter": payment.reporter,
+            "createdAt": payment.created_at.isoformat() if payment.created_at else None,
+            "updatedAt": payment.updated_at.isoformat() if payment.updated_at else None,
+            "invoiceCount": payment.invoice_count,
+            "lastInvoiceAt": payment.last_invoice_at.isoformat() if payment.last_invoice_at else None
+        }
+        if invoices is not None:
+            payment_info_dict["invoices"] = invoices
+
+        # Handle orphaned payments (product deleted)
+        return {
+            "paymentId": str(payment.id),
+            "productId": str(product.id) if product else None,
+            "productName": product.name if product else None,
+            "productDescription": product.description if product else None,
+            "productStatus": product_status.name if product_status else None,
+            "serviceName": service.name if service else None,
+            "serviceVendor": service.vendor if service else None,
+            "paymentInfo": payment_info_dict
+        }
+
+    def get_payment_register(self, db: Session, skip: int = 0, limit: int = 100, filters: Optional[PaymentRegisterFilter] = None, cursor: Optional[str] = None, with_invoices: bool = False, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc") -> tuple[List[dict], int]:
         """Get all payment records for all products for the payment register (one-to-many).
 
         Returns a flat list where each payment record is a separate item.
         Multiple payments for the same product will appear as multiple items.
         Includes orphaned payment records (where product_id is NULL due to product deletion).
+        The page, its payment methods, currencies, invoices and the total count
+        come from a single statement, whatever the page size.
 
         Args:
-            search: Optional search string to filter by product name (case-insensitive)
+            filters: Optional filters (search by product name, status, currency, dates, ...)
+            cursor: Optional keyset cursor; when given, skip is ignored
+            with_invoices: Add paymentInfo.invoices (id and original_file_name per invoice)
+            sort_by: Optional column of SORT_COLUMNS instead of the status-priority order
+            sort_order: "asc" or "desc" for sort_by
 
         Returns:
-            tuple: (list of payment records, total count)
+            tuple: (list of payment records with next_cursor, total count)
         """
-        from app.models.payment import ProductStatus
+        base_query, query = self._payment_register_page_query(filters, with_invoices)
+        keys = self._payment_register_keys(sort_by, sort_order)
+        page_query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            page_query = page_query.offset(skip)
+        payment_register, total = self._payment_register_page(
+            db.execute(page_query.limit(limit + 1)).all(), keys, limit)
+        if total is None:
+            # Empty page: no row carried the total
+            total = db.execute(
+                select(func.count()).select_from(base_query.subquery())).scalar()
+        return payment_register, total
 
-        # Query all payments with their products and services
-        # Use LEFT OUTER JOIN to include orphaned payments (product_id = NULL)
-        base_query = db.query(PaymentInfo, Product, Service, ProductStatus).outerjoin(
-            Product, PaymentInfo.product_id == Product.id
-        ).outerjoin(
-            Service, Product.service_id == Service.id
+    async def get_payment_register_async(self, db: AsyncSession, skip: int = 0, limit: int = 100, filters: Optional[PaymentRegisterFilter] = None, cursor: Optional[str] = None, with_invoices: bool = False, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc") -> tuple[List[dict], int]:
+        """Asyncio variant of get_payment_register for the v2 register endpoint."""
+        base_query, query = self._payment_register_page_query(filters, with_invoices)
+        keys = self._payment_register_keys(sort_by, sort_order)
+        page_query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            page_query = page_query.offset(skip)
+        payment_register, total = self._payment_register_page(
+            (await db.execute(page_query.limit(limit + 1))).all(), keys, limit)
+        if total is None:
+            total = (await db.execute(
+                select(func.count()).select_from(base_query.subquery()))).scalar()
+        return payment_register, total
+
+    def _register_validator_query(self, filters: Optional[PaymentRegisterFilter] = None, product_id: Optional[uuid.UUID] = None):
+        """Counts and latest update times of everything a register view shows.
+
+        Covers the filtered payments, their invoices and the joined products,
+        services, statuses, payment methods and currencies, so any change to
+        those rows (including deletions, through the counts) changes the result.
+        """
+        from app.models.payment import Currency, ProductStatus
+
+        query = self._payment_register_query(filters).outerjoin(
+            PaymentMethod, PaymentInfo.payment_method_id == PaymentMethod.id
         ).outerjoin(
-            ProductStatus, Product.status_id == ProductStatus.id
+            Currency, PaymentInfo.currency_id == Currency.id
+        )
+        columns = []
+        if product_id is not None:
+            query = query.where(PaymentInfo.product_id == product_id)
+            # The product itself, also when it has no payments (or is gone)
+            columns.append(select(Product.updated_at).where(Product.id == product_id).correlate(None).scalar_subquery())
+        return query.with_only_columns(
+            *columns,
+            func.count(),
+            func.count(Product.id),
+            func.coalesce(func.sum(PaymentInfo.invoice_count), 0),
+            func.max(PaymentInfo.updated_at),
+            func.max(Product.updated_at),
+            func.max(Service.updated_at),
+            func.max(ProductStatus.updated_at),
+            func.max(PaymentMethod.updated_at),
+            func.max(Currency.updated_at),
+            func.max(PaymentInfo.last_invoice_at),
         )
 
-        # Apply search filter if provided
-        if search:
-            base_query = base_query.filter(Product.name.ilike(f"%{search}%"))
-
-        # Get total count
-        total = base_query.count()
-
-        # Apply ordering and pagination
-        # Sort by status priority first (error=0, incomplete=1, complete=2),
-        # then by payment_date (newest first), then by created_at (newest first)
-        status_order = case(
-            (PaymentInfo.status == 'error', 0),
-            (PaymentInfo.status == 'incomplete', 1),
-            (PaymentInfo.status == 'complete', 2),
-            else_=3
+    def get_register_validator(self, db: Session, *, filters: Optional[PaymentRegisterFilter] = None, product_id: Optional[uuid.UUID] = None) -> tuple:
+        """Validator row for conditional GETs (see _register_validator_query)."""
+        return tuple(db.execute(self._register_validator_query(filters, product_id)).one())
+
+    async def get_register_validator_async(self, db: AsyncSession, *, filters: Optional[PaymentRegisterFilter] = None, product_id: Optional[uuid.UUID] = None) -> tuple:
+        """Asyncio variant of get_register_validator."""
+        return tuple((await db.execute(self._register_validator_query(filters, product_id))).one())
+
+    def iter_payment_register(self, db: Session, filters: Optional[PaymentRegisterFilter] = None, batch_size: int = 1000,
+                              sort_by: Optional[str] = None, sort_order: Optional[str] = "asc") -> Iterator[dict]:
+        """Yield every register item (with invoices) in register order.
+
+        Rows are read through a server-side cursor, batch_size at a time, and
+        only formatted dicts leave this method; the session's identity map is
+        weak, so loaded objects are released once a batch is consumed and
+        memory does not grow with the number of payments.  Meant for exports;
+        the session should not be used for anything else meanwhile.
+        """
+        _, query = self._payment_register_page_query(filters, with_invoices=True, with_total=False)
+        query = query.order_by(*keyset_order_by(self._payment_register_keys(sort_by, sort_order)))
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        try:
+            for rows in result.partitions():
+                for payment, product, service, product_status, payment_method, currency, invoices, _ in rows:
+                    yield self._format_register_item(
+                        payment, product, service, product_status, payment_method, currency, invoices)
+        finally:
+            result.close()
+
+    def bulk_update(self, db: Session, *, changes: Dict[uuid.UUID, dict]) -> None:
+        """Apply per-payment column changes ({payment id: {column: value}}).
+
+        Payments changing the same set of columns share one
+        UPDATE ... FROM (VALUES ...) statement.  The caller validates the
+        changes; completeness is not re-evaluated here.
+        """
+        table = PaymentInfo.__table__
+        groups: Dict[tuple, list] = {}
+        for payment_id, payment_changes in changes.items():
+            groups.setdefault(tuple(sorted(payment_changes)), []).append((payment_id, payment_changes))
+
+        for columns, items in groups.items():
+            patch = values(
+                column("id", table.c.id.type),
+                *[column(name, table.c[name].type) for name in columns],
+                name="patch",
+            ).data([(payment_id, *[payment_changes[name] for name in columns])
+                    for payment_id, payment_changes in items])
+            db.execute(
+                update(PaymentInfo).where(PaymentInfo.id == patch.c.id).values(
+                    # NULL-only VALUES columns have no type of their own
+                    {name: cast(patch.c[name], table.c[name].type) for name in columns}
+                ).execution_options(synchronize_session=False)
+            )
+
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, PaymentInfo) and obj.id in changes:
+                db.expire(obj)
+        commit_or_flush(db)
+
+    # Statuses the completeness rule decides; 'error' (orphaned payment) is left alone
+    EVALUATED_STATUSES = ('incomplete', 'complete')
+
+    @staticmethod
+    def _is_complete():
+        """The completeness rule as a SQL condition on PaymentInfo.
+
+        Amount, cardholder, payment method, payment and usage dates and
+        reporter are filled in and the payment has at least one invoice.
+        expiry_date is optional (credit card expiry) and not required.
+        """
+        return and_(
+            PaymentInfo.amount.isnot(None),
+            func.coalesce(PaymentInfo.cardholder_name, '') != '',
+            PaymentInfo.payment_method_id.isnot(None),
+            PaymentInfo.payment_date.isnot(None),
+            PaymentInfo.usage_start_date.isnot(None),
+            PaymentInfo.usage_end_date.isnot(None),
+            func.coalesce(PaymentInfo.reporter, '') != '',
+            PaymentInfo.invoice_count > 0,
         )
 
-        payments_query = base_query.order_by(
-            status_order,
-            PaymentInfo.payment_date.desc().nulls_last(),
-            PaymentInfo.created_at.desc()
-        ).offset(skip).limit(limit).all()
-
-        payment_register = []
-        for payment, product, service, product_status in payments_query:
-            # Get payment method name if available
-            payment_method_name = None
-            payment_method_description = None
-            if payment.payment_method_id:
-                payment_method = db.query(PaymentMethod).filter(
-                    PaymentMethod.id == payment.payment_method_id
-                ).first()
-                if payment_method:
-                    payment_method_name = payment_method.name
-                    payment_method_description = payment_method.description
-
-            # Get currency information if available
-            currency_code = None
-            currency_symbol = None
-            if payment.currency_id:
-                from app.models.payment import Currency
-                currency = db.query(Currency).filter(
-                    Currency.id == payment.currency_id
-                ).first()
-                if currency:
-                    currency_code = currency.code
-                    currency_symbol = currency.symbol
-
-            # Format dates for frontend display (MM/DD/YYYY)
-            formatted_expiry_date = None
-            formatted_payment_date = None
-            formatted_usage_start = None
-            formatted_usage_end = None
-
-            if payment.expiry_date:
-                formatted_expiry_date = payment.expiry_date.strftime(
-                    "%m/%d/%Y")
-            if payment.payment_date:
-                formatted_payment_date = payment.payment_date.strftime(
-                    "%m/%d/%Y")
-            if payment.usage_start_date:
-                formatted_usage_start = payment.usage_start_date.strftime(
-                    "%m/%d/%Y")
-            if payment.usage_end_date:
-                formatted_usage_end = payment.usage_end_date.strftime(
-                    "%m/%d/%Y")
-
-            payment_info_dict = {
-                "id": str(payment.id),
-                "status": payment.status,
-                "amount": float(payment.amount) if payment.amount else None,
-                "cardholderName": payment.cardholder_name,
-                "expiryDate": formatted_expiry_date,
-                "paymentMethod": payment_method_name,
-                "paymentMethodId": payment.payment_method_id,
-                "paymentMethodDescription": payment_method_description,
-                "currencyId": payment.currency_id,
-                "currencyCode": currency_code,
-                "currencySymbol": currency_symbol,
-                "paymentDate": formatted_payment_date,
-                "usageStartDate": formatted_usage_start,
-                "usageEndDate": formatted_usage_end,
-                "reporter": payment.reporter,
-                "createdAt": payment.created_at.isoformat() if payment.created_at else None,
-                "updatedAt": payment.updated_at.isoformat() if payment.updated_at else None
-            }
-
-            # Handle orphaned payments (product deleted)
-            payment_register.append({
-                "paymentId": str(payment.id),
-                "productId": str(product.id) if product else None,
-                "productName": product.name if product else None,
-                "productDescription": product.description if product else None,
-                "productStatus": product_status.name if product_status else None,
-                "serviceName": service.name if service else None,
-                "serviceVendor": service.vendor if service else None,
-                "paymentInfo": payment_info_dict
-            })
-
-        # No need to sort here anymore - sorting is done at database level
-        return payment_register, total
+    def refresh_completeness(self, db: Session, *, payment_ids: Optional[Sequence[uuid.UUID]] = None) -> dict:
+        """Set payment statuses from the completeness rule in one statement.
+
+        Evaluates the given payments, or every payment linked to a product when
+        payment_ids is None, and writes only the statuses that change.  Products
+        of payments that became complete move from Overdue back to Active in the
+        same statement.  Pending changes are flushed first (the rule reads them).
+
+        Returns:
+            dict: completed / reopened payment counts and activated product count
+        """
+        from app.models.payment import ProductStatus
+        from app.models.service import Product
+
+        db.flush()
+        evaluated = select(
+            PaymentInfo.id,
+            case((self._is_complete(), 'complete'), else_='incomplete').label("status"),
+        ).where(
+            PaymentInfo.product_id.isnot(None),
+            PaymentInfo.status.in_(self.EVALUATED_STATUSES),
+        )
+        if payment_ids is not None:
+            evaluated = evaluated.where(PaymentInfo.id.in_(payment_ids))
+        evaluated = evaluated.subquery("evaluated")
+
+        changed = update(PaymentInfo).where(
+            PaymentInfo.id == evaluated.c.id,
+            PaymentInfo.status != evaluated.c.status,
+        ).values(status=evaluated.c.status).returning(
+            PaymentInfo.product_id, PaymentInfo.status
+        ).cte("changed")
+
+        active_id = select(ProductStatus.id).where(ProductStatus.name == 'Active').scalar_subquery()
+        overdue_id = select(ProductStatus.id).where(ProductStatus.name == 'Overdue').scalar_subquery()
+        activated = update(Product).where(
+            Product.status_id == overdue_id,
+            active_id.isnot(None),
+            Product.id.in_(select(changed.c.product_id).where(changed.c.status == 'complete')),
+        ).values(status_id=active_id).returning(Product.id).cte("activated")
+
+        completed, reopened, products_activated = db.execute(select(
+            select(func.count()).select_from(changed).where(changed.c.status == 'complete').scalar_subquery(),
+            select(func.count()).select_from(changed).where(changed.c.status == 'incomplete').scalar_subquery(),
+            select(func.count()).select_from(activated).scalar_subquery(),
+        )).one()
+
+        # The statement bypassed the session: reload what it may have changed
+        if completed or reopened:
+            for obj in list(db.identity_map.values()):
+                if isinstance(obj, PaymentInfo):
+                    db.expire(obj, ["status", "updated_at"])
+                elif isinstance(obj, Product) and products_activated:
+                    db.expire(obj, ["status_id", "status", "updated_at"])
+        commit_or_flush(db)
+
+        return {
+            "completed": completed,
+            "reopened": reopened,
+            "products_activated": products_activated,
+        }
+
+    def refresh_status(self, db: Session, payment: PaymentInfo) -> str:
+        """Re-evaluate one payment's completeness and return its status."""
+        self.refresh_completeness(db, payment_ids=[payment.id])
+        return payment.status
 
     def get_incomplete_count(self, db: Session) -> int:
         """Get count of incomplete payment records."""
@@ -181,6 +508,13 @@ class CRUDPaymentInfo(CRUDBase[PaymentInfo, PaymentInfoCreate, PaymentInfoUpdate
             PaymentInfo.status == 'incomplete'
         ).scalar() or 0
 
+    async def get_incomplete_count_async(self, db: AsyncSession) -> int:
+        """Asyncio variant of get_incomplete_count."""
+        result = await db.execute(select(func.count(PaymentInfo.id)).where(
+            PaymentInfo.status == 'incomplete'
+        ))
+        return result.scalar() or 0
+
     def get_expiring_soon(self, db: Session, *, days_ahead: int = 30) -> List[PaymentInfo]:
         """Get payment info for products expiring within specified days."""
         from datetime import datetime, timedelta
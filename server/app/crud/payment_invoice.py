@@ -1,9 +1,11 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 from app.crud.base import CRUDBase
 from app.models.payment_invoice import PaymentInvoice
 from app.schemas.payment_invoice import PaymentInvoiceCreate, PaymentInvoiceUpdate
+from app.db.unit_of_work import commit_or_flush
 import uuid
 import os
 
@@ -13,6 +15,12 @@ class CRUDPaymentInvoice(CRUDBase[PaymentInvoice, PaymentInvoiceCreate, PaymentI
         """Get all invoices for a specific payment record."""
         return db.query(PaymentInvoice).filter(PaymentInvoice.payment_info_id == payment_info_id).all()
 
+    async def get_by_payment_info_id_async(self, db: AsyncSession, *, payment_info_id: uuid.UUID) -> List[PaymentInvoice]:
+        """Asyncio variant of get_by_payment_info_id."""
+        result = await db.execute(select(PaymentInvoice).where(
+            PaymentInvoice.payment_info_id == payment_info_id))
+        return list(result.scalars().all())
+
     def get_by_product_id(self, db: Session, *, product_id: uuid.UUID) -> List[PaymentInvoice]:
         """Get all invoices for a specific product (across all payment records)."""
         from app.models.payment import PaymentInfo
@@ -67,8 +75,10 @@ class CRUDPaymentInvoice(CRUDBase[PaymentInvoice, PaymentInvoiceCreate, PaymentI
                 os.remove(db_obj.file_path)
 
             # Delete database record
+            payment_info_id = db_obj.payment_info_id
             db.delete(db_obj)
-            db.commit()
+            commit_or_flush(db)
+            self._expire_invoice_stats(db, payment_info_id)
             return True
         except Exception as e:
             db.rollback()
@@ -84,7 +94,19 @@ class CRUDPaymentInvoice(CRUDBase[PaymentInvoice, PaymentInvoiceCreate, PaymentI
             original_file_name=original_file_name,
             file_path=file_path
         )
-        return self.create(db, obj_in=invoice_data)
+        invoice = self.create(db, obj_in=invoice_data)
+        self._expire_invoice_stats(db, payment_info_id)
+        return invoice
+
+    @staticmethod
+    def _expire_invoice_stats(db: Session, payment_info_id: uuid.UUID) -> None:
+        """Reload the payment's invoice_count / last_invoice_at, which the
+        payment_invoices triggers updated behind the session's back."""
+        from app.models.payment import PaymentInfo
+
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, PaymentInfo) and obj.id == payment_info_id:
+                db.expire(obj, ["invoice_count", "last_invoice_at"])
 
 
 payment_invoice = CRUDPaymentInvoice(PaymentInvoice)
@@ -1,11 +1,15 @@
 from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from app.crud.base import CRUDBase
 from app.models.service import Product
 from app.models.permission import PermissionAssignment
 from app.models.department import DepartmentProductAssignment
 from app.models.payment import PaymentInfo
 from app.schemas.service import ProductCreate, ProductUpdate
+from app.db.unit_of_work import commit_or_flush
+from app.crud.pagination import SortKey, apply_keyset, build_page
 import uuid
 from datetime import date
 
@@ -30,8 +34,7 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
                 if user:
                     db_obj.admins.append(user)
 
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
     def get_products_for_user(
@@ -113,6 +116,64 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
 
         return products, total
 
+    def _products_select(
+        self, *, user_id: uuid.UUID, is_admin: bool = False, service_id: Optional[uuid.UUID] = None, search: Optional[str] = None
+    ):
+        """Build the permission-filtered product select used by the async readers."""
+        query = select(Product)
+        if not is_admin:
+            query = query.join(
+                PermissionAssignment,
+                Product.id == PermissionAssignment.product_id
+            ).where(
+                PermissionAssignment.user_id == user_id
+            )
+        if service_id is not None:
+            query = query.where(Product.service_id == service_id)
+        # Apply search filter if provided (prefix match)
+        if search:
+            query = query.where(Product.name.ilike(f"{search}%"))
+        return query
+
+    @staticmethod
+    def _product_keys() -> List[SortKey]:
+        # Alphabetical, product id as tie-breaker for stable pages and cursors
+        return [
+            SortKey(Product.name, lambda p: p.name),
+            SortKey(Product.id, lambda p: p.id),
+        ]
+
+    async def _fetch_products_async(self, db: AsyncSession, query, skip: int, limit: int, cursor: Optional[str] = None) -> tuple[List[Product], int]:
+        total = (await db.execute(
+            select(func.count()).select_from(query.subquery()))).scalar()
+        keys = self._product_keys()
+        page_query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            page_query = page_query.offset(skip)
+        # Admins are a collection; selectinload keeps LIMIT on the product rows
+        result = await db.execute(page_query.options(
+            joinedload(Product.service),
+            joinedload(Product.latest_payment),
+            selectinload(Product.admins)
+        ).limit(limit + 1))
+        return build_page(list(result.scalars().all()), keys, limit), total
+
+    async def get_products_for_user_async(
+        self, db: AsyncSession, *, user_id: uuid.UUID, is_admin: bool = False, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> tuple[List[Product], int]:
+        """Asyncio variant of get_products_for_user, with optional keyset cursor."""
+        query = self._products_select(
+            user_id=user_id, is_admin=is_admin, search=search)
+        return await self._fetch_products_async(db, query, skip, limit, cursor)
+
+    async def get_by_service_async(
+        self, db: AsyncSession, *, service_id: uuid.UUID, user_id: uuid.UUID, is_admin: bool = False, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> tuple[List[Product], int]:
+        """Asyncio variant of get_by_service, with optional keyset cursor."""
+        query = self._products_select(
+            user_id=user_id, is_admin=is_admin, service_id=service_id, search=search)
+        return await self._fetch_products_async(db, query, skip, limit, cursor)
+
     def user_can_access(
         self, db: Session, *, product_id: uuid.UUID, user_id: uuid.UUID, is_admin: bool = False
     ) -> bool:
@@ -167,8 +228,7 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         )
 
         db.add(payment_record)
-        db.commit()
-        db.refresh(product)
+        commit_or_flush(db, product)
 
         return product
 
@@ -199,7 +259,7 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         # Now delete the product
         # payment_info will have product_id set to NULL by database trigger
         db.delete(obj)
-        db.commit()
+        commit_or_flush(db)
         return obj
 
 
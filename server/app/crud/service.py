@@ -1,10 +1,12 @@
-from typing import List, Optional
+from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.crud.base import CRUDBase
 from app.models.service import Service, Product
 from app.models.permission import PermissionAssignment
 from app.schemas.service import ServiceCreate, ServiceUpdate
+from app.db.unit_of_work import commit_or_flush
+from app.crud.pagination import SortKey, CursorPage, apply_keyset, build_page
 import uuid
 
 
@@ -34,8 +36,7 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceUpdate]):
                 if user:
                     db_obj.admins.append(user)
 
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
     def update_with_products(self, db: Session, *, db_obj: Service, obj_in: ServiceUpdate) -> Service:
@@ -73,8 +74,7 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceUpdate]):
                 if user:
                     db_obj.admins.append(user)
 
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
     def remove_non_destructive(self, db: Session, *, id: uuid.UUID) -> bool:
@@ -87,21 +87,33 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceUpdate]):
         obj = db.query(Service).filter(Service.id == id).first()
         if obj:
             db.delete(obj)
-            db.commit()
+            commit_or_flush(db)
             return True
         return False
 
+    @staticmethod
+    def _keyset_page(query, keys, skip: int, limit: int, cursor: Optional[str]) -> CursorPage:
+        query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        return build_page(query.limit(limit + 1).all(), keys, limit)
+
     def get_services_for_user(
-        self, db: Session, *, user_id: uuid.UUID, is_admin: bool = False, skip: int = 0, limit: int = 100, search: Optional[str] = None
-    ) -> tuple[List, int]:
+        self, db: Session, *, user_id: uuid.UUID, is_admin: bool = False, skip: int = 0, limit: int = 100, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> tuple[CursorPage, int]:
         """Get services filtered by user permissions with their products and admins.
 
         Args:
             search: Optional search string to filter by service name (case-insensitive)
+            cursor: Optional keyset cursor (ordered by name, then id); replaces skip
 
         Returns:
             tuple: (list of service dicts, total count)
         """
+        keys = [
+            SortKey(Service.name, lambda s: s.name),
+            SortKey(Service.id, lambda s: s.id),
+        ]
         if is_admin:
             # Admin can see all services
             query = db.query(Service)
@@ -109,7 +121,7 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceUpdate]):
             if search:
                 query = query.filter(Service.name.ilike(f"%{search}%"))
             total = query.count()
-            services = query.offset(skip).limit(limit).all()
+            services = self._keyset_page(query, keys, skip, limit, cursor)
         else:
             # Non-admin users see only services they have permission for
             query = db.query(Service).join(
@@ -123,10 +135,11 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceUpdate]):
                 query = query.filter(Service.name.ilike(f"%{search}%"))
             query = query.distinct()
             total = query.count()
-            services = query.offset(skip).limit(limit).all()
+            services = self._keyset_page(query, keys, skip, limit, cursor)
 
         # Convert to dict format for JSON serialization
-        result = []
+        result = CursorPage()
+        result.next_cursor = services.next_cursor
         for service in services:
             from app.schemas.service import ServiceWithProducts, ProductSimple, AdminSimple
 
@@ -1,12 +1,22 @@
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.crud.base import CRUDBase
 from app.models.user import User, Role, UserRole
 from app.models.permission import PermissionAssignment
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash, verify_password
+from app.db.unit_of_work import commit_or_flush
+from app.core.password_hashing import verify_and_update_password_async
+from app.core.principal import invalidate_principal, principal_cache
+from app.core.config import settings
+from app.crud.pagination import SortKey, CursorPage, apply_keyset, build_page
 import uuid
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -26,8 +36,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
                 obj_in.password) if obj_in.password else None,
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        commit_or_flush(db, db_obj)
         return db_obj
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
@@ -40,167 +49,221 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             return None
         return user
 
+    async def authenticate_async(self, db: AsyncSession, *, email: str, password: str) -> Optional[User]:
+        """Authenticate without blocking the event loop; bcrypt runs in the password hashing pool.
+
+        With PASSWORD_REHASH_ON_LOGIN a hash made with another cost is replaced
+        by one made with the configured BCRYPT_ROUNDS.
+        """
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+        if not user or not user.password_hash:
+            return None
+        valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+        if not valid:
+            return None
+        if new_hash and settings.PASSWORD_REHASH_ON_LOGIN:
+            user.password_hash = new_hash
+            await db.commit()
+            # Picks up the perm_version bumped by the update trigger
+            await db.refresh(user)
+            principal_cache.invalidate([user.id])
+            logger.info(f"Rehashed password of user {user.id}")
+        return user
+
     def update_password(self, db: Session, *, user: User, password: str) -> User:
         user.password_hash = get_password_hash(password)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        invalidate_principal(db, user.id)
+        commit_or_flush(db, user)
         return user
 
-    def search_users(
-        self, db: Session, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, skip: int = 0, limit: int = 100, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc", is_active: Optional[bool] = None
-    ) -> List[User]:
+    def provision_azure(
+        self, db: Session, *, email: str, azure_id: Optional[str] = None, name: Optional[str] = None
+    ) -> User:
+        """Find or create the user of an Azure AD identity and make sure it has the Admin role.
+
+        Reads only when the account is already provisioned. Missing pieces are
+        written with INSERT ... ON CONFLICT DO NOTHING, so concurrent first
+        sign-ins do not collide, and committed immediately (unit of work opt-out)
+        so the account exists even if the rest of the request fails.
+        """
+        identity = User.email == email
+        if azure_id:
+            identity = or_(identity, User.azure_id == azure_id)
+        has_admin_role = select(UserRole.user_id).join(Role).where(
+            UserRole.user_id == User.id, Role.name == "Admin").exists()
+        lookup = select(User, has_admin_role).where(identity).limit(1)
+
+        row = db.execute(lookup).first()
+        changed = False
+        if row is None:
+            logger.info(f"Auto-creating Azure AD user: {email}")
+            db.execute(pg_insert(User).values(
+                id=uuid.uuid4(),
+                email=email,
+                name=name or email.split("@")[0],
+                azure_id=azure_id,
+                password_hash=None,  # Azure users don't have password
+                is_active=True,
+            ).on_conflict_do_nothing())
+            changed = True
+            row = db.execute(lookup).first()
+        user, is_admin = row
+
+        # Link an existing (password) account to its Azure identity
+        if user.azure_id is None and azure_id:
+            user.azure_id = azure_id
+            changed = True
+            logger.info(f"Updated existing user {user.id} with Azure ID: {azure_id}")
+
+        # Auto-assign Admin role to Azure users who successfully logged in
+        if not is_admin and user.azure_id is not None:
+            admin_role_id = db.query(Role.id).filter(Role.name == "Admin").scalar()
+            if admin_role_id is not None:
+                db.execute(pg_insert(UserRole).values(
+                    user_id=user.id, role_id=admin_role_id).on_conflict_do_nothing())
+                changed = True
+                logger.info(f"Assigned Admin role to Azure user {user.id} ({email})")
+            else:
+                logger.warning("Admin role not found in database")
+
+        if changed:
+            invalidate_principal(db, user.id)
+            db.commit()
+        return user
+
+    def _user_filters(
+        self, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None
+    ) -> list:
+        """Build the WHERE clauses shared by the user list, its count and its statistics.
+
+        Related-table filters are IN subqueries so the whole search runs as one statement.
+        """
         from app.models.sap_user import SapUser
         from app.models.service import Product
-        from app.models.department import Department
-        from sqlalchemy import asc, desc, func
-        query = db.query(User)
-        
-        # Filter by is_active if specified
-        if is_active is not None:
-            query = query.filter(User.is_active == is_active)
-        
+
+        conditions = []
         if search:
             # Search by name, email, department, or SAP ID (product name search removed)
-            # First, find user IDs that match SAP ID search
-            sap_matching_user_ids = [
-                row[0] for row in db.query(SapUser.user_id).filter(
-                    SapUser.sap_id.ilike(f"%{search}%")
-                ).all()
-            ]
-            
-            # Build search conditions
-            search_conditions = [
+            conditions.append(or_(
                 User.name.ilike(f"%{search}%"),
                 User.email.ilike(f"%{search}%"),
-                User.department.ilike(f"%{search}%")
-            ]
-            
-            # Add SAP ID search condition if there are matching IDs
-            if sap_matching_user_ids:
-                search_conditions.append(User.id.in_(sap_matching_user_ids))
-            
-            query = query.filter(or_(*search_conditions))
-        
+                User.department.ilike(f"%{search}%"),
+                User.id.in_(select(SapUser.user_id).where(
+                    SapUser.sap_id.ilike(f"%{search}%")))
+            ))
+
         # Filter by product name if provided
         if product_name:
-            # Find product IDs that match the product name
-            matching_product_ids = [
-                row[0] for row in db.query(Product.id).filter(
-                    Product.name.ilike(f"%{product_name}%")
-                ).all()
-            ]
-            
-            # Find user IDs assigned to matching products
-            if matching_product_ids:
-                product_matching_user_ids = [
-                    row[0] for row in db.query(PermissionAssignment.user_id).filter(
-                        PermissionAssignment.product_id.in_(matching_product_ids)
-                    ).distinct().all()
-                ]
-                query = query.filter(User.id.in_(product_matching_user_ids))
-            else:
-                # No matching products, return empty result
-                return []
+            conditions.append(User.id.in_(
+                select(PermissionAssignment.user_id).join(
+                    Product, PermissionAssignment.product_id == Product.id
+                ).where(Product.name.ilike(f"%{product_name}%"))
+            ))
+
         if product_id:
             # Filter users assigned to the specific product
-            query = query.join(
-                PermissionAssignment,
-                User.id == PermissionAssignment.user_id
-            ).filter(
-                PermissionAssignment.product_id == product_id
-            )
-        
-        # Apply sorting
-        if sort_by:
-            # For department sorting, we need to join with Department table and sort by department name
-            if sort_by == "department":
-                # Use subquery approach to avoid DISTINCT + ORDER BY issues with computed columns
-                # First, build a subquery to get sorted user IDs
-                # Use COALESCE to handle both department_id (via join) and legacy department field
-                department_sort = func.coalesce(
-                    Department.name,
-                    User.department
-                )
-                # Select both User.id and department_sort for ORDER BY compatibility
-                subquery = db.query(User.id, department_sort.label('dept_sort')).outerjoin(
-                    Department, User.department_id == Department.id
-                )
-                # Apply the same filters to subquery
-                if search:
-                    # Rebuild search conditions for subquery
-                    sap_matching_user_ids = [
-                        row[0] for row in db.query(SapUser.user_id).filter(
-                            SapUser.sap_id.ilike(f"%{search}%")
-                        ).all()
-                    ]
-                    search_conditions_sub = [
-                        User.name.ilike(f"%{search}%"),
-                        User.email.ilike(f"%{search}%"),
-                        User.department.ilike(f"%{search}%")
-                    ]
-                    if sap_matching_user_ids:
-                        search_conditions_sub.append(User.id.in_(sap_matching_user_ids))
-                    subquery = subquery.filter(or_(*search_conditions_sub))
-                if product_name:
-                    # Find product IDs that match the product name
-                    matching_product_ids = [
-                        row[0] for row in db.query(Product.id).filter(
-                            Product.name.ilike(f"%{product_name}%")
-                        ).all()
-                    ]
-                    if matching_product_ids:
-                        product_matching_user_ids = [
-                            row[0] for row in db.query(PermissionAssignment.user_id).filter(
-                                PermissionAssignment.product_id.in_(matching_product_ids)
-                            ).distinct().all()
-                        ]
-                        subquery = subquery.filter(User.id.in_(product_matching_user_ids))
-                    else:
-                        # No matching products, return empty result
-                        return []
-                if product_id:
-                    subquery = subquery.join(
-                        PermissionAssignment,
-                        User.id == PermissionAssignment.user_id
-                    ).filter(
-                        PermissionAssignment.product_id == product_id
-                    )
-                # Group by User.id and department_sort to ensure uniqueness while maintaining order
-                subquery = subquery.group_by(User.id, department_sort)
-                if sort_order and sort_order.lower() == "desc":
-                    subquery = subquery.order_by(desc(department_sort))
-                else:
-                    subquery = subquery.order_by(asc(department_sort))
-                # Get distinct user IDs in sorted order
-                sorted_user_ids = [row[0] for row in subquery.all()]
-                # Fetch users in the sorted order
-                if sorted_user_ids:
-                    # Create a mapping of user_id to position for ordering
-                    id_to_order = {user_id: idx for idx, user_id in enumerate(sorted_user_ids)}
-                    # Fetch users and sort by the order from subquery
-                    users = db.query(User).filter(User.id.in_(sorted_user_ids)).all()
-                    users.sort(key=lambda u: id_to_order.get(u.id, len(sorted_user_ids)))
-                    return users[skip:skip+limit]
-                else:
-                    return []
-            elif sort_by == "name":
-                if sort_order and sort_order.lower() == "desc":
-                    query = query.order_by(desc(User.name))
-                else:
-                    query = query.order_by(asc(User.name))
-            elif sort_by == "position":
-                if sort_order and sort_order.lower() == "desc":
-                    query = query.order_by(desc(User.position))
-                else:
-                    query = query.order_by(asc(User.position))
-            elif sort_by == "hire_date":
-                if sort_order and sort_order.lower() == "desc":
-                    query = query.order_by(desc(User.hire_date))
-                else:
-                    query = query.order_by(asc(User.hire_date))
-        
-        return query.offset(skip).limit(limit).all()
+            conditions.append(User.id.in_(
+                select(PermissionAssignment.user_id).where(
+                    PermissionAssignment.product_id == product_id)
+            ))
+
+        return conditions
+
+    def _search_users_select(
+        self, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc", is_active: Optional[bool] = None
+    ):
+        from app.models.department import Department
+
+        query = select(User).where(*self._user_filters(
+            search=search, product_id=product_id, product_name=product_name))
+
+        # Filter by is_active if specified
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+
+        # Apply sorting; the user id breaks ties so pages and cursors are stable
+        descending = bool(sort_order and sort_order.lower() == "desc")
+        keys = []
+        if sort_by == "department":
+            # COALESCE handles both department_id (via join) and the legacy department field
+            query = query.outerjoin(
+                Department, User.department_id == Department.id)
+            keys.append(SortKey(
+                func.coalesce(Department.name, User.department),
+                lambda u: u.dept_ref.name if u.dept_ref is not None else u.department,
+                descending=descending, nullable=True))
+        elif sort_by == "name":
+            keys.append(SortKey(User.name, lambda u: u.name, descending=descending))
+        elif sort_by == "position":
+            keys.append(SortKey(User.position, lambda u: u.position,
+                                descending=descending, nullable=True))
+        elif sort_by == "hire_date":
+            keys.append(SortKey(User.hire_date, lambda u: u.hire_date,
+                                descending=descending, nullable=True))
+        keys.append(SortKey(User.id, lambda u: u.id, descending=descending))
+
+        return query, keys
+
+    def _count_users_select(
+        self, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, is_active: Optional[bool] = None
+    ):
+        query = select(func.count(User.id)).where(*self._user_filters(
+            search=search, product_id=product_id, product_name=product_name))
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+        return query
+
+    def _user_statistics_select(
+        self, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None
+    ):
+        # Total, active and inactive in a single pass (no is_active filter)
+        return select(
+            func.count(User.id),
+            func.count(User.id).filter(User.is_active == True),
+            func.count(User.id).filter(User.is_active == False)
+        ).where(*self._user_filters(
+            search=search, product_id=product_id, product_name=product_name))
+
+    def search_users(
+        self, db: Session, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, skip: int = 0, limit: int = 100, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc", is_active: Optional[bool] = None, cursor: Optional[str] = None
+    ) -> CursorPage:
+        query, keys = self._search_users_select(
+            search=search, product_id=product_id, product_name=product_name,
+            sort_by=sort_by, sort_order=sort_order, is_active=is_active)
+        query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        rows = list(db.execute(query.limit(limit + 1)).scalars().all())
+        return build_page(rows, keys, limit)
+
+    async def search_users_async(
+        self, db: AsyncSession, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, skip: int = 0, limit: int = 100, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc", is_active: Optional[bool] = None, cursor: Optional[str] = None
+    ) -> CursorPage:
+        """Asyncio variant of search_users; also loads the department relationship."""
+        query, keys = self._search_users_select(
+            search=search, product_id=product_id, product_name=product_name,
+            sort_by=sort_by, sort_order=sort_order, is_active=is_active)
+        query = apply_keyset(query, keys, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        result = await db.execute(
+            query.options(selectinload(User.dept_ref)).limit(limit + 1))
+        return build_page(list(result.scalars().all()), keys, limit)
+
+    def count_users(
+        self, db: Session, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, is_active: Optional[bool] = None
+    ) -> int:
+        query = self._count_users_select(
+            search=search, product_id=product_id, product_name=product_name, is_active=is_active)
+        return db.execute(query).scalar() or 0
+
+    async def count_users_async(
+        self, db: AsyncSession, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None, is_active: Optional[bool] = None
+    ) -> int:
+        query = self._count_users_select(
+            search=search, product_id=product_id, product_name=product_name, is_active=is_active)
+        return (await db.execute(query)).scalar() or 0
 
     def get_user_statistics(
         self, db: Session, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None
@@ -209,77 +272,20 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         Get user statistics: total, active, and inactive counts.
         Optionally filtered by search and product_id.
         """
-        from app.models.sap_user import SapUser
-        from app.models.service import Product
-        from sqlalchemy import or_, func
-        
-        # Build base query
-        query = db.query(User)
-        
-        # Apply same filters as search_users (without is_active filter)
-        if search:
-            # Search by name, email, department, or SAP ID (product name search removed)
-            sap_matching_user_ids = [
-                row[0] for row in db.query(SapUser.user_id).filter(
-                    SapUser.sap_id.ilike(f"%{search}%")
-                ).all()
-            ]
-            
-            search_conditions = [
-                User.name.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
-                User.department.ilike(f"%{search}%")
-            ]
-            
-            if sap_matching_user_ids:
-                search_conditions.append(User.id.in_(sap_matching_user_ids))
-            
-            query = query.filter(or_(*search_conditions))
-        
-        # Filter by product name if provided
-        if product_name:
-            # Find product IDs that match the product name
-            matching_product_ids = [
-                row[0] for row in db.query(Product.id).filter(
-                    Product.name.ilike(f"%{product_name}%")
-                ).all()
-            ]
-            
-            # Find user IDs assigned to matching products
-            if matching_product_ids:
-                product_matching_user_ids = [
-                    row[0] for row in db.query(PermissionAssignment.user_id).filter(
-                        PermissionAssignment.product_id.in_(matching_product_ids)
-                    ).distinct().all()
-                ]
-                query = query.filter(User.id.in_(product_matching_user_ids))
-            else:
-                # No matching products, return empty statistics
-                return {
-                    "total": 0,
-                    "active": 0,
-                    "inactive": 0
-                }
-        
-        if product_id:
-            query = query.join(
-                PermissionAssignment,
-                User.id == PermissionAssignment.user_id
-            ).filter(
-                PermissionAssignment.product_id == product_id
-            )
-        
-        # Count total
-        total = query.count()
-        
-        # Count active (is_active = True)
-        active_query = query.filter(User.is_active == True)
-        active = active_query.count()
-        
-        # Count inactive (is_active = False)
-        inactive_query = query.filter(User.is_active == False)
-        inactive = inactive_query.count()
-        
+        total, active, inactive = db.execute(self._user_statistics_select(
+            search=search, product_id=product_id, product_name=product_name)).one()
+        return {
+            "total": total,
+            "active": active,
+            "inactive": inactive
+        }
+
+    async def get_user_statistics_async(
+        self, db: AsyncSession, *, search: Optional[str] = None, product_id: Optional[uuid.UUID] = None, product_name: Optional[str] = None
+    ) -> dict:
+        """Asyncio variant of get_user_statistics."""
+        total, active, inactive = (await db.execute(self._user_statistics_select(
+            search=search, product_id=product_id, product_name=product_name))).one()
         return {
             "total": total,
             "active": active,
@@ -291,6 +297,11 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             UserRole.user_id == user_id).all()
         return [role.name for role in roles]
 
+    async def get_user_roles_async(self, db: AsyncSession, *, user_id: uuid.UUID) -> List[str]:
+        roles = await db.execute(select(Role.name).join(UserRole).where(
+            UserRole.user_id == user_id).order_by(Role.name))
+        return list(roles.scalars())
+
     def assign_role(self, db: Session, *, user_id: uuid.UUID, role_name: str) -> bool:
         role = db.query(Role).filter(Role.name == role_name).first()
         if not role:
@@ -305,7 +316,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
 
         user_role = UserRole(user_id=user_id, role_id=role.id)
         db.add(user_role)
-        db.commit()
+        invalidate_principal(db, user_id)
+        commit_or_flush(db)
         return True
 
     def remove_role(self, db: Session, *, user_id: uuid.UUID, role_name: str) -> bool:
@@ -318,7 +330,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         ).first()
         if user_role:
             db.delete(user_role)
-            db.commit()
+            invalidate_principal(db, user_id)
+            commit_or_flush(db)
         return True
 
     def assign_service_permission(self, db: Session, *, user_id: uuid.UUID, service_id: uuid.UUID) -> bool:
@@ -333,7 +346,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         permission = PermissionAssignment(
             user_id=user_id, service_id=service_id)
         db.add(permission)
-        db.commit()
+        invalidate_principal(db, user_id)
+        commit_or_flush(db)
         return True
 
     def remove_service_permission(self, db: Session, *, user_id: uuid.UUID, service_id: uuid.UUID) -> bool:
@@ -343,7 +357,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         ).first()
         if permission:
             db.delete(permission)
-            db.commit()
+            invalidate_principal(db, user_id)
+            commit_or_flush(db)
         return True
 
     def assign_product_permission(self, db: Session, *, user_id: uuid.UUID, product_id: uuid.UUID) -> bool:
@@ -358,7 +373,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         permission = PermissionAssignment(
             user_id=user_id, product_id=product_id)
         db.add(permission)
-        db.commit()
+        invalidate_principal(db, user_id)
+        commit_or_flush(db)
         return True
 
     def remove_product_permission(self, db: Session, *, user_id: uuid.UUID, product_id: uuid.UUID) -> bool:
@@ -368,7 +384,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         ).first()
         if permission:
             db.delete(permission)
-            db.commit()
+            invalidate_principal(db, user_id)
+            commit_or_flush(db)
         return True
 
 
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
 from app.models.workflow import WorkflowTask
 from app.schemas.workflow import WorkflowTaskCreate, WorkflowTaskUpdate
+from app.db.unit_of_work import commit_or_flush
 import uuid
 
 
@@ -55,8 +56,7 @@ class CRUDWorkflowTask(CRUDBase[WorkflowTask, WorkflowTaskCreate, WorkflowTaskUp
             status="pending"
         )
         db.add(task)
-        db.commit()
-        db.refresh(task)
+        commit_or_flush(db, task)
         return task
 
     def create_offboarding_task(
@@ -80,8 +80,7 @@ class CRUDWorkflowTask(CRUDBase[WorkflowTask, WorkflowTaskCreate, WorkflowTaskUp
             status="pending"
         )
         db.add(task)
-        db.commit()
-        db.refresh(task)
+        commit_or_flush(db, task)
         return task
 
     def update_attachment_path(
@@ -93,8 +92,7 @@ class CRUDWorkflowTask(CRUDBase[WorkflowTask, WorkflowTaskCreate, WorkflowTaskUp
             task.attachment_path = attachment_path
             if attachment_original_name:
                 task.attachment_original_name = attachment_original_name
-            db.commit()
-            db.refresh(task)
+            commit_or_flush(db, task)
         return task
 
 
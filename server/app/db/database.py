@@ -1,25 +1,113 @@
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedQueuePool, InstrumentedAsyncQueuePool, instrument_engine
+from app.db.unit_of_work import begin_unit_of_work
+
+
+def _connect_args() -> dict:
+    """Per-connection settings passed to psycopg2."""
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _async_connect_args() -> dict:
+    """Per-connection settings passed to asyncpg."""
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    return {}
+
+
+def async_database_url(url: str):
+    """Translate a sync DATABASE_URL (psycopg2) into its asyncpg equivalent."""
+    return make_url(url).set(drivername="postgresql+asyncpg")
+
 
 # Create database engine
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args=_connect_args(),
+)
+instrument_engine(engine, "primary")
+
+# Create asyncio engine for read-heavy endpoints (runs on the event loop, no threadpool)
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_ASYNC_POOL_SIZE,
+    max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args=_async_connect_args(),
+)
+instrument_engine(async_engine.sync_engine, "async")
+
+# Create read replica engines when a replica is configured
+replica_engine = None
+async_replica_engine = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=_connect_args(),
+    )
+    instrument_engine(replica_engine, "replica")
+
+    async_replica_engine = create_async_engine(
+        async_database_url(settings.DATABASE_REPLICA_URL),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=_async_connect_args(),
+    )
+    instrument_engine(async_replica_engine.sync_engine, "async_replica")
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+# Create AsyncSessionLocal class
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False)
+AsyncReplicaSessionLocal = async_sessionmaker(
+    async_replica_engine, autoflush=False, expire_on_commit=False) if async_replica_engine else None
 
 # Create Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency to get database session."""
+def get_db(request: Request):
+    """Dependency to get database session (committed once per request, see unit_of_work)."""
     db = SessionLocal()
+    begin_unit_of_work(db, request)
     try:
         yield db
     finally:
         db.close()
 
 
-
+async def get_async_db():
+    """Dependency to get an asyncio database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
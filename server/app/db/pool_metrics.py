@@ -0,0 +1,202 @@
+"""Connection pool telemetry for the SQLAlchemy engines.
+
+Every engine created with an instrumented pool class records how long callers
+wait for a connection and how often checkout fails.  Counters are kept per
+process, so each uvicorn worker reports its own pool.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Upper bounds (milliseconds) of the checkout wait time histogram buckets
+WAIT_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Thread-safe counters and wait time histogram for one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.pool = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_timeouts = 0
+            self.connections_created = 0
+            self.connections_invalidated = 0
+            self.wait_time_sum_ms = 0.0
+            self.wait_time_max_ms = 0.0
+            self.wait_time_buckets = [0] * len(WAIT_TIME_BUCKETS_MS)
+
+    def observe_checkout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_sum_ms += wait_ms
+            if wait_ms > self.wait_time_max_ms:
+                self.wait_time_max_ms = wait_ms
+            for idx, bound in enumerate(WAIT_TIME_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.wait_time_buckets[idx] += 1
+                    break
+
+    def record_failure(self, *, timeout: bool = False) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+            if timeout:
+                self.checkout_timeouts += 1
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def record_invalidate(self) -> None:
+        with self._lock:
+            self.connections_invalidated += 1
+
+    def snapshot(self) -> dict:
+        """Return current pool gauges together with the accumulated counters."""
+        pool = self.pool
+        with self._lock:
+            # Cumulative buckets, Prometheus style ("le" = less than or equal)
+            cumulative = []
+            running = 0
+            for bound, count in zip(WAIT_TIME_BUCKETS_MS, self.wait_time_buckets):
+                running += count
+                cumulative.append({"le": bound, "count": running})
+            cumulative.append({"le": "+Inf", "count": self.checkouts})
+
+            return {
+                "name": self.name,
+                "pid": os.getpid(),
+                "pool_size": pool.size() if pool is not None else None,
+                "max_overflow": getattr(pool, "_max_overflow", None),
+                "timeout_seconds": getattr(pool, "_timeout", None),
+                "checked_out": pool.checkedout() if pool is not None else None,
+                "checked_in": pool.checkedin() if pool is not None else None,
+                # QueuePool counts overflow from -pool_size; report only connections beyond pool_size
+                "overflow": max(pool.overflow(), 0) if pool is not None else None,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_timeouts": self.checkout_timeouts,
+                "connections_created": self.connections_created,
+                "connections_invalidated": self.connections_invalidated,
+                "wait_time_ms": {
+                    "sum": round(self.wait_time_sum_ms, 3),
+                    "max": round(self.wait_time_max_ms, 3),
+                    "buckets": cumulative,
+                },
+            }
+
+
+# Registry of metrics by engine name ("primary", "async", ...)
+_registry: Dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    """Get (or create) the metrics holder for the named pool."""
+    if name not in _registry:
+        _registry[name] = PoolMetrics(name)
+    return _registry[name]
+
+
+def all_pool_metrics() -> List[PoolMetrics]:
+    return list(_registry.values())
+
+
+class InstrumentedPoolMixin:
+    """Times `connect()` (queue wait + pre-ping) and counts checkout failures."""
+
+    _metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self._metrics is not None:
+                self._metrics.record_failure(timeout=True)
+            raise
+        except Exception:
+            if self._metrics is not None:
+                self._metrics.record_failure()
+            raise
+        if self._metrics is not None:
+            self._metrics.observe_checkout(
+                (time.perf_counter() - start) * 1000)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same metrics
+        new_pool = super().recreate()
+        if self._metrics is not None:
+            new_pool._metrics = self._metrics
+            self._metrics.pool = new_pool
+        return new_pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Attach pool metrics to an engine created with an instrumented pool class."""
+    metrics = get_pool_metrics(name)
+    metrics.pool = engine.pool
+    engine.pool._metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.record_invalidate()
+
+    return metrics
+
+
+def render_prometheus() -> str:
+    """Render all pool metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP portalops_db_pool_checked_out Connections currently checked out",
+        "# TYPE portalops_db_pool_checked_out gauge",
+        "# HELP portalops_db_pool_overflow Overflow connections currently open",
+        "# TYPE portalops_db_pool_overflow gauge",
+        "# HELP portalops_db_pool_size Configured pool size",
+        "# TYPE portalops_db_pool_size gauge",
+        "# HELP portalops_db_pool_checkout_failures_total Failed checkouts",
+        "# TYPE portalops_db_pool_checkout_failures_total counter",
+        "# HELP portalops_db_pool_checkout_timeouts_total Checkouts that hit pool_timeout",
+        "# TYPE portalops_db_pool_checkout_timeouts_total counter",
+        "# HELP portalops_db_pool_wait_ms Time spent waiting for a connection",
+        "# TYPE portalops_db_pool_wait_ms histogram",
+    ]
+    for metrics in all_pool_metrics():
+        snap = metrics.snapshot()
+        labels = f'pool="{snap["name"]}",pid="{snap["pid"]}"'
+        for key in ("checked_out", "overflow", "pool_size"):
+            if snap[key] is not None:
+                lines.append(f"portalops_db_pool_{key}{{{labels}}} {snap[key]}")
+        lines.append(
+            f"portalops_db_pool_checkout_failures_total{{{labels}}} {snap['checkout_failures']}")
+        lines.append(
+            f"portalops_db_pool_checkout_timeouts_total{{{labels}}} {snap['checkout_timeouts']}")
+        for bucket in snap["wait_time_ms"]["buckets"]:
+            lines.append(
+                f'portalops_db_pool_wait_ms_bucket{{{labels},le="{bucket["le"]}"}} {bucket["count"]}')
+        lines.append(
+            f"portalops_db_pool_wait_ms_sum{{{labels}}} {snap['wait_time_ms']['sum']}")
+        lines.append(
+            f"portalops_db_pool_wait_ms_count{{{labels}}} {snap['checkouts']}")
+    return "\n".join(lines) + "\n"
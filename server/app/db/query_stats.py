@@ -0,0 +1,150 @@
+"""Per-request SQL statement counting and N+1 detection.
+
+Engine-level cursor events record every statement against the stats object
+of the current request (a context variable set by `QueryStatsMiddleware`).
+Statements run outside a request, e.g. by the scheduler, are not counted.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Queries"
+QUERY_TIME_HEADER = "X-DB-Time"
+
+_BIND_PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:::\w+)?(?:\s*,\s*\?(?:::\w+)?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Strip literals and bind parameters so repeated statements compare equal."""
+    normalized = _STRING_LITERAL_RE.sub("?", statement)
+    normalized = _BIND_PARAM_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("(?+)", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def statement_fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class RequestQueryStats:
+    """Statement count, DB time and per-fingerprint counts for one request."""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+        self.by_fingerprint: Counter = Counter()
+        self.statements = {}
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        normalized = normalize_statement(statement)
+        fingerprint = statement_fingerprint(normalized)
+        self.by_fingerprint[fingerprint] += 1
+        self.statements.setdefault(fingerprint, normalized)
+
+    @property
+    def route(self) -> Optional[str]:
+        return _route_path(self.scope) if self.scope is not None else None
+
+    def repeated_statements(self, threshold: int) -> list:
+        """Fingerprints executed more than `threshold` times, most frequent first."""
+        return [
+            (fingerprint, count, self.statements[fingerprint])
+            for fingerprint, count in self.by_fingerprint.most_common()
+            if count > threshold
+        ]
+
+
+_current_stats: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar(
+    "request_query_stats", default=None)
+
+
+def get_current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+    # Read by later listeners on the same event (slow query log)
+    conn.info["last_statement_ms"] = elapsed_ms
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+class QueryStatsMiddleware:
+    """Adds X-DB-Queries / X-DB-Time headers, logs per-request totals and N+1 patterns."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (QUERY_COUNT_HEADER.encode("latin-1"), str(stats.count).encode("latin-1")),
+                    (QUERY_TIME_HEADER.encode("latin-1"), f"{stats.total_ms:.1f}".encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            self._log(scope, stats)
+
+    @staticmethod
+    def _log(scope, stats: RequestQueryStats) -> None:
+        if stats.count == 0:
+            return
+        route = stats.route
+        logger.info(
+            f"{scope['method']} {route} db_queries={stats.count} db_time_ms={stats.total_ms:.1f}")
+        for fingerprint, count, normalized in stats.repeated_statements(settings.DB_N_PLUS_ONE_THRESHOLD):
+            logger.warning("N+1 query pattern detected: " + json.dumps({
+                "event": "n_plus_one",
+                "method": scope["method"],
+                "route": route,
+                "fingerprint": fingerprint,
+                "count": count,
+                "threshold": settings.DB_N_PLUS_ONE_THRESHOLD,
+                "statement": normalized[:500],
+            }))
@@ -0,0 +1,194 @@
+"""Read routing between the primary database and the optional read replica.
+
+Read-only endpoints depend on `get_read_db` / `get_async_read_db`.  A request
+is served from the replica unless one of these applies:
+
+- no DATABASE_REPLICA_URL is configured
+- the client sent ``X-Read-Consistency: primary``
+- the same client wrote within DB_READ_YOUR_WRITES_SECONDS (read-your-writes)
+- the replica lags more than DB_REPLICA_MAX_LAG_SECONDS, or the lag check fails
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from fastapi import Request
+from sqlalchemy import text
+from app.core.config import settings
+from app.db import database
+
+logger = logging.getLogger(__name__)
+
+READ_CONSISTENCY_HEADER = "X-Read-Consistency"
+ROUTE_HEADER = "X-DB-Route"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Replay lag in seconds; an idle replica that has replayed everything reports 0
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaLagMonitor:
+    """Caches the replica lag so only one check runs per DB_REPLICA_LAG_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.lag_seconds: Optional[float] = None
+        self.healthy = False
+        self.last_error: Optional[str] = None
+
+    def _claim_check(self) -> bool:
+        """Return True if the caller should refresh the lag (others reuse the cached value)."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+                return False
+            self._checked_at = now
+            return True
+
+    def _store(self, lag, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.lag_seconds = float(lag) if lag is not None else None
+            self.last_error = error
+            self.healthy = (
+                self.lag_seconds is not None
+                and self.lag_seconds <= settings.DB_REPLICA_MAX_LAG_SECONDS
+            )
+        if not self.healthy:
+            logger.warning(
+                f"Read replica unavailable (lag={self.lag_seconds}, error={error}); reading from primary")
+
+    def replica_usable(self) -> bool:
+        if self._claim_check():
+            try:
+                with database.replica_engine.connect() as conn:
+                    self._store(conn.execute(REPLICA_LAG_SQL).scalar())
+            except Exception as e:
+                self._store(None, str(e))
+        return self.healthy
+
+    async def replica_usable_async(self) -> bool:
+        if self._claim_check():
+            try:
+                async with database.async_replica_engine.connect() as conn:
+                    self._store((await conn.execute(REPLICA_LAG_SQL)).scalar())
+            except Exception as e:
+                self._store(None, str(e))
+        return self.healthy
+
+    def snapshot(self) -> dict:
+        return {
+            "configured": database.replica_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": settings.DB_REPLICA_MAX_LAG_SECONDS,
+            "last_error": self.last_error,
+        }
+
+
+class RecentWriters:
+    """Clients that wrote recently, kept on the primary until their write has replicated."""
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._expires: Dict[str, float] = {}
+        self._max_entries = max_entries
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._expires) >= self._max_entries:
+                self._expires = {k: v for k, v in self._expires.items() if v > now}
+            self._expires[key] = now + settings.DB_READ_YOUR_WRITES_SECONDS
+
+    def is_recent(self, key: str) -> bool:
+        with self._lock:
+            expires = self._expires.get(key)
+        return expires is not None and expires > time.monotonic()
+
+
+lag_monitor = ReplicaLagMonitor()
+recent_writers = RecentWriters()
+
+
+def _client_key(headers, client) -> str:
+    """Identify a client by its bearer token (hashed), falling back to its address."""
+    authorization = headers.get("authorization")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).hexdigest()
+    return client[0] if client else "anonymous"
+
+
+def _wants_replica(request: Request) -> bool:
+    if request.headers.get(READ_CONSISTENCY_HEADER, "").lower() == "primary":
+        return False
+    return not recent_writers.is_recent(_client_key(request.headers, request.client))
+
+
+def read_session_factory(request: Request):
+    """Pick the session factory for a read-only request and record the route."""
+    use_replica = (
+        database.ReplicaSessionLocal is not None
+        and _wants_replica(request)
+        and lag_monitor.replica_usable()
+    )
+    request.state.db_route = "replica" if use_replica else "primary"
+    return database.ReplicaSessionLocal if use_replica else database.SessionLocal
+
+
+def get_read_db(request: Request):
+    """Dependency to get a database session for read-only endpoints."""
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """Dependency to get an asyncio database session for read-only endpoints."""
+    use_replica = (
+        database.AsyncReplicaSessionLocal is not None
+        and _wants_replica(request)
+        and await lag_monitor.replica_usable_async()
+    )
+    request.state.db_route = "replica" if use_replica else "primary"
+    session_factory = database.AsyncReplicaSessionLocal if use_replica else database.AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary after a successful write and reports the read route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_write = scope["method"] not in SAFE_METHODS
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                if is_write and message["status"] < 400:
+                    headers = {k.decode("latin-1").lower(): v.decode("latin-1")
+                               for k, v in scope.get("headers", [])}
+                    recent_writers.mark(_client_key(headers, scope.get("client")))
+                route = scope.get("state", {}).get("db_route")
+                if route:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (ROUTE_HEADER.encode("latin-1"), route.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
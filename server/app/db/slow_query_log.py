@@ -0,0 +1,185 @@
+"""Slow query log with automatic EXPLAIN capture.
+
+Statements slower than DB_SLOW_QUERY_MS are written as JSON lines to a
+rotating file (DB_SLOW_QUERY_LOG_FILE), together with their redacted bind
+parameters, the request route and, for SELECTs, an ``EXPLAIN (FORMAT JSON)``
+plan.  Aggregates per statement fingerprint are kept in memory for the
+``/debug/db/slow-queries`` endpoint.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.db.query_stats import get_current_stats, normalize_statement, statement_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Re-run EXPLAIN for the same fingerprint at most this often
+EXPLAIN_INTERVAL_SECONDS = 300
+MAX_TRACKED_STATEMENTS = 500
+
+_file_logger: Optional[logging.Logger] = None
+_file_logger_lock = threading.Lock()
+
+
+def _get_file_logger() -> logging.Logger:
+    """Dedicated, non-propagating logger writing to the rotating slow query file."""
+    global _file_logger
+    with _file_logger_lock:
+        if _file_logger is None:
+            log_dir = os.path.dirname(settings.DB_SLOW_QUERY_LOG_FILE)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(
+                settings.DB_SLOW_QUERY_LOG_FILE,
+                maxBytes=settings.DB_SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=settings.DB_SLOW_QUERY_LOG_BACKUP_COUNT,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            file_logger = logging.getLogger("portalops.slow_queries")
+            file_logger.setLevel(logging.INFO)
+            file_logger.propagate = False
+            file_logger.addHandler(handler)
+            _file_logger = file_logger
+    return _file_logger
+
+
+def redact_parameters(parameters):
+    """Replace bind values with their type (and length for strings/bytes)."""
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    if parameters is None:
+        return None
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__}:{len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+class SlowQueryStats:
+    """In-memory aggregates of slow statements, keyed by fingerprint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+
+    def record(self, fingerprint: str, normalized: str, elapsed_ms: float, route: Optional[str]) -> bool:
+        """Record one slow execution; return True if a fresh EXPLAIN plan should be captured."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= MAX_TRACKED_STATEMENTS:
+                    # Evict the statement with the least total time
+                    coldest = min(self._entries, key=lambda k: self._entries[k]["total_ms"])
+                    del self._entries[coldest]
+                entry = self._entries[fingerprint] = {
+                    "fingerprint": fingerprint,
+                    "statement": normalized,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                    "last_seen": None,
+                    "explained_at": 0.0,
+                    "plan": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            route_key = route or "background"
+            entry["routes"][route_key] = entry["routes"].get(route_key, 0) + 1
+            entry["last_seen"] = datetime.now(timezone.utc).isoformat()
+            if now - entry["explained_at"] >= EXPLAIN_INTERVAL_SECONDS:
+                entry["explained_at"] = now
+                return True
+            return False
+
+    def store_plan(self, fingerprint: str, plan) -> None:
+        with self._lock:
+            if fingerprint in self._entries:
+                self._entries[fingerprint]["plan"] = plan
+
+    def top(self, limit: int = 20, sort_by: str = "total_ms") -> List[dict]:
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry["routes"])) for entry in self._entries.values()]
+        entries.sort(key=lambda entry: entry[sort_by], reverse=True)
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+            entry.pop("explained_at", None)
+        return entries[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_stats = SlowQueryStats()
+
+
+def _explain(conn, statement: str, parameters):
+    """Run EXPLAIN (FORMAT JSON) on the same DBAPI connection, inside a savepoint.
+
+    The savepoint keeps a failed EXPLAIN from aborting the caller's transaction.
+    """
+    explain_cursor = conn.connection.cursor()
+    try:
+        explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            row = explain_cursor.fetchone()
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        except Exception:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+    finally:
+        explain_cursor.close()
+    plan = row[0] if row else None
+    # psycopg2 decodes the json column, asyncpg returns the raw text
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _capture_slow_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = conn.info.get("last_statement_ms")
+    if settings.DB_SLOW_QUERY_MS <= 0 or elapsed_ms is None or elapsed_ms < settings.DB_SLOW_QUERY_MS:
+        return
+
+    try:
+        stats = get_current_stats()
+        route = stats.route if stats is not None else None
+        normalized = normalize_statement(statement)
+        fingerprint = statement_fingerprint(normalized)
+        wants_plan = slow_query_stats.record(fingerprint, normalized, elapsed_ms, route)
+
+        plan = None
+        is_select = statement.lstrip()[:6].upper() in ("SELECT", "WITH")
+        if wants_plan and is_select and not executemany:
+            try:
+                plan = _explain(conn, statement, parameters)
+                slow_query_stats.store_plan(fingerprint, plan)
+            except Exception as e:
+                logger.warning(f"Could not EXPLAIN slow query {fingerprint}: {e}")
+
+        _get_file_logger().info(json.dumps({
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "fingerprint": fingerprint,
+            "duration_ms": round(elapsed_ms, 3),
+            "route": route,
+            "statement": statement,
+            "parameters": redact_parameters(parameters),
+            "plan": plan,
+        }, default=str))
+    except Exception as e:
+        # Diagnostics must never break the query that triggered them
+        logger.error(f"Slow query capture failed: {e}")
@@ -0,0 +1,111 @@
+"""Request-scoped unit of work.
+
+Sessions handed out by `get_db` are flagged as part of the request's unit of
+work: CRUD methods call `commit_or_flush`, which only flushes, and
+`UnitOfWorkMiddleware` commits once when the response starts (or rolls back
+on an error response / exception).  Sessions created outside a request (e.g.
+the scheduler's `SessionLocal()`) keep committing immediately.
+
+Code that really needs an intermediate commit calls `db.commit()` directly;
+that is the explicit opt-out and works in both modes.
+"""
+import logging
+import json
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+UNIT_OF_WORK_KEY = "unit_of_work"
+# request.state attribute holding the sessions opened for the request
+SESSIONS_STATE_KEY = "unit_of_work_sessions"
+
+
+def begin_unit_of_work(db: Session, request) -> None:
+    """Flag the session as request-scoped and register it for the commit at response start."""
+    db.info[UNIT_OF_WORK_KEY] = True
+    sessions = getattr(request.state, SESSIONS_STATE_KEY, None)
+    if sessions is None:
+        sessions = []
+        setattr(request.state, SESSIONS_STATE_KEY, sessions)
+    sessions.append(db)
+
+
+def in_unit_of_work(db: Session) -> bool:
+    return db.info.get(UNIT_OF_WORK_KEY, False)
+
+
+def commit_or_flush(db: Session, *refresh_objs) -> None:
+    """Flush inside a request unit of work; otherwise commit and refresh the given objects."""
+    if in_unit_of_work(db):
+        # Flushed objects are not expired, so no refresh round trip is needed
+        db.flush()
+        return
+    db.commit()
+    for obj in refresh_objs:
+        db.refresh(obj)
+
+
+class UnitOfWorkMiddleware:
+    """Commits the request's sessions before the response is sent, rolls back on failure."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        commit_failed = False
+
+        async def send_wrapper(message):
+            nonlocal commit_failed
+            if message["type"] == "http.response.start":
+                sessions = scope.get("state", {}).get(SESSIONS_STATE_KEY, [])
+                if message["status"] < 400:
+                    try:
+                        for db in sessions:
+                            await run_in_threadpool(db.commit)
+                    except Exception as e:
+                        logger.error(f"Unit of work commit failed: {e}")
+                        commit_failed = True
+                        await _rollback(sessions)
+                        await _send_commit_error(send)
+                        return
+                else:
+                    await _rollback(sessions)
+            elif commit_failed:
+                # Drop the original body; the error response has been sent
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            await _rollback(scope.get("state", {}).get(SESSIONS_STATE_KEY, []))
+            raise
+
+
+async def _rollback(sessions) -> None:
+    for db in sessions:
+        try:
+            await run_in_threadpool(db.rollback)
+        except Exception as e:
+            logger.error(f"Unit of work rollback failed: {e}")
+
+
+async def _send_commit_error(send) -> None:
+    body = json.dumps({
+        "error": "database_error",
+        "message": "An error occurred while processing your request"
+    }).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 500,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -7,7 +7,16 @@ from sqlalchemy.exc import SQLAlchemyError
 from app.api.api_v1.api import api_router
 from app.api.api_v2.api import api_router as api_v2_router
 from app.core.config import settings
+from app.core.jwks import jwks_store
+from app.core.perm_version import perm_versions
+from app.core import password_hashing
+from app.core.password_hashing import PasswordHashPoolSaturated
+from app.core.export import ExportCapacityExceeded
 from app.core.scheduler import start_scheduler, stop_scheduler
+from app.db.routing import ReadYourWritesMiddleware, ROUTE_HEADER
+from app.db.unit_of_work import UnitOfWorkMiddleware
+from app.db.query_stats import QueryStatsMiddleware, QUERY_COUNT_HEADER, QUERY_TIME_HEADER
+from app.db import slow_query_log  # noqa: F401  (registers the slow query listener)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,11 +28,20 @@ async def lifespan(app: FastAPI):
     """Handle application startup and shutdown."""
     # Startup
     logger.info("Starting PortalOps application...")
+    if settings.AZURE_AD_ENABLED and settings.AZURE_AD_TENANT_ID:
+        # Warm the signing keys so the first Azure login does not wait for them
+        jwks_store.refresh_in_background()
+    # Start the bcrypt workers now rather than on the first login
+    password_hashing.password_pool.warm_up()
+    if settings.PERM_VERSION_LISTEN:
+        perm_versions.start()
     start_scheduler()
     yield
     # Shutdown
     logger.info("Shutting down PortalOps application...")
     stop_scheduler()
+    perm_versions.stop()
+    password_hashing.password_pool.shutdown()
 
 
 # Create FastAPI application
@@ -42,8 +60,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[QUERY_COUNT_HEADER, QUERY_TIME_HEADER, ROUTE_HEADER],
 )
 
+# Commit each request's database work once, before the response is sent
+app.add_middleware(UnitOfWorkMiddleware)
+
+# Keep clients on the primary right after they write (read replica routing)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Count SQL statements per request (outermost, wraps all other middleware)
+app.add_middleware(QueryStatsMiddleware)
+
 
 # Global exception handlers
 @app.exception_handler(HTTPException)
@@ -71,6 +99,32 @@ async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
     )
 
 
+@app.exception_handler(PasswordHashPoolSaturated)
+async def password_pool_saturated_handler(request: Request, exc: PasswordHashPoolSaturated):
+    """Shed load when every password hashing worker is busy."""
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "service_unavailable",
+            "message": str(exc)
+        },
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(ExportCapacityExceeded)
+async def export_capacity_exceeded_handler(request: Request, exc: ExportCapacityExceeded):
+    """Reject exports beyond EXPORT_MAX_CONCURRENT instead of queueing them."""
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "service_unavailable",
+            "message": str(exc)
+        },
+        headers={"Retry-After": "5"},
+    )
+
+
 @app.exception_handler(ValueError)
 async def value_error_handler(request: Request, exc: ValueError):
     """Handle value errors (e.g., invalid UUID format)."""
@@ -1,6 +1,6 @@
 from .user import User, Role, UserRole
 from .service import Service, Product
-from .payment import PaymentInfo, ProductStatus, PaymentMethod
+from .payment import PaymentInfo, ProductStatus, PaymentMethod, ProductLatestPayment
 from .payment_invoice import PaymentInvoice
 from .permission import PermissionAssignment
 from .workflow import WorkflowTask
@@ -17,6 +17,7 @@ __all__ = [
     "PaymentInfo",
     "ProductStatus",
     "PaymentMethod",
+    "ProductLatestPayment",
     "PaymentInvoice",
     "PermissionAssignment",
     "WorkflowTask",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,12 @@ class AuditLog(Base):
     created_at = Column(DateTime(timezone=True),
                         server_default=func.now(), nullable=False)
 
+    # Indexes (created by alembic migration 0001)
+    __table_args__ = (
+        Index("ix_audit_logs_created_at", created_at.desc()),
+        Index("ix_audit_logs_actor_created_at", "actor_user_id", "created_at"),
+    )
+
     # Relationships
     actor = relationship("User", back_populates="audit_logs")
 
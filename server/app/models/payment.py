@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DECIMAL, ForeignKey, DateTime, Date, CheckConstraint, Integer
+from sqlalchemy import Column, String, DECIMAL, ForeignKey, DateTime, Date, CheckConstraint, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -79,6 +79,9 @@ class PaymentInfo(Base):
                         server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(
     ), onupdate=func.now(), nullable=False)
+    # Maintained by database triggers on payment_invoices (migration 0005), never written here
+    invoice_count = Column(Integer, nullable=False, server_default="0")
+    last_invoice_at = Column(DateTime(timezone=True), nullable=True)
 
     # Constraints
     __table_args__ = (
@@ -86,6 +89,18 @@ class PaymentInfo(Base):
                         name="payment_info_status_check"),
         CheckConstraint("usage_start_date IS NULL OR usage_end_date IS NULL OR usage_end_date >= usage_start_date",
                         name="chk_usage_date_range"),
+        # Indexes (created by alembic migration 0001)
+        Index("ix_payment_info_product_latest", "product_id",
+              payment_date.desc(), created_at.desc()),
+        Index("ix_payment_info_incomplete", "status",
+              postgresql_where=text("status = 'incomplete'")),
+        # Payment register order and filters (migration 0004)
+        Index("ix_payment_info_register_order",
+              text("(CASE WHEN status = 'error' THEN 0 WHEN status = 'incomplete' THEN 1 "
+                   "WHEN status = 'complete' THEN 2 ELSE 3 END)"),
+              payment_date.desc().nulls_last(), created_at.desc(), id.desc()),
+        Index("ix_payment_info_payment_date", "payment_date", "id"),
+        Index("ix_payment_info_usage_end_date", "usage_end_date", "id"),
     )
 
     # Relationships
@@ -95,3 +110,36 @@ class PaymentInfo(Base):
     currency = relationship("Currency", back_populates="payment_info")
     invoices = relationship(
         "PaymentInvoice", back_populates="payment_info", cascade="all, delete-orphan")
+
+
+class ProductLatestPayment(Base):
+    """Latest payment per product, maintained by payment_info triggers (migration 0003).
+
+    Read-only for the application. Holds the latest payment (payment_date DESC,
+    then created_at DESC) and the latest payment with a usage end date (renewals).
+    """
+    __tablename__ = "product_latest_payment"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey(
+        "products.id", ondelete="CASCADE"), primary_key=True)
+    payment_id = Column(UUID(as_uuid=True), ForeignKey(
+        "payment_info.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), nullable=False)
+    amount = Column(DECIMAL(10, 2), nullable=True)
+    payment_date = Column(Date, nullable=True)
+    usage_start_date = Column(Date, nullable=True)
+    usage_end_date = Column(Date, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    renewal_payment_id = Column(UUID(as_uuid=True), ForeignKey(
+        "payment_info.id", ondelete="SET NULL"), nullable=True)
+    renewal_usage_end_date = Column(Date, nullable=True)
+
+    __table_args__ = (
+        Index("ix_product_latest_payment_renewal", renewal_usage_end_date,
+              postgresql_where=text("renewal_usage_end_date IS NOT NULL")),
+    )
+
+    # Relationships
+    product = relationship("Product", back_populates="latest_payment", viewonly=True)
+    payment = relationship("PaymentInfo", foreign_keys=[payment_id], viewonly=True)
+    renewal_payment = relationship("PaymentInfo", foreign_keys=[renewal_payment_id], viewonly=True)
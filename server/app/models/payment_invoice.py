@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,5 +18,10 @@ class PaymentInvoice(Base):
     created_at = Column(DateTime(timezone=True),
                         server_default=func.now(), nullable=False)
 
+    # Indexes (created by alembic migration 0001)
+    __table_args__ = (
+        Index("ix_payment_invoices_payment_info_id", "payment_info_id"),
+    )
+
     # Relationships
     payment_info = relationship("PaymentInfo", back_populates="invoices")
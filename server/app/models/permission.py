@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, CheckConstraint, String
+from sqlalchemy import Column, ForeignKey, CheckConstraint, String, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -23,6 +23,9 @@ class PermissionAssignment(Base):
                         name="check_permission_assignment"),
         CheckConstraint("assignment_source IN ('manual', 'department')",
                         name="check_assignment_source"),
+        # Indexes (created by alembic migration 0001)
+        Index("ix_permission_assignments_user_product", "user_id", "product_id"),
+        Index("ix_permission_assignments_product_user", "product_id", "user_id"),
     )
 
     # Relationships
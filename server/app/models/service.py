@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Integer, Table
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Integer, Table, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -38,6 +38,11 @@ class Service(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(
     ), onupdate=func.now(), nullable=False)
 
+    # Indexes (created by alembic migration 0001)
+    __table_args__ = (
+        Index("ix_services_lower_name", func.lower(name)),
+    )
+
     # Relationships
     products = relationship(
         "Product", back_populates="service")
@@ -67,11 +72,21 @@ class Product(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(
     ), onupdate=func.now(), nullable=False)
 
+    # Indexes (created by alembic migration 0001)
+    __table_args__ = (
+        Index("ix_products_lower_name", func.lower(name)),
+        # Register service / vendor filters (migration 0004)
+        Index("ix_products_service_id", "service_id"),
+    )
+
     # Relationships
     service = relationship("Service", back_populates="products")
     status = relationship("ProductStatus", back_populates="products")
     payment_info = relationship(
         "PaymentInfo", back_populates="product")
+    # Maintained by database triggers (migration 0003), never written here
+    latest_payment = relationship(
+        "ProductLatestPayment", back_populates="product", uselist=False, viewonly=True)
     permission_assignments = relationship(
         "PermissionAssignment", back_populates="product")
     # Many-to-many relationship with User through product_admins table
@@ -23,6 +23,8 @@ class User(Base):
     hire_date = Column(Date, nullable=True)  # Date of hire
     resignation_date = Column(Date, nullable=True)  # Date of resignation
     is_active = Column(Boolean, nullable=False, default=True)  # Active (true) or resigned/inactive (false)
+    # Bumped by database triggers on any change to the user, its roles or permissions
+    perm_version = Column(Integer, nullable=False, server_default="1")
     created_at = Column(DateTime(timezone=True),
                         server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(
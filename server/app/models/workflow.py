@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Date, CheckConstraint
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Date, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -41,6 +41,8 @@ class WorkflowTask(Base):
                         name="check_task_type"),
         CheckConstraint(
             "status IN ('pending', 'completed', 'invited', 'in_progress', 'cancelled')", name="check_task_status"),
+        # Indexes (created by alembic migration 0001)
+        Index("ix_workflow_tasks_status_created_at", "status", "created_at"),
     )
 
     # Relationships
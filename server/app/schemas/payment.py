@@ -18,6 +18,8 @@ class PaymentInfoBase(BaseModel):
     reporter: Optional[str] = None
     billAttachmentPath: Optional[str] = None
     invoices: Optional[List[dict]] = None  # For v2 API with invoice support
+    invoiceCount: int = 0
+    lastInvoiceAt: Optional[str] = None
 
 
 class PaymentInfoCreate(BaseModel):
@@ -71,6 +73,24 @@ class PaymentRegisterSummary(BaseModel):
     incompleteCount: int
 
 
+class PaymentPatch(BaseModel):
+    """One item of a bulk payment update; only the fields sent are changed (null clears)."""
+    paymentId: uuid.UUID
+    amount: Optional[float] = None
+    cardholderName: Optional[str] = None
+    expiryDate: Optional[date] = None
+    paymentMethodId: Optional[int] = None
+    currencyId: Optional[int] = None
+    paymentDate: Optional[date] = None
+    usageStartDate: Optional[date] = None
+    usageEndDate: Optional[date] = None
+    reporter: Optional[str] = None
+
+
+class PaymentBulkUpdate(BaseModel):
+    items: List[PaymentPatch] = Field(..., min_length=1, max_length=500)
+
+
 # Master data schemas
 class ProductStatusBase(BaseModel):
     name: str
@@ -0,0 +1,10 @@
+"""Synthetic data generator and endpoint benchmarks.
+
+Run from the ``server`` directory against a local, disposable database:
+
+    python -m benchmarks.seed --scale 10 --reset
+    python -m benchmarks.run --scales 1 10 100 --output benchmarks/results/baseline.json
+    python -m benchmarks.run --scales 10 --compare benchmarks/results/baseline.json
+    python -m benchmarks.login_storm --logins 8 --duration 10
+    python -m benchmarks.query_counts --routes payment_register
+"""
@@ -0,0 +1,79 @@
+"""Check that pagination cursors only work where they were issued.
+
+Usage (from the server directory):
+
+    python -m benchmarks.cursor_checks [--scale 10] [--no-seed] [--cleanup]
+
+For every case a first page is fetched from the source path as the
+synthetic Admin user and its ``pagination.nextCursor`` is sent to the same
+path (must answer 200) and to the target path, which uses another sort or
+another endpoint (must answer 400, never 500).  The command exits with
+status 1 if any case does not behave that way.
+"""
+import argparse
+import logging
+import sys
+from benchmarks import seed as seed_module
+
+# (name, source path, target path that must reject the source's cursor)
+CASES = [
+    ("register_sort_by", "/api/v2/payment-register?limit=5&sortBy=productName",
+     "/api/v2/payment-register?limit=5&sortBy=paymentDate"),
+    ("register_sort_amount", "/api/v2/payment-register?limit=5&sortBy=paymentDate",
+     "/api/v2/payment-register?limit=5&sortBy=amount"),
+    ("register_sort_order", "/api/v2/payment-register?limit=5&sortBy=amount",
+     "/api/v2/payment-register?limit=5&sortBy=amount&sortOrder=desc"),
+    ("register_default_to_sorted", "/api/v2/payment-register?limit=5",
+     "/api/v2/payment-register?limit=5&sortBy=createdAt"),
+    ("users_sort_by", "/api/users?limit=5&sortBy=name", "/api/users?limit=5&sortBy=hire_date"),
+    ("audit_logs_to_products", "/api/audit-logs?limit=5", "/api/products?limit=5"),
+    ("audit_logs_to_services", "/api/audit-logs?limit=5", "/api/services?limit=5"),
+    ("products_to_services", "/api/products?limit=5", "/api/services?limit=5"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check that foreign pagination cursors are rejected with 400.")
+    parser.add_argument("--scale", type=int, default=1, help="Seed synthetic data at this scale first")
+    parser.add_argument("--no-seed", action="store_true", help="Use the synthetic data already in the database")
+    parser.add_argument("--cleanup", action="store_true", help="Remove synthetic data afterwards")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from fastapi.testclient import TestClient
+    from app.core.security import create_access_token
+    from app.main import app
+
+    if not args.no_seed:
+        seed_module.seed(args.scale, reset_first=True)
+    admin_id = seed_module.admin_user_id()
+    if admin_id is None:
+        raise SystemExit("No synthetic data found; run benchmarks.seed or drop --no-seed")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+
+    failures = []
+    with TestClient(app, raise_server_exceptions=False) as client:
+        for name, source, target in CASES:
+            first = client.get(source, headers=headers)
+            cursor = first.json().get("pagination", {}).get("nextCursor") if first.status_code == 200 else None
+            if not cursor:
+                failures.append(name)
+                print(f"{name:28} no cursor from {source} ({first.status_code})")
+                continue
+            same = client.get(f"{source}&cursor={cursor}", headers=headers).status_code
+            foreign = client.get(f"{target}&cursor={cursor}", headers=headers).status_code
+            ok = same == 200 and foreign == 400
+            if not ok:
+                failures.append(name)
+            print(f"{name:28} same path: {same}  other path: {foreign}" + ("" if ok else "  <- expected 200 / 400"))
+
+    if args.cleanup:
+        with seed_module.engine.begin() as conn:
+            seed_module.reset(conn)
+    if failures:
+        print(f"\nCursor checks failed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Login storm: login throughput and the latency of other routes meanwhile.
+
+Usage (from the server directory):
+
+    python -m benchmarks.login_storm [--logins 8] [--duration 10]
+                                     [--workers 2] [--probe services]
+
+`--logins` client threads post to /api/auth/login in a loop for
+`--duration` seconds while one more thread keeps calling the probe routes.
+The report shows successful logins per second, the 503 (pool saturated)
+rate and login latency, plus the probe routes' p50/p95 latency before and
+during the storm.  `--workers 0` hashes in the request thread, which is how
+logins behaved before the password hashing pool, for comparison.
+"""
+import argparse
+import logging
+import threading
+import time
+from benchmarks import seed as seed_module
+from benchmarks.run import ROUTES, percentile
+
+STORM_EMAIL = f"login-storm@{seed_module.EMAIL_DOMAIN}"
+STORM_PASSWORD = "login-storm-password"
+DEFAULT_PROBES = ["services", "dashboard_stats"]
+
+
+def create_storm_user():
+    """(Re)create the user the storm logs in as; synthetic, so --reset removes it."""
+    from sqlalchemy import delete, insert, select
+    from app.core.password_hashing import crypt_context
+    from app.models.user import User
+
+    with seed_module.engine.begin() as conn:
+        conn.execute(delete(User).where(User.email == STORM_EMAIL))
+        conn.execute(insert(User).values(
+            name=f"{seed_module.NAME_PREFIX} Login Storm", email=STORM_EMAIL,
+            password_hash=crypt_context().hash(STORM_PASSWORD), is_active=True))
+        return conn.execute(select(User.id).where(User.email == STORM_EMAIL)).scalar()
+
+
+def summarize(timings) -> str:
+    if not timings:
+        return "no requests"
+    return (f"n={len(timings):>5} p50={percentile(timings, 50):>8.2f}ms "
+            f"p95={percentile(timings, 95):>8.2f}ms")
+
+
+def probe(client, paths, headers, stop: threading.Event) -> list:
+    timings = []
+    while not stop.is_set():
+        for path in paths:
+            started = time.perf_counter()
+            client.get(path, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def storm(client, stop: threading.Event, results: dict, lock: threading.Lock) -> None:
+    credentials = {"email": STORM_EMAIL, "password": STORM_PASSWORD}
+    while not stop.is_set():
+        started = time.perf_counter()
+        status_code = client.post("/api/auth/login", json=credentials).status_code
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            results.setdefault(status_code, []).append(elapsed)
+
+
+def run_phase(client, seconds: float, logins: int, paths, headers) -> tuple:
+    stop = threading.Event()
+    login_results, lock = {}, threading.Lock()
+    probe_timings = []
+    threads = [threading.Thread(target=storm, args=(client, stop, login_results, lock))
+               for _ in range(logins)]
+    threads.append(threading.Thread(
+        target=lambda: probe_timings.extend(probe(client, paths, headers, stop))))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return login_results, probe_timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure login throughput and route latency under a login storm.")
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent login clients (default: 8)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per phase (default: 10)")
+    parser.add_argument("--workers", type=int, help="Override PASSWORD_HASH_WORKERS (0 = inline hashing)")
+    parser.add_argument("--probe", nargs="+", default=DEFAULT_PROBES,
+                        help=f"Route names from benchmarks.run to probe (default: {' '.join(DEFAULT_PROBES)})")
+    parser.add_argument("--scale", type=int, default=1, help="Seed synthetic data at this scale first")
+    parser.add_argument("--no-seed", action="store_true", help="Use the synthetic data already in the database")
+    parser.add_argument("--cleanup", action="store_true", help="Remove synthetic data afterwards")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    from fastapi.testclient import TestClient
+    from app.core import password_hashing
+    from app.core.security import create_access_token
+    from app.main import app
+
+    if args.workers is not None:
+        password_hashing.password_pool = password_hashing.PasswordHashPool(
+            workers=args.workers, max_pending=password_hashing.password_pool.max_pending)
+    pool = password_hashing.password_pool
+
+    if not args.no_seed:
+        seed_module.seed(args.scale, reset_first=True)
+    admin_id = seed_module.admin_user_id()
+    if admin_id is None:
+        raise SystemExit("No synthetic data found; run benchmarks.seed or drop --no-seed")
+    create_storm_user()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+    routes = dict(ROUTES)
+    paths = [routes[name] for name in args.probe]
+
+    print(f"password hashing workers={pool.workers} max_pending={pool.max_pending} "
+          f"login clients={args.logins}")
+    with TestClient(app) as client:
+        _, baseline = run_phase(client, args.duration, 0, paths, headers)
+        login_results, during = run_phase(client, args.duration, args.logins, paths, headers)
+
+    succeeded = login_results.get(200, [])
+    rejected = login_results.get(503, [])
+    other = sum(len(v) for k, v in login_results.items() if k not in (200, 503))
+    print(f"logins ok:        {len(succeeded) / args.duration:>8.1f}/s  {summarize(succeeded)}")
+    print(f"logins rejected:  {len(rejected) / args.duration:>8.1f}/s  {summarize(rejected)}")
+    if other:
+        print(f"logins failed otherwise: {other}")
+    print(f"probe idle:       {summarize(baseline)}")
+    print(f"probe in storm:   {summarize(during)}")
+
+    if args.cleanup:
+        with seed_module.engine.begin() as conn:
+            seed_module.reset(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Check that list endpoints run a constant number of SQL statements.
+
+Usage (from the server directory):
+
+    python -m benchmarks.query_counts [--limits 10 100 1000 10000] [--routes payment_register]
+
+Every route is requested once per page size (``{limit}`` in its path) as
+the synthetic Admin user, after a warm-up request so the principal is
+cached; page sizes a route does not accept (422) are skipped.  The
+statement count (X-DB-Queries) must not depend on the page size; the
+command exits with status 1 if it does, which points at an N+1 query
+pattern.
+
+A route also fails when the check would prove nothing: a response other
+than 200, a missing X-DB-Queries header, fewer than two page sizes
+measured, or no rows on the largest page.
+"""
+import argparse
+import logging
+import sys
+import time
+from benchmarks import seed as seed_module
+
+# (name, path with a {limit} placeholder)
+ROUTES = [
+    ("payment_register", "/api/v2/payment-register?limit={limit}"),
+    ("payment_register_search", "/api/v2/payment-register?limit={limit}&search=Product"),
+    ("payment_register_filtered", "/api/v2/payment-register?limit={limit}&status=complete&sortBy=paymentDate&sortOrder=desc"),
+    ("users", "/api/users?limit={limit}"),
+    ("services", "/api/services?limit={limit}"),
+    ("products", "/api/products?limit={limit}"),
+    ("audit_logs", "/api/audit-logs?limit={limit}"),
+    ("inbox_tasks", "/api/inbox/tasks?limit={limit}"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check constant SQL statement counts of list endpoints.")
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="Page sizes to compare (default: 10 100 1000 10000)")
+    parser.add_argument("--routes", nargs="+", help="Only check these route names")
+    parser.add_argument("--scale", type=int, default=10, help="Seed synthetic data at this scale first")
+    parser.add_argument("--no-seed", action="store_true", help="Use the synthetic data already in the database")
+    parser.add_argument("--cleanup", action="store_true", help="Remove synthetic data afterwards")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from fastapi.testclient import TestClient
+    from app.core.perm_version import perm_versions
+    from app.core.security import create_access_token
+    from app.main import app
+
+    if not args.no_seed:
+        seed_module.seed(args.scale, reset_first=True)
+    admin_id = seed_module.admin_user_id()
+    if admin_id is None:
+        raise SystemExit("No synthetic data found; run benchmarks.seed or drop --no-seed")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+
+    failures = []
+    with TestClient(app) as client:
+        # Connecting the listener clears the principal cache; let that happen first
+        deadline = time.monotonic() + 5
+        while not perm_versions.listening and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for name, path in ROUTES:
+            if args.routes and name not in args.routes:
+                continue
+            client.get(path.format(limit=min(args.limits)), headers=headers)
+            counts = {}
+            problems = []
+            for limit in args.limits:
+                response = client.get(path.format(limit=limit), headers=headers)
+                if response.status_code == 422:
+                    continue
+                if response.status_code != 200:
+                    problems.append(f"limit={limit} answered {response.status_code}")
+                    continue
+                queries = response.headers.get("X-DB-Queries")
+                if queries is None:
+                    problems.append(f"limit={limit} has no X-DB-Queries header")
+                    continue
+                counts[limit] = (int(queries), len(response.json().get("data", [])))
+            if not problems:
+                if len(counts) < 2:
+                    problems.append("fewer than two page sizes measured")
+                elif counts[max(counts)][1] == 0:
+                    problems.append("no rows on the largest page")
+                elif len({queries for queries, _ in counts.values()}) > 1:
+                    problems.append("grows with the page size")
+            if problems:
+                failures.append(name)
+            print(f"{name:28} " + "  ".join(
+                f"limit={limit}: {queries} statements/{rows} rows" for limit, (queries, rows) in counts.items()
+            ) + "".join(f"  <- {problem}" for problem in problems))
+
+    if args.cleanup:
+        with seed_module.engine.begin() as conn:
+            seed_module.reset(conn)
+    if failures:
+        print(f"\nStatement count not shown to be constant: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Benchmark the list and dashboard endpoints through the ASGI app.
+
+Usage (from the server directory):
+
+    python -m benchmarks.run [--scales 1 10 100] [--iterations 20]
+                             [--output results.json] [--compare baseline.json]
+
+For every scale the database is re-seeded (unless --no-seed), then each
+route is called in-process through the FastAPI app as the synthetic Admin
+user.  Per route the runner reports p50/p95/mean latency, the SQL statement
+count and DB time (X-DB-Queries / X-DB-Time headers) and the peak Python
+memory allocated while serving one request (tracemalloc, measured in a
+separate pass so it does not skew the timings).
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import List, Optional
+from benchmarks import seed as seed_module
+
+# (name, path) of every list and dashboard route
+ROUTES = [
+    ("users", "/api/users?limit=20"),
+    ("users_search", "/api/users?limit=20&search=User%201&sortBy=department"),
+    ("users_deep_page", "/api/users?limit=20&page=50"),
+    ("services", "/api/services?limit=20"),
+    ("products", "/api/products?limit=20"),
+    ("products_search", "/api/products?limit=20&search=Product%201"),
+    ("payment_register", "/api/v2/payment-register?limit=20"),
+    ("payment_register_search", "/api/v2/payment-register?limit=20&search=Product%201"),
+    ("payment_register_summary", "/api/payment-register/summary"),
+    ("audit_logs", "/api/audit-logs?limit=20"),
+    ("inbox_tasks", "/api/inbox/tasks?limit=20"),
+    ("departments", "/api/departments"),
+    ("master_file_invoices", "/api/v2/master-files/invoices"),
+    ("dashboard_stats", "/api/dashboard/stats"),
+    ("dashboard_currency_stats", "/api/dashboard/currency-stats?currency_code=USD"),
+    ("dashboard_recent_activities", "/api/dashboard/recent-activities"),
+    ("dashboard_upcoming_renewals", "/api/dashboard/upcoming-renewals"),
+    ("dashboard_pending_tasks_count", "/api/dashboard/pending-tasks-count"),
+]
+
+# Metrics compared by --compare (lower is better for all of them)
+COMPARED_METRICS = ["p50_ms", "p95_ms", "queries", "peak_memory_kb"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def benchmark_route(client, path: str, headers: dict, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        client.get(path, headers=headers)
+
+    timings, queries, db_times = [], [], []
+    status_code = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        status_code = response.status_code
+        queries.append(int(response.headers.get("X-DB-Queries", 0)))
+        db_times.append(float(response.headers.get("X-DB-Time", 0)))
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        client.get(path, headers=headers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "path": path,
+        "status": status_code,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "queries": max(queries),
+        "db_time_ms": round(percentile(db_times, 50), 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_scale(client, scale: int, *, iterations: int, warmup: int, reseed: bool, routes=ROUTES) -> dict:
+    from app.core.security import create_access_token
+
+    counts = None
+    if reseed:
+        counts = seed_module.seed(scale, reset_first=True)
+    admin_id = seed_module.admin_user_id()
+    if admin_id is None:
+        raise SystemExit("No synthetic data found; run benchmarks.seed or drop --no-seed")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+
+    results = {}
+    for name, path in routes:
+        results[name] = benchmark_route(client, path, headers, iterations, warmup)
+        result = results[name]
+        print(f"  {name:32} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+              f"queries={result['queries']:>4} peak={result['peak_memory_kb']:>9.1f}KB "
+              f"status={result['status']}")
+    return {"row_counts": counts, "routes": results}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print per-route deltas against a previous results file."""
+    print(f"\nComparison with {baseline.get('git_revision') or 'baseline'} ({baseline.get('created_at')})")
+    for scale, scale_result in current["scales"].items():
+        baseline_scale = baseline.get("scales", {}).get(scale)
+        if not baseline_scale:
+            print(f"scale {scale}: not in baseline")
+            continue
+        print(f"scale {scale}:")
+        for name, result in scale_result["routes"].items():
+            old = baseline_scale["routes"].get(name)
+            if not old:
+                continue
+            deltas = []
+            for metric in COMPARED_METRICS:
+                before, after = old.get(metric), result.get(metric)
+                if before is None or after is None:
+                    continue
+                change = ((after - before) / before * 100) if before else 0.0
+                deltas.append(f"{metric}={before}->{after} ({change:+.0f}%)")
+            print(f"  {name:32} " + "  ".join(deltas))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark list and dashboard endpoints.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Data scales to run (default: 1 10 100)")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed requests per route")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per route")
+    parser.add_argument("--routes", nargs="+", help="Only run these route names")
+    parser.add_argument("--no-seed", action="store_true",
+                        help="Use the synthetic data already in the database (single scale)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--cleanup", action="store_true", help="Remove synthetic data afterwards")
+    args = parser.parse_args()
+
+    # Request logs and N+1 warnings would drown the report
+    logging.disable(logging.WARNING)
+
+    routes = [r for r in ROUTES if not args.routes or r[0] in args.routes]
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "iterations": args.iterations,
+        "scales": {},
+    }
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # One client for all scales so the async engines stay on one event loop
+    with TestClient(app) as client:
+        for scale in args.scales:
+            print(f"scale {scale}:")
+            results["scales"][str(scale)] = run_scale(
+                client, scale, iterations=args.iterations, warmup=args.warmup,
+                reseed=not args.no_seed, routes=routes)
+
+    if args.cleanup:
+        with seed_module.engine.begin() as conn:
+            seed_module.reset(conn)
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
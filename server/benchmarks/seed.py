@@ -0,0 +1,288 @@
+"""Fill the database with synthetic, scalable benchmark data.
+
+Usage (from the server directory):
+
+    python -m benchmarks.seed --scale 10 [--reset] [--seed 42]
+
+Scale 1 is a small installation (20 services, 100 products, 200 users);
+every entity grows linearly with the scale.  All generated rows are tagged
+(names start with "Bench", e-mails end with @bench.example) so `--reset`
+removes only synthetic data.  Master data (roles, product statuses,
+payment methods, currencies) must already exist.
+"""
+import argparse
+import random
+import secrets
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import delete, insert, select
+from app.db.database import engine
+from app.core.security import get_password_hash
+from app.models.user import User, Role, UserRole
+from app.models.department import Department, DepartmentProductAssignment
+from app.models.service import Service, Product, service_admins, product_admins
+from app.models.payment import PaymentInfo, PaymentMethod, Currency, ProductStatus
+from app.models.payment_invoice import PaymentInvoice
+from app.models.permission import PermissionAssignment
+from app.models.audit import AuditLog
+from app.models.workflow import WorkflowTask
+from app.models.sap_user import SapUser
+
+NAME_PREFIX = "Bench"
+EMAIL_DOMAIN = "bench.example"
+ADMIN_EMAIL = f"admin@{EMAIL_DOMAIN}"
+BATCH_SIZE = 5000
+
+# Rows per unit of scale
+BASE_COUNTS = {
+    "departments": 10,
+    "services": 20,
+    "products_per_service": 5,
+    "users": 200,
+    "assignments_per_user": 3,
+    "payments_per_product": 3,
+    "audit_logs": 1000,
+    "workflow_tasks": 50,
+}
+
+ACTIONS = [
+    "user.create", "user.update", "service.update", "product.create",
+    "product.update", "payment_info.update", "workflow.task.complete",
+]
+POSITIONS = ["Engineer", "Analyst", "Manager", "Designer", "Accountant", None]
+
+
+class SyntheticData:
+    """Deterministic generator of benchmark rows (same seed, same data)."""
+
+    def __init__(self, scale: int, seed: int = 42):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc)
+
+    def uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def count(self, name: str) -> int:
+        return BASE_COUNTS[name] * self.scale
+
+    def timestamp(self, max_days: int = 730) -> datetime:
+        return self.now - timedelta(seconds=self.rng.randint(0, max_days * 86400))
+
+    def day(self, max_days: int = 730, future_days: int = 0) -> date:
+        return (self.now + timedelta(days=self.rng.randint(-max_days, future_days))).date()
+
+    def build(self, role_ids: dict, status_ids: list, method_ids: list, currency_ids: list) -> dict:
+        rng = self.rng
+        tables = {name: [] for name in (
+            "departments", "users", "user_roles", "sap_users", "services", "service_admins",
+            "products", "product_admins", "department_products", "permission_assignments",
+            "payment_info", "payment_invoices", "audit_logs", "workflow_tasks")}
+
+        for i in range(self.count("departments")):
+            tables["departments"].append({
+                "id": self.uuid(), "name": f"{NAME_PREFIX} Dept {i}", "created_at": self.timestamp()})
+        department_ids = [d["id"] for d in tables["departments"]]
+
+        admin_id = self.uuid()
+        tables["users"].append({
+            "id": admin_id, "name": f"{NAME_PREFIX} Admin", "email": ADMIN_EMAIL,
+            # Activated for login, but with a password nobody knows
+            "password_hash": get_password_hash(secrets.token_urlsafe(16)),
+            "department_id": None, "department": None, "position": None, "hire_date": None,
+            "resignation_date": None, "is_active": True, "created_at": self.timestamp()})
+        tables["user_roles"].append({"user_id": admin_id, "role_id": role_ids["Admin"]})
+        for i in range(self.count("users")):
+            department_id = rng.choice(department_ids) if rng.random() < 0.8 else None
+            is_active = rng.random() < 0.9
+            tables["users"].append({
+                "id": self.uuid(),
+                "name": f"{NAME_PREFIX} User {i}",
+                "email": f"user{i}@{EMAIL_DOMAIN}",
+                "password_hash": None,
+                "department_id": department_id,
+                # Legacy free-text department for the rest
+                "department": None if department_id else rng.choice([None, "Legacy Sales", "Legacy Ops"]),
+                "position": rng.choice(POSITIONS),
+                "hire_date": self.day(3650) if rng.random() < 0.9 else None,
+                "resignation_date": None if is_active else self.day(365),
+                "is_active": is_active,
+                "created_at": self.timestamp(),
+            })
+        user_ids = [u["id"] for u in tables["users"][1:]]
+        service_admin_ids = rng.sample(user_ids, max(1, len(user_ids) // 20))
+        for user_id in service_admin_ids:
+            tables["user_roles"].append({"user_id": user_id, "role_id": role_ids["ServiceAdmin"]})
+        for i, user_id in enumerate(user_ids):
+            if rng.random() < 0.5:
+                tables["sap_users"].append({"id": self.uuid(), "user_id": user_id, "sap_id": f"BENCH{i:08d}"})
+
+        for i in range(self.count("services")):
+            service_id = self.uuid()
+            tables["services"].append({
+                "id": service_id, "name": f"{NAME_PREFIX} Service {i}",
+                "vendor": f"Vendor {i % 37}", "url": f"https://service{i}.{EMAIL_DOMAIN}",
+                "created_at": self.timestamp()})
+            tables["service_admins"].append({"service_id": service_id, "user_id": rng.choice(service_admin_ids)})
+            for j in range(BASE_COUNTS["products_per_service"]):
+                product_id = self.uuid()
+                tables["products"].append({
+                    "id": product_id,
+                    # A few products are not linked to any service
+                    "service_id": service_id if rng.random() < 0.95 else None,
+                    "name": f"{NAME_PREFIX} Product {i}-{j}",
+                    "url": f"https://service{i}.{EMAIL_DOMAIN}/p{j}",
+                    "description": f"Synthetic product {j} of service {i}",
+                    "status_id": rng.choice(status_ids),
+                    "created_at": self.timestamp(),
+                })
+                tables["product_admins"].append({"product_id": product_id, "user_id": rng.choice(service_admin_ids)})
+        products = tables["products"]
+
+        for department_id in department_ids:
+            for product in rng.sample(products, min(5, len(products))):
+                tables["department_products"].append(
+                    {"department_id": department_id, "product_id": product["id"]})
+
+        for user_id in user_ids:
+            for product in rng.sample(products, BASE_COUNTS["assignments_per_user"]):
+                tables["permission_assignments"].append({
+                    "id": self.uuid(), "user_id": user_id, "product_id": product["id"],
+                    "service_id": product["service_id"],
+                    "assignment_source": rng.choice(["manual", "manual", "department"])})
+
+        for product in products:
+            for _ in range(BASE_COUNTS["payments_per_product"]):
+                payment_id = self.uuid()
+                status = rng.choices(["complete", "incomplete", "error"], weights=[6, 3, 1])[0]
+                usage_start = self.day(730, 30)
+                complete = status == "complete"
+                tables["payment_info"].append({
+                    "id": payment_id,
+                    "product_id": product["id"],
+                    "status": status,
+                    "amount": Decimal(rng.randint(500, 500000)) / 100 if complete or rng.random() < 0.5 else None,
+                    "cardholder_name": f"{NAME_PREFIX} Holder" if complete else None,
+                    "expiry_date": self.day(0, 1460) if complete else None,
+                    "payment_method_id": rng.choice(method_ids) if method_ids and (complete or rng.random() < 0.5) else None,
+                    "currency_id": rng.choice(currency_ids) if currency_ids else None,
+                    "payment_date": self.day(730, 60) if complete or rng.random() < 0.5 else None,
+                    "usage_start_date": usage_start,
+                    "usage_end_date": usage_start + timedelta(days=rng.choice([30, 90, 365])),
+                    "reporter": f"{NAME_PREFIX} Reporter",
+                    "created_at": self.timestamp(),
+                })
+                if complete:
+                    file_name = f"{payment_id}.pdf"
+                    tables["payment_invoices"].append({
+                        "id": self.uuid(), "payment_info_id": payment_id, "file_name": file_name,
+                        "original_file_name": f"invoice-{file_name}",
+                        "file_path": f"uploads/invoices/{file_name}", "created_at": self.timestamp()})
+
+        actor_ids = [admin_id] + service_admin_ids
+        for _ in range(self.count("audit_logs")):
+            target = rng.choice(products)["id"]
+            tables["audit_logs"].append({
+                "id": self.uuid(), "actor_user_id": rng.choice(actor_ids),
+                "action": rng.choice(ACTIONS), "target_id": str(target),
+                "details": {"source": "benchmark"}, "created_at": self.timestamp(365)})
+
+        for i in range(self.count("workflow_tasks")):
+            status = rng.choices(["pending", "completed", "in_progress", "cancelled"], weights=[3, 5, 1, 1])[0]
+            target_id = rng.choice(user_ids)
+            tables["workflow_tasks"].append({
+                "id": self.uuid(), "type": rng.choice(["onboarding", "offboarding"]),
+                "status": status, "assignee_user_id": admin_id, "target_user_id": target_id,
+                "employee_name": f"{NAME_PREFIX} Employee {i}",
+                "employee_email": f"employee{i}@{EMAIL_DOMAIN}",
+                "created_at": self.timestamp(180)})
+
+        return tables
+
+
+# Insert order respects foreign keys
+TABLES = [
+    ("departments", Department.__table__),
+    ("users", User.__table__),
+    ("user_roles", UserRole.__table__),
+    ("sap_users", SapUser.__table__),
+    ("services", Service.__table__),
+    ("service_admins", service_admins),
+    ("products", Product.__table__),
+    ("product_admins", product_admins),
+    ("department_products", DepartmentProductAssignment.__table__),
+    ("permission_assignments", PermissionAssignment.__table__),
+    ("payment_info", PaymentInfo.__table__),
+    ("payment_invoices", PaymentInvoice.__table__),
+    ("audit_logs", AuditLog.__table__),
+    ("workflow_tasks", WorkflowTask.__table__),
+]
+
+
+def reset(conn) -> None:
+    """Delete all synthetic rows; child rows go with the ON DELETE CASCADE foreign keys."""
+    bench_products = select(Product.id).where(Product.name.like(f"{NAME_PREFIX} %"))
+    # payment_info.product_id is ON DELETE SET NULL, so remove those rows explicitly
+    conn.execute(delete(PaymentInfo).where(PaymentInfo.product_id.in_(bench_products)))
+    conn.execute(delete(Product).where(Product.name.like(f"{NAME_PREFIX} %")))
+    conn.execute(delete(Service).where(Service.name.like(f"{NAME_PREFIX} %")))
+    conn.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+    conn.execute(delete(Department).where(Department.name.like(f"{NAME_PREFIX} %")))
+
+
+def seed(scale: int, *, seed_value: int = 42, reset_first: bool = False) -> dict:
+    """Generate and insert synthetic data; returns the number of rows per table."""
+    with engine.begin() as conn:
+        if reset_first:
+            reset(conn)
+        elif conn.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first():
+            raise SystemExit("Synthetic data already present; use --reset to replace it")
+
+        role_ids = dict(conn.execute(select(Role.name, Role.id)).all())
+        status_ids = list(conn.execute(select(ProductStatus.id)).scalars())
+        method_ids = list(conn.execute(select(PaymentMethod.id)).scalars())
+        currency_ids = list(conn.execute(select(Currency.id)).scalars())
+        if not {"Admin", "ServiceAdmin"} <= role_ids.keys() or not status_ids:
+            raise SystemExit("Master data (roles, product statuses) is missing; initialise the database first")
+
+        tables = SyntheticData(scale, seed_value).build(role_ids, status_ids, method_ids, currency_ids)
+        counts = {}
+        for name, table in TABLES:
+            rows = tables[name]
+            for start in range(0, len(rows), BATCH_SIZE):
+                conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+            counts[name] = len(rows)
+        return counts
+
+
+def admin_user_id():
+    """Id of the synthetic Admin user the benchmark authenticates as."""
+    with engine.connect() as conn:
+        return conn.execute(select(User.id).where(User.email == ADMIN_EMAIL)).scalar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic benchmark data.")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier for all row counts (default: 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--reset", action="store_true", help="Delete existing synthetic data first")
+    parser.add_argument("--reset-only", action="store_true", help="Delete synthetic data and exit")
+    args = parser.parse_args()
+
+    if args.reset_only:
+        with engine.begin() as conn:
+            reset(conn)
+        print("Synthetic data removed")
+        return
+
+    started = time.perf_counter()
+    counts = seed(args.scale, seed_value=args.seed, reset_first=args.reset)
+    for name, count in counts.items():
+        print(f"{name:24} {count:>10}")
+    print(f"Seeded scale {args.scale} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()